@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Path, Request
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from fastapi.responses import JSONResponse
 from db.supabase_client import supabase
 from utils.auth import verify_token
+from utils.executor import endpoint_limit, run_in_thread
+from utils.rowsets import contains_row, iter_rows
+from utils.storage import read_session_audit
 
 router = APIRouter()
 
@@ -12,6 +15,63 @@ async def get_audit(request: Request, session_id: str = Path(...)):
         raise HTTPException(status_code=401, detail="Missing or invalid token")
     token = auth.split()[1]
     verify_token(token)
-    res = supabase.table("audit_logs").select("*").contains("details", {"session_id": session_id}).order("created_at").execute()
+    async with endpoint_limit("audit"):
+        res = await run_in_thread(
+            supabase.table("audit_logs").select("*").contains("details", {"session_id": session_id}).order("created_at").execute
+        )
     logs = res.data if res.data else []
-    return {"success": True, "logs": logs} 
\ No newline at end of file
+    return {"success": True, "logs": logs} 
+
+def _row_steps(session_id: str) -> list:
+    audit = read_session_audit(session_id)
+    if audit is None:
+        raise HTTPException(status_code=404, detail="No cleaning audit for this session.")
+    return [(i, step) for i, step in enumerate(audit["steps"]) if isinstance(step.get("rows"), dict)]
+
+def _row_reasons(session_id: str, row: int) -> list:
+    reasons = []
+    for i, step in _row_steps(session_id):
+        if contains_row(step["rows"], row):
+            reasons.append({"step": i, **{key: value for key, value in step.items() if key != "rows"}})
+    return reasons
+
+def _step_rows(session_id: str, step: int, offset: int, limit: int) -> tuple:
+    steps = dict(_row_steps(session_id))
+    if step not in steps:
+        raise HTTPException(status_code=404, detail="Step has no row set.")
+    rows = steps[step]["rows"]
+    return steps[step]["action"], rows["count"], list(iter_rows(rows, offset, limit))
+
+@router.get("/audit/{session_id}/rows/{row}")
+async def get_row_audit(request: Request, session_id: str = Path(...), row: int = Path(..., ge=0)):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    verify_token(token)
+    async with endpoint_limit("audit"):
+        reasons = await run_in_thread(_row_reasons, session_id, row)
+    return {"success": True, "row": row, "removed": bool(reasons), "reasons": reasons}
+
+@router.get("/audit/{session_id}/steps/{step}/rows")
+async def get_step_rows(
+    request: Request,
+    session_id: str = Path(...),
+    step: int = Path(..., ge=0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=100000)
+):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    verify_token(token)
+    async with endpoint_limit("audit"):
+        action, count, rows = await run_in_thread(_step_rows, session_id, step, offset, limit)
+    return {
+        "success": True,
+        "action": action,
+        "count": count,
+        "offset": offset,
+        "rows": rows
+    }
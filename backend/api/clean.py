@@ -1,17 +1,166 @@
-from fastapi import APIRouter, HTTPException, Request, Body
+from fastapi import APIRouter, HTTPException, Request, Body, Path
 from fastapi.responses import JSONResponse
-import pandas as pd
+from pydantic import ValidationError
 import os
-from utils.cleaning import auto_clean
+import uuid
+import asyncio
+import logging
+from utils.cleaning import auto_clean, auto_clean_chunks
 from utils.auth import verify_token
-from utils.audit import log_action
+from utils.audit import log_action, log_actions
+from utils.files import preview_records, read_preview, PREVIEW_ROWS
+from utils.executor import endpoint_limit, register_pool, run_in_thread, run_in_process
+from utils.jobs import submit_job, session_pool, read_job, job_status, prune_jobs, hold_sessions, JobQueueFull, JobConflict
+from utils.hashindex import row_hash_cache_path
+from utils.outliers import outlier_model_path
+from utils.plan import plan_clean, PlanError
+from utils.profile_cache import get_session_profile
+from utils.storage import (
+    load_session_frame, write_session_frame, iter_session_chunks, convert_to_artifact, ensure_artifact, validate_columns,
+    write_session_audit, read_session_schema, session_null_columns, artifact_name, artifact_path, find_source_file,
+    CLEANED_DIR, StorageError
+)
+from schemas.clean import CleanRequest
 from db.supabase_client import supabase
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/cleaned')
+DATA_DIR = CLEANED_DIR
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Sessions larger than this are cleaned in chunks when mode is "auto"
+STREAM_CLEAN_BYTES = int(os.getenv("STREAM_CLEAN_BYTES", str(256 * 1024 ** 2)))
+# Worker processes shared by batch cleans, and the sessions one batch may clean
+CLEAN_BATCH_WORKERS = int(os.getenv("CLEAN_BATCH_WORKERS", str(os.cpu_count() or 1)))
+CLEAN_BATCH_MAX_SESSIONS = int(os.getenv("CLEAN_BATCH_MAX_SESSIONS", "500"))
+# Session IDs per Supabase lookup, keeping the query string short
+SESSION_LOOKUP_IDS = 100
+
+register_pool("clean_batch", CLEAN_BATCH_WORKERS)
+
+def _should_stream(session_id: str, mode: str) -> bool:
+    if mode != "auto":
+        return mode == "stream"
+    path = artifact_path(session_id)
+    if not os.path.exists(path):
+        path = find_source_file(session_id)
+    return bool(path) and os.path.getsize(path) > STREAM_CLEAN_BYTES
+
+def _plan(session_id: str, req: CleanRequest, head, rows: int, streamed: bool = False):
+    """Plan a clean with the session's stored profile; unrunnable plans are a 400."""
+    profile, exact = get_session_profile(session_id)
+    try:
+        return plan_clean(req, head, rows, profile, exact, streamed)
+    except PlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _session_head(session_id: str):
+    """Return a session's leading rows; a session without rows is a 400."""
+    head = next(iter(iter_session_chunks(session_id, chunksize=PREVIEW_ROWS)), None)
+    if head is None:
+        raise HTTPException(status_code=400, detail="Session has no rows to clean.")
+    return head
+
+def _planned(plan, step: str) -> bool:
+    return any(entry["step"] == step for entry in plan["steps"])
+
+def _step_cache_key(session_id: str):
+    """Identify a session's input for step memoization, if its content hash is known."""
+    meta = read_session_schema(session_id)
+    if not meta or not meta.get("content_hash"):
+        return None
+    return artifact_name(session_id), meta["content_hash"]
+
+def _clean_streaming(session_id: str, req: CleanRequest, cleaned_path: str, progress):
+    """Clean a session chunk by chunk, appending the kept rows to the cleaned CSV."""
+    if not ensure_artifact(session_id):
+        raise HTTPException(status_code=404, detail="File not found.")
+    validate_columns(session_id, req.dedupe_columns)
+    head = _session_head(session_id)
+    before = preview_records(head)
+    rows = read_session_schema(session_id)["rows"]
+    plan = _plan(session_id, req, head, rows, streamed=True)
+    # The chunked cleaner follows the flags, so skipped steps are switched off
+    run = req.model_copy(update={
+        "impute": req.impute if _planned(plan, "impute") else "",
+        "outlier": _planned(plan, "outliers"),
+        "dedupe": _planned(plan, "dedupe")
+    })
+    tmp = f"{cleaned_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "w", newline="") as f:
+            def write_chunk(chunk):
+                chunk.to_csv(f, header=f.tell() == 0, index=False)
+            summary, audit = auto_clean_chunks(
+                lambda: iter_session_chunks(session_id), run, write_chunk,
+                model_path=outlier_model_path(session_id, req, streamed=True),
+                hash_path=row_hash_cache_path(session_id, req, streamed=True),
+                progress=progress,
+                total_rows=rows,
+                missing_columns=session_null_columns(session_id)
+            )
+        os.replace(tmp, cleaned_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    summary["plan"] = plan
+    meta = convert_to_artifact(session_id, source=cleaned_path, cleaned=True)
+    return summary, audit, before, preview_records(read_preview(cleaned_path)), meta["rows"]
+
+def _clean_files(session_id: str, req: CleanRequest, progress):
+    """Clean a session's data and store the cleaned artifact and audit."""
+    cleaned_path = os.path.join(DATA_DIR, f"{session_id}_cleaned.csv")
+    try:
+        if _should_stream(session_id, req.mode):
+            summary, audit, before, after, rows = _clean_streaming(session_id, req, cleaned_path, progress)
+        else:
+            progress("load", "running")
+            df = load_session_frame(session_id)
+            if df is None:
+                raise HTTPException(status_code=404, detail="File not found.")
+            validate_columns(session_id, req.dedupe_columns)
+            before = preview_records(df)
+            plan = _plan(session_id, req, df.head(0), len(df))
+            progress("load", "done", rows=len(df))
+            cleaned, summary, audit = auto_clean(
+                df, req,
+                model_path=outlier_model_path(session_id, req),
+                hash_path=row_hash_cache_path(session_id, req),
+                cache_key=_step_cache_key(session_id),
+                plan=plan,
+                progress=progress
+            )
+            progress("write", "running")
+            cleaned.to_csv(cleaned_path, index=False)
+            known = read_session_schema(session_id) or {}
+            write_session_frame(artifact_name(session_id, cleaned=True), cleaned, cleaned_path, known.get("date_formats"))
+            after, rows = preview_records(cleaned), len(cleaned)
+            progress("write", "done", rows=rows)
+    except StorageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    write_session_audit(session_id, audit)
+    return summary, audit, before, after, rows
+
+def _clean_session(session_id: str, req: CleanRequest, user_id: str, progress=None):
+    """Job: clean a session, store the result and return what /clean used to respond."""
+    progress = progress or (lambda step, state, rows=None, total=None, cost=None: None)
+    summary, audit, before, after, rows = _clean_files(session_id, req, progress)
+    # Update cleaning_sessions
+    supabase.table("cleaning_sessions").update({
+        "cleaned_filename": f"{session_id}_cleaned.csv",
+        "rows_cleaned": rows,
+        "summary": summary
+    }).eq("id", session_id).execute()
+    log_action(user_id, "clean", {"session_id": session_id, "summary": summary, "steps": audit["steps"]})
+    return {
+        "summary": summary,
+        "before": before,
+        "after": after
+    }
 
-@router.post("/clean")
+@router.post("/clean", status_code=202)
 async def clean(request: Request, body: dict = Body(...)):
     auth = request.headers.get("authorization")
     if not auth or not auth.lower().startswith("bearer "):
@@ -21,31 +170,151 @@ async def clean(request: Request, body: dict = Body(...)):
     session_id = body.get("session_id")
     if not session_id:
         raise HTTPException(status_code=400, detail="Missing session_id")
-    file_path = None
-    for ext in [".csv", ".xlsx", ".xls"]:
-        candidate = os.path.join(DATA_DIR, f"{session_id}{ext}")
-        if os.path.exists(candidate):
-            file_path = candidate
-            break
-    if not file_path:
-        raise HTTPException(status_code=404, detail="File not found.")
-    if file_path.endswith(".csv"):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    cleaned, summary = auto_clean(df)
-    cleaned_path = os.path.join(DATA_DIR, f"{session_id}_cleaned.csv")
-    cleaned.to_csv(cleaned_path, index=False)
-    # Update cleaning_sessions
-    supabase.table("cleaning_sessions").update({
-        "cleaned_filename": f"{session_id}_cleaned.csv",
-        "rows_cleaned": len(cleaned),
-        "summary": summary
-    }).eq("id", session_id).execute()
-    log_action(user_id, "clean", {"session_id": session_id, "summary": summary})
+    try:
+        req = CleanRequest(**body)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_thread(prune_jobs)
+    try:
+        job = submit_job("clean", session_id, user_id, _clean_session, session_id, req, user_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "job_id": job["job_id"], "status": job["status"]}
+
+@router.get("/clean/jobs/{job_id}")
+async def clean_job(request: Request, job_id: str = Path(..., pattern="^[0-9a-f]{32}$")):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    user_id = verify_token(token)
+    job = await run_in_thread(read_job, job_id)
+    if job is None or job.get("kind") != "clean" or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"success": True, **job_status(job)}
+
+def _clean_batch_item(session_id: str, req: CleanRequest):
+    """Batch worker: clean one session; the caller records the results in bulk."""
+    summary, audit, _, _, rows = _clean_files(session_id, req, lambda step, state, **kwargs: None)
+    return {"summary": summary, "rows": rows, "steps": audit["steps"]}
+
+def _owned_sessions(session_ids, user_id: str):
+    """Return the IDs and owner of the user's cleaning_sessions among session_ids, by ID."""
+    owned = {}
+    for start in range(0, len(session_ids), SESSION_LOOKUP_IDS):
+        result = supabase.table("cleaning_sessions").select("id, user_id") \
+            .in_("id", session_ids[start:start + SESSION_LOOKUP_IDS]).eq("user_id", user_id).execute()
+        owned.update({row["id"]: row for row in result.data or []})
+    return owned
+
+def _record_batch(cleaned, user_id: str) -> None:
+    """
+    Update each cleaned session's row and audit them in one insert. Rows
+    are updated one at a time rather than upserted: an upsert of partial
+    rows needs INSERT rights under RLS and would fail NOT NULL columns it
+    does not send.
+    """
+    for session_id, outcome in cleaned.items():
+        supabase.table("cleaning_sessions").update({
+            "cleaned_filename": f"{session_id}_cleaned.csv",
+            "rows_cleaned": outcome["rows"],
+            "summary": outcome["summary"]
+        }).eq("id", session_id).eq("user_id", user_id).execute()
+    log_actions([
+        {
+            "user_id": user_id,
+            "action": "clean",
+            "details": {"session_id": session_id, "summary": outcome["summary"], "steps": outcome["steps"]}
+        }
+        for session_id, outcome in cleaned.items()
+    ])
+
+@router.post("/clean/batch")
+async def clean_batch(request: Request, body: dict = Body(...)):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    user_id = verify_token(token)
+    session_ids = body.get("session_ids")
+    if not isinstance(session_ids, list) or not session_ids or not all(isinstance(sid, str) and sid for sid in session_ids):
+        raise HTTPException(status_code=400, detail="session_ids must be a non-empty list of session IDs")
+    session_ids = list(dict.fromkeys(session_ids))
+    if len(session_ids) > CLEAN_BATCH_MAX_SESSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {CLEAN_BATCH_MAX_SESSIONS} sessions can be cleaned at once")
+    options = {key: value for key, value in body.items() if key not in ("session_ids", "session_id")}
+    try:
+        req = CleanRequest(session_id=session_ids[0], **options)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = {}
+    async with endpoint_limit("clean_batch"):
+        owned = await run_in_thread(_owned_sessions, session_ids, user_id)
+        with hold_sessions([sid for sid in session_ids if sid in owned], uuid.uuid4().hex) as held:
+            outcomes = await asyncio.gather(*[
+                run_in_process(_clean_batch_item, sid, req.model_copy(update={"session_id": sid}), pool="clean_batch")
+                for sid in held
+            ], return_exceptions=True)
+            cleaned = {}
+            for sid, outcome in zip(held, outcomes):
+                if isinstance(outcome, HTTPException):
+                    results[sid] = {"success": False, "status_code": outcome.status_code, "error": outcome.detail}
+                elif isinstance(outcome, Exception):
+                    logger.error(f"Batch clean of session {sid} failed: {str(outcome)}")
+                    results[sid] = {"success": False, "status_code": 500, "error": "Failed to clean session"}
+                else:
+                    cleaned[sid] = outcome
+            if cleaned:
+                try:
+                    await run_in_thread(_record_batch, cleaned, user_id)
+                except Exception as e:
+                    logger.error(f"Failed to record batch clean results: {str(e)}")
+                    cleaned = {sid: None for sid in cleaned}
+            for sid, outcome in cleaned.items():
+                if outcome is None:
+                    results[sid] = {"success": False, "status_code": 500, "error": "Cleaned, but failed to record the result"}
+                else:
+                    results[sid] = {"success": True, "rows_cleaned": outcome["rows"], "summary": outcome["summary"]}
+    for sid in session_ids:
+        if sid not in owned:
+            results[sid] = {"success": False, "status_code": 404, "error": "Session not found."}
+        elif sid not in results:
+            results[sid] = {"success": False, "status_code": 409, "error": "Session already has a job in flight"}
     return {
         "success": True,
-        "summary": summary,
-        "before": df.head(5).to_dict(orient="records"),
-        "after": cleaned.head(5).to_dict(orient="records")
-    } 
\ No newline at end of file
+        "cleaned": sum(result["success"] for result in results.values()),
+        "failed": sum(not result["success"] for result in results.values()),
+        "results": [{"session_id": sid, **results[sid]} for sid in session_ids]
+    }
+
+def _plan_session(session_id: str, req: CleanRequest):
+    """Plan a session's clean without running it."""
+    try:
+        if not ensure_artifact(session_id):
+            raise HTTPException(status_code=404, detail="File not found.")
+        validate_columns(session_id, req.dedupe_columns)
+        head = _session_head(session_id)
+    except StorageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = read_session_schema(session_id)["rows"]
+    return _plan(session_id, req, head, rows, streamed=_should_stream(session_id, req.mode))
+
+@router.post("/clean/plan")
+async def clean_plan(request: Request, body: dict = Body(...)):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    verify_token(token)
+    session_id = body.get("session_id")
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Missing session_id")
+    try:
+        req = CleanRequest(**body)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with endpoint_limit("clean"):
+        plan = await run_in_process(_plan_session, session_id, req, pool=session_pool(session_id))
+    return {"success": True, "plan": plan}
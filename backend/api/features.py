@@ -1,12 +1,31 @@
 from fastapi import APIRouter, HTTPException, Request, Body
-import pandas as pd
 import os
+from typing import Optional
 from utils.cleaning import suggest_features
 from utils.auth import verify_token
+from utils.executor import endpoint_limit, run_in_process
+from utils.jobs import session_pool
+from utils.storage import load_session_frame, read_session_schema, write_session_date_formats, StorageError
 
 router = APIRouter()
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/cleaned')
+# Ratio suggestions one response may hold
+MAX_RATIO_TOP_K = 1000
+
+def _suggest_session(session_id: str, columns: Optional[list], ratio_top_k: int, ratio_offset: int) -> dict:
+    """Suggest features for a session's cleaned data."""
+    try:
+        df = load_session_frame(session_id, columns=columns, cleaned=True)
+    except StorageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if df is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+    known = (read_session_schema(session_id) or {}).get("date_formats") or {}
+    result = suggest_features(df, known, ratio_top_k, ratio_offset)
+    found = {col: fmt for col, fmt in result["date_formats"].items() if col not in known}
+    if found:
+        write_session_date_formats(session_id, found)
+    return result
 
 @router.post("/features")
 async def features(request: Request, body: dict = Body(...)):
@@ -18,8 +37,14 @@ async def features(request: Request, body: dict = Body(...)):
     session_id = body.get("session_id")
     if not session_id:
         raise HTTPException(status_code=400, detail="Missing session_id")
-    file_path = os.path.join(DATA_DIR, f"{session_id}_cleaned.csv")
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found.")
-    df = pd.read_csv(file_path)
-    return {"success": True, **suggest_features(df)} 
\ No newline at end of file
+    ratio_top_k = body.get("ratio_top_k", 50)
+    ratio_offset = body.get("ratio_offset", 0)
+    if not isinstance(ratio_top_k, int) or not 1 <= ratio_top_k <= MAX_RATIO_TOP_K:
+        raise HTTPException(status_code=400, detail=f"ratio_top_k must be an integer from 1 to {MAX_RATIO_TOP_K}")
+    if not isinstance(ratio_offset, int) or ratio_offset < 0:
+        raise HTTPException(status_code=400, detail="ratio_offset must be a non-negative integer")
+    async with endpoint_limit("features"):
+        result = await run_in_process(
+            _suggest_session, session_id, body.get("columns"), ratio_top_k, ratio_offset, pool=session_pool(session_id)
+        )
+    return {"success": True, **result}
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Request
+from utils.auth import verify_token
+from utils.cache import cache_stats, merge_cache_stats
+from utils.executor import executor_stats, worker_cache_stats
+from utils.jobs import queue_depth
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics(request: Request):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    verify_token(token)
+    # Pool workers keep their own caches; totals cover every process
+    caches = merge_cache_stats([cache_stats(), *worker_cache_stats()])
+    return {
+        "success": True,
+        "frame_cache": caches["frame_cache"],
+        "step_cache": caches["step_cache"],
+        "executor": executor_stats(),
+        "jobs": {"in_flight": queue_depth()}
+    }
@@ -1,31 +1,153 @@
-from fastapi import APIRouter, HTTPException, Path, Request
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from fastapi.responses import JSONResponse
-import pandas as pd
+from typing import Optional
 import os
 from utils.cleaning import profile_data
+from utils.profiling import (
+    profile_chunks, profile_sample, profile_data_parallel, PROFILE_WORKERS, PARALLEL_PROFILE_COLUMNS
+)
+from utils.profile_cache import get_cached_profile, put_cached_profile
 from utils.auth import verify_token
+from utils.executor import endpoint_limit, run_in_thread, run_in_process
+from utils.jobs import submit_job, session_pool, read_job, job_status, prune_jobs, JobQueueFull, JobConflict
+from utils.storage import (
+    load_session_frame, load_session_sample, iter_session_chunks, artifact_path, find_source_file,
+    read_session_schema, validate_columns, ensure_artifact, StorageError
+)
 
 router = APIRouter()
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/cleaned')
+# Artifacts larger than this are profiled in chunks when mode is "auto"
+STREAM_PROFILE_BYTES = int(os.getenv("STREAM_PROFILE_BYTES", str(256 * 1024 ** 2)))
+
+def _should_stream(session_id: str) -> bool:
+    path = artifact_path(session_id)
+    if not os.path.exists(path):
+        path = find_source_file(session_id)
+    return bool(path) and os.path.getsize(path) > STREAM_PROFILE_BYTES
+
+def _should_parallelize(session_id: str, columns: Optional[list]) -> bool:
+    if PROFILE_WORKERS < 2:
+        return False
+    if columns is None:
+        meta = read_session_schema(session_id) or {"columns": []}
+        columns = meta["columns"]
+    return len(columns) >= PARALLEL_PROFILE_COLUMNS
+
+def _resolve_mode(session_id: str, cols: Optional[list]) -> str:
+    if _should_stream(session_id):
+        return "stream"
+    return "parallel" if _should_parallelize(session_id, cols) else "full"
+
+def _profile_session(
+    session_id: str,
+    cols: Optional[list],
+    mode: str,
+    sample_size: Optional[int],
+    sample_fraction: Optional[float],
+    confidence: float,
+    progress=None
+) -> dict:
+    """Profile a session with a resolved mode, reusing and storing cached results."""
+    progress = progress or (lambda step, state, rows=None, total=None, cost=None: None)
+    # Parallel and full profiles are identical, so they share cache entries
+    params = {"mode": "full" if mode == "parallel" else mode, "columns": cols}
+    if mode == "approx":
+        params.update({"sample_size": sample_size, "sample_fraction": sample_fraction, "confidence": confidence})
+    cached = get_cached_profile(session_id, params)
+    if cached is not None:
+        progress("profile", "cached")
+        return cached
+    try:
+        if mode == "approx":
+            progress("load", "running")
+            sampled = load_session_sample(session_id, sample_size, sample_fraction, columns=cols)
+            if sampled is None:
+                raise HTTPException(status_code=404, detail="File not found.")
+            sample, total_rows = sampled
+            progress("load", "done", rows=len(sample))
+            progress("profile", "running")
+            result = profile_sample(sample, total_rows, confidence)
+        elif mode == "stream":
+            if not find_source_file(session_id) and not os.path.exists(artifact_path(session_id)):
+                raise HTTPException(status_code=404, detail="File not found.")
+            total = (read_session_schema(session_id) or {}).get("rows")
+            progress("profile", "running", rows=0, total=total)
+            result = profile_chunks(
+                iter_session_chunks(session_id, columns=cols),
+                progress=lambda rows: progress("profile", "running", rows=rows, total=total)
+            )
+        elif mode == "parallel" and ensure_artifact(session_id):
+            # Workers read their own columns from the artifact
+            validate_columns(session_id, cols)
+            progress("profile", "running")
+            result = profile_data_parallel(path=artifact_path(session_id), columns=cols)
+        else:
+            progress("load", "running")
+            df = load_session_frame(session_id, columns=cols)
+            if df is None:
+                raise HTTPException(status_code=404, detail="File not found.")
+            progress("load", "done", rows=len(df))
+            progress("profile", "running")
+            result = profile_data_parallel(df) if mode == "parallel" else profile_data(df)
+    except StorageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    progress("profile", "done")
+    put_cached_profile(session_id, params, result)
+    return result
 
 @router.get("/profile/{session_id}")
-async def profile(request: Request, session_id: str = Path(...)):
+async def profile(
+    request: Request,
+    session_id: str = Path(...),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to profile"),
+    mode: str = Query("auto", enum=["auto", "full", "parallel", "stream", "approx"]),
+    sample_size: Optional[int] = Query(None, gt=0, description="Rows to sample in approx mode"),
+    sample_fraction: Optional[float] = Query(None, gt=0, le=1, description="Fraction of rows to sample in approx mode"),
+    confidence: float = Query(0.95, gt=0, lt=1),
+    background: bool = Query(False, description="Profile in a background job and return its ID at once")
+):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = auth.split()[1]
+    user_id = verify_token(token)
+    cols = columns.split(",") if columns else None
+    if background:
+        if mode == "auto":
+            mode = await run_in_thread(_resolve_mode, session_id, cols)
+        # A job already has a worker process to itself
+        if mode == "parallel":
+            mode = "full"
+        await run_in_thread(prune_jobs)
+        args = (session_id, cols, mode, sample_size, sample_fraction, confidence)
+        try:
+            job = submit_job("profile", session_id, user_id, _profile_session, *args)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+        except JobConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return JSONResponse(status_code=202, content={"success": True, "job_id": job["job_id"], "status": job["status"]})
+    async with endpoint_limit("profile"):
+        if mode == "auto":
+            mode = await run_in_thread(_resolve_mode, session_id, cols)
+        args = (session_id, cols, mode, sample_size, sample_fraction, confidence)
+        # Parallel profiles fan out to the CPU pool themselves, so they are
+        # coordinated from a thread rather than from inside a pool process
+        if mode == "parallel":
+            result = await run_in_thread(_profile_session, *args)
+        else:
+            result = await run_in_process(_profile_session, *args, pool=session_pool(session_id))
+    return {"success": True, **result}
+
+@router.get("/profile/jobs/{job_id}")
+async def profile_job(request: Request, job_id: str = Path(..., pattern="^[0-9a-f]{32}$")):
     auth = request.headers.get("authorization")
     if not auth or not auth.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid token")
     token = auth.split()[1]
-    verify_token(token)
-    file_path = None
-    for ext in [".csv", ".xlsx", ".xls"]:
-        candidate = os.path.join(DATA_DIR, f"{session_id}{ext}")
-        if os.path.exists(candidate):
-            file_path = candidate
-            break
-    if not file_path:
-        raise HTTPException(status_code=404, detail="File not found.")
-    if file_path.endswith(".csv"):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    return {"success": True, **profile_data(df)} 
\ No newline at end of file
+    user_id = verify_token(token)
+    job = await run_in_thread(read_job, job_id)
+    if job is None or job.get("kind") != "profile" or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"success": True, **job_status(job)}
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Request, Path, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import time
+import asyncio
+from utils.auth import verify_token
+from utils.executor import run_in_thread
+from utils.jobs import read_job, latest_job, job_status
+
+router = APIRouter()
+
+# Seconds between reads of a job's status while streaming it
+PROGRESS_POLL_SECONDS = 0.5
+# Seconds between keep-alive comments, so proxies do not close idle streams
+PROGRESS_HEARTBEAT_SECONDS = 15
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _stream(request: Request, job: dict):
+    """Yield a progress event whenever the job's status changes, until it finishes."""
+    last = None
+    beat = time.monotonic()
+    while True:
+        status = job_status(job)
+        # The ETA changes on every read, so it alone does not trigger an event
+        current = {**status, "eta_seconds": None}
+        if current != last:
+            last = current
+            beat = time.monotonic()
+            finished = status["status"] in ("done", "failed")
+            yield _event(status["status"] if finished else "progress", status)
+            if finished:
+                return
+        elif time.monotonic() - beat >= PROGRESS_HEARTBEAT_SECONDS:
+            beat = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(PROGRESS_POLL_SECONDS)
+        if await request.is_disconnected():
+            return
+        job = await run_in_thread(read_job, job["job_id"]) or job
+
+@router.get("/progress/{session_id}")
+async def progress(
+    request: Request,
+    session_id: str = Path(...),
+    job_id: Optional[str] = Query(None, pattern="^[0-9a-f]{32}$", description="Job to follow (defaults to the session's latest)"),
+    access_token: Optional[str] = Query(None, description="Bearer token, for EventSource clients that cannot send headers")
+):
+    auth = request.headers.get("authorization")
+    if auth and auth.lower().startswith("bearer "):
+        token = auth.split()[1]
+    elif access_token:
+        token = access_token
+    else:
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    user_id = verify_token(token)
+    job = await run_in_thread(read_job, job_id) if job_id else await run_in_thread(latest_job, session_id)
+    if job is None or job["session_id"] != session_id or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="No job found for this session.")
+    return StreamingResponse(
+        _stream(request, job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,23 +1,52 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse
 import pandas as pd
 import os
 import uuid
+import logging
+from typing import Optional
 from db.supabase_client import supabase
 from utils.auth import verify_jwt
 from utils.audit import log_action
+from utils.files import stream_to_disk, read_preview, preview_records, count_rows, FileTooLargeError
+from utils.storage import convert_to_artifact, save_upload_options, StorageError
+from utils.excel import list_sheets
+from utils.executor import endpoint_limit, run_in_thread, run_in_process
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/uploads')
 os.makedirs(DATA_DIR, exist_ok=True)
 
+def _inspect_upload(file_path: str, ext: str, sheet: Optional[str]) -> tuple:
+    """Read the preview rows, row count and sheet names of an uploaded file."""
+    sheets = list_sheets(file_path) if ext == ".xlsx" else None
+    if sheets is not None and sheet and sheet not in sheets:
+        return None, None, sheets
+    return read_preview(file_path, sheet=sheet), count_rows(file_path, sheet), sheets
+
+def _convert_upload(session_id: str, file_path: str, sheet: Optional[str] = None) -> None:
+    try:
+        # A reader that got here first has converted it already
+        convert_to_artifact(session_id, file_path, sheet=sheet, if_missing=True)
+    except StorageError as e:
+        # Readers convert lazily if the artifact is missing
+        logger.error(f"Artifact conversion failed for {session_id}: {str(e)}")
+
 @router.post("/upload")
 async def upload(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    sheet: Optional[str] = Form(None),
     user_id: str = Depends(verify_jwt)
 ):
+    async with endpoint_limit("upload"):
+        return await _upload(background_tasks, file, sheet, user_id)
+
+async def _upload(background_tasks: BackgroundTasks, file: UploadFile, sheet: Optional[str], user_id: str):
     try:
         # Validate file type
         ext = os.path.splitext(file.filename)[1].lower()
@@ -31,24 +60,32 @@ async def upload(
         session_id = str(uuid.uuid4())
         file_path = os.path.join(DATA_DIR, f"{session_id}{ext}")
         
-        # Read and validate file content
-        content = await file.read()
-        if not content:
+        # Stream file to disk without holding it in memory
+        try:
+            size = await stream_to_disk(file, file_path)
+        except FileTooLargeError as e:
+            raise HTTPException(
+                status_code=413,
+                detail=str(e)
+            )
+        if not size:
+            os.remove(file_path)
             raise HTTPException(
                 status_code=400,
                 detail="Empty file uploaded"
             )
-            
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(content)
 
-        # Read data for preview
+        # Read only the first rows for preview and count rows by scanning
         try:
-            if ext == ".csv":
-                df = pd.read_csv(file_path)
-            else:
-                df = pd.read_excel(file_path)
+            df, rows, sheets = await run_in_process(_inspect_upload, file_path, ext, sheet)
+            if df is None:
+                os.remove(file_path)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Sheet not found: {sheet}"
+                )
+        except HTTPException:
+            raise
         except Exception as e:
             os.remove(file_path)  # Clean up invalid file
             raise HTTPException(
@@ -58,7 +95,7 @@ async def upload(
 
         # Create cleaning session record
         try:
-            supabase.table("cleaning_sessions").insert({
+            await run_in_thread(supabase.table("cleaning_sessions").insert({
                 "id": session_id,
                 "user_id": user_id,
                 "original_filename": file.filename,
@@ -66,7 +103,7 @@ async def upload(
                 "rows_cleaned": None,
                 "summary": None,
                 "status": "uploaded"
-            }).execute()
+            }).execute)
         except Exception as e:
             os.remove(file_path)  # Clean up file if DB insert fails
             raise HTTPException(
@@ -74,20 +111,27 @@ async def upload(
                 detail="Failed to create cleaning session"
             )
 
+        # Convert to the columnar session artifact after responding; the
+        # sheet is kept so conversions started by readers pick it too
+        await run_in_thread(save_upload_options, session_id, sheet)
+        background_tasks.add_task(_convert_upload, session_id, file_path, sheet)
+
         # Log the action
-        log_action(user_id, "upload", {
+        await run_in_thread(log_action, user_id, "upload", {
             "session_id": session_id,
             "filename": file.filename,
-            "rows": len(df),
+            "sheet": sheet,
+            "rows": rows,
             "columns": len(df.columns)
         })
 
         return {
             "success": True,
             "session_id": session_id,
-            "preview": df.head(5).to_dict(orient="records"),
+            "preview": preview_records(df),
             "columns": list(df.columns),
-            "rows": len(df)
+            "rows": rows,
+            "sheets": sheets
         }
 
     except HTTPException:
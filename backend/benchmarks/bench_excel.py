@@ -0,0 +1,65 @@
+"""
+Compare Excel ingestion paths on a generated workbook.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_excel --rows 200000 --cols 20
+
+Reports the time for one `pd.read_excel` call (what every request used to
+pay), the one-off streaming openpyxl conversion to Parquet done on upload,
+and a read of the resulting artifact (what later requests pay).
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from utils.excel import excel_to_csv
+from utils.storage import _convert_csv
+
+def make_workbook(path: str, rows: int, cols: int) -> None:
+    rng = np.random.default_rng(0)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append([f"c{i}" for i in range(cols)])
+    values = rng.random((rows, cols))
+    for row in values:
+        ws.append(row.tolist())
+    wb.save(path)
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--cols", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = os.path.join(tmp, "bench.xlsx")
+        csv_path = os.path.join(tmp, "bench.csv")
+        print(f"Generating {args.rows} x {args.cols} workbook...")
+        make_workbook(xlsx, args.rows, args.cols)
+
+        _, t_pandas = timed(pd.read_excel, xlsx)
+        _, t_stream = timed(excel_to_csv, xlsx, csv_path)
+
+        import utils.storage as storage
+        storage.SESSION_DIR = tmp
+        _, t_arrow = timed(_convert_csv, "bench", csv_path)
+        _, t_read = timed(pq.read_table, os.path.join(tmp, "bench.parquet"))
+
+        print(f"pd.read_excel (per request):        {t_pandas:8.2f}s")
+        print(f"openpyxl read-only -> CSV (once):   {t_stream:8.2f}s")
+        print(f"CSV -> Parquet (once):              {t_arrow:8.2f}s")
+        print(f"Parquet read (per request):         {t_read:8.3f}s")
+        print(f"Per-request speedup:                {t_pandas / t_read:8.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the IsolationForest outlier step against the model-free detectors.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_outliers --rows 2000000 --cols 8
+
+Times the IsolationForest path auto_clean uses (fit on a row sample, score
+every row) and each iqr/zscore/mad detector with both scopes, on normal
+data with a few planted outliers, and reports how many rows each flags.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.outliers import (
+    RobustDetector, outlier_matrix, subsample_rows, fit_outlier_model, predict_outliers
+)
+
+FOREST_PARAMS = {"contamination": 0.05, "max_samples": "auto", "n_estimators": 100}
+
+def make_frame(rows: int, cols: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(rows, cols))
+    planted = rng.choice(rows, max(rows // 1000, 1), replace=False)
+    values[planted, 0] = 15.0
+    return pd.DataFrame(values, columns=[f"n{i}" for i in range(cols)])
+
+def isolation_forest(df: pd.DataFrame) -> np.ndarray:
+    X = outlier_matrix(df, list(df.columns))
+    rows = subsample_rows(len(X))
+    model, _ = fit_outlier_model(X if rows is None else X[rows], FOREST_PARAMS)
+    return predict_outliers(model, X)
+
+def detector(method: str, scope: str):
+    def run(df: pd.DataFrame) -> np.ndarray:
+        return RobustDetector(method, scope).fit(df, list(df.columns)).predict(df)
+    return run
+
+def timed(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    print(f"{args.rows} rows x {args.cols} columns")
+    flagged, t_forest = timed(isolation_forest, df, 1)
+    print(f"isolation_forest:   {t_forest:8.3f}s  {int(flagged.sum()):>9} rows")
+    for method in ["iqr", "zscore", "mad"]:
+        for scope in ["column", "row"]:
+            flagged, t = timed(detector(method, scope), df, args.repeat)
+            label = f"{method}/{scope}:"
+            print(f"{label:<19} {t:8.3f}s  {int(flagged.sum()):>9} rows  {t_forest / t:6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the batched profile_data against the previous per-column loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_profile --rows 20000 --cols 600
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.cleaning import profile_data
+from utils.profiling import profile_data_parallel
+
+def profile_data_loop(df: pd.DataFrame) -> dict:
+    """
+    The per-column implementation profile_data replaced, for reference.
+
+    It predates quantiles and histograms, so only shared keys are compared.
+    """
+    stats = []
+    for col in df.columns:
+        col_data = df[col]
+        col_stats = {
+            "column": col,
+            "type": str(col_data.dtype),
+            "missing_pct": float(col_data.isnull().mean()) * 100,
+            "unique_count": int(col_data.nunique())
+        }
+        if pd.api.types.is_numeric_dtype(col_data):
+            col_stats.update({
+                "min": float(col_data.min()),
+                "max": float(col_data.max()),
+                "mean": float(col_data.mean()),
+                "std": float(col_data.std())
+            })
+        elif pd.api.types.is_string_dtype(col_data):
+            col_stats.update({
+                "min_length": int(col_data.str.len().min()),
+                "max_length": int(col_data.str.len().max()),
+                "avg_length": float(col_data.str.len().mean())
+            })
+        stats.append(col_stats)
+    return {"profile": stats}
+
+def make_frame(rows: int, cols: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {}
+    for i in range(cols):
+        if i % 5 == 4:
+            data[f"s{i}"] = pd.Series(rng.choice(["alpha", "beta", "gamma", "delta"], rows), dtype=object)
+        else:
+            values = rng.normal(size=rows)
+            values[rng.random(rows) < 0.05] = np.nan
+            data[f"n{i}"] = values
+    return pd.DataFrame(data)
+
+def timed(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--parallel", action="store_true", help="Also time profile_data_parallel")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    old, t_old = timed(profile_data_loop, df, args.repeat)
+    new, t_new = timed(profile_data, df, args.repeat)
+    for a, b in zip(old["profile"], new["profile"]):
+        assert a.keys() <= b.keys(), (a, b)
+        for key in a:
+            if isinstance(a[key], float):
+                assert np.isclose(a[key], b[key], equal_nan=True), (key, a, b)
+            else:
+                assert a[key] == b[key], (key, a, b)
+
+    print(f"{args.rows} rows x {args.cols} columns")
+    print(f"per-column loop:  {t_old:8.3f}s")
+    print(f"batched:          {t_new:8.3f}s")
+    print(f"speedup:          {t_old / t_new:8.1f}x")
+    if args.parallel:
+        profile_data_parallel(df)  # start the worker pool
+        _, t_par = timed(profile_data_parallel, df, args.repeat)
+        print(f"parallel:         {t_par:8.3f}s")
+        print(f"speedup:          {t_old / t_par:8.1f}x")
+
+if __name__ == "__main__":
+    main()
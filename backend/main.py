@@ -3,10 +3,14 @@ import traceback
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from api import upload, profile, clean, audit, download, features, auth
+from api import upload, profile, clean, audit, download, features, auth, metrics, progress
+from utils.executor import Overloaded
+from utils.files import UploadSizeLimit
 
 app = FastAPI()
 
+# Added before CORS so that refusals still carry CORS headers
+app.add_middleware(UploadSizeLimit, paths=["/api/upload"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -15,6 +19,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=429, content={"success": False, "error": str(exc)}, headers={"Retry-After": "1"})
+
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
     print(f"Exception: {exc}")
@@ -27,4 +35,6 @@ app.include_router(profile.router, prefix="/api")
 app.include_router(clean.router, prefix="/api")
 app.include_router(audit.router, prefix="/api")
 app.include_router(download.router, prefix="/api")
-app.include_router(features.router, prefix="/api") 
\ No newline at end of file
+app.include_router(features.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(progress.router, prefix="/api") 
\ No newline at end of file
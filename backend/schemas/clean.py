@@ -1,11 +1,60 @@
-from pydantic import BaseModel
-from typing import List, Any, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Any, Optional, Literal, Union
 
 class CleanRequest(BaseModel):
     session_id: str
     impute: str = "mean"
     outlier: bool = True
     dedupe: bool = True
+    # Columns identifying a duplicate (defaults to whole rows), and which one stays
+    dedupe_columns: Optional[List[str]] = None
+    dedupe_keep: Literal["first", "last"] = "first"
+    # "iqr", "zscore" and "mad" score columns without fitting a model
+    outlier_method: Literal["isolation_forest", "iqr", "zscore", "mad"] = "isolation_forest"
+    # Flag rows with any outlying column, or by their combined score
+    outlier_scope: Literal["column", "row"] = "column"
+    # Cut-off of the iqr/zscore/mad scores (defaults to 1.5/3/3.5)
+    outlier_threshold: Optional[float] = Field(None, gt=0)
+    # IsolationForest settings of the outlier step
+    contamination: float = Field(0.05, gt=0, le=0.5)
+    max_samples: Union[Literal["auto"], int, float] = "auto"
+    n_estimators: int = Field(100, ge=1, le=1000)
+    # "stream" cleans in chunks without loading the data; "auto" streams large files
+    mode: Literal["auto", "memory", "stream"] = "auto"
+    # Steps in the order they apply to the rows left by the previous ones;
+    # defaults to impute, outliers, dedupe as enabled by the flags above
+    steps: Optional[List[Literal["impute", "outliers", "dedupe"]]] = None
+    # Let the planner reorder, fuse and skip steps where the result is unchanged
+    optimize: bool = True
+
+    @field_validator("max_samples")
+    @classmethod
+    def check_max_samples(cls, v):
+        if (isinstance(v, int) and v < 1) or (isinstance(v, float) and not 0 < v <= 1):
+            raise ValueError("max_samples must be 'auto', a positive row count or a fraction in (0, 1]")
+        return v
+
+    @field_validator("steps")
+    @classmethod
+    def check_steps(cls, v):
+        if v is not None and len(set(v)) != len(v):
+            raise ValueError("steps must not repeat a step")
+        return v
+
+    @model_validator(mode="after")
+    def sync_steps(self):
+        # Keep the flags and the step list in agreement either way round
+        if self.steps is None:
+            flags = {"impute": bool(self.impute), "outliers": self.outlier, "dedupe": self.dedupe}
+            self.steps = [step for step, enabled in flags.items() if enabled]
+        else:
+            if "impute" not in self.steps:
+                self.impute = ""
+            elif not self.impute:
+                self.impute = "mean"
+            self.outlier = "outliers" in self.steps
+            self.dedupe = "dedupe" in self.steps
+        return self
 
 class CleanResponse(BaseModel):
     summary: dict
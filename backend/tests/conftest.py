@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules import each other as top-level packages (utils, schemas), as when
+# the API runs from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from utils.dates import detect_date_format, infer_date_formats, guess_formats, parse_ratio
+
+def _dates(n=3000, fmt="%Y-%m-%d"):
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(np.random.default_rng(0).integers(0, 1500, n), unit="D")
+    return pd.Series(days.strftime(fmt), dtype=object)
+
+def test_detects_iso_dates():
+    assert detect_date_format(_dates()) == "%Y-%m-%d"
+
+def test_detects_day_first_dates():
+    assert detect_date_format(_dates(fmt="%d/%m/%Y")) == "%d/%m/%Y"
+
+def test_ambiguous_dates_get_both_day_orders():
+    assert set(guess_formats(["01/02/2020"])) >= {"%m/%d/%Y", "%d/%m/%Y"}
+
+def test_non_dates_are_not_detected():
+    assert detect_date_format(pd.Series(["apple", "pear", None] * 100)) is None
+    assert detect_date_format(pd.Series(np.arange(100))) is None
+
+def test_mostly_unparseable_columns_are_not_dates():
+    values = pd.concat([_dates(500), pd.Series(["n/a"] * 500)], ignore_index=True)
+    assert detect_date_format(values) is None
+    assert parse_ratio(values, "%Y-%m-%d") == 0.5
+
+def test_inferred_formats_parse_like_explicit_parsing():
+    df = pd.DataFrame({"when": _dates(), "name": ["x"] * 3000, "n": np.arange(3000)})
+    formats = infer_date_formats(df)
+    assert formats == {"when": "%Y-%m-%d", "name": None}
+    parsed = pd.to_datetime(df["when"], format=formats["when"])
+    assert parsed.notna().all()
+
+def test_known_formats_are_not_inspected_again():
+    df = pd.DataFrame({"when": _dates(100)})
+    assert infer_date_formats(df, known={"when": None}) == {"when": None}
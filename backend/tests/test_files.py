@@ -0,0 +1,16 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+from utils.files import count_excel_rows
+
+def test_excel_rows_ignore_formatted_empty_rows(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    for row in [["a", "b"], [1, 2], [None, None], [3, None]]:
+        ws.append(row)
+    # Formatting marks rows as used without giving them values
+    for row in range(5, 50):
+        ws.cell(row=row, column=1).fill = PatternFill("solid", fgColor="FFFF00")
+    path = str(tmp_path / "data.xlsx")
+    wb.save(path)
+    assert count_excel_rows(path) == len(pd.read_excel(path)) == 3
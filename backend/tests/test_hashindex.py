@@ -0,0 +1,65 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from utils.hashindex import RowHashIndex, row_hashes, duplicate_mask
+
+def _frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "i": rng.integers(0, 20, 3000),
+        "f": rng.choice([0.5, 1.5, np.nan], 3000),
+        "s": rng.choice(["x", "y"], 3000)
+    })
+    return df
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_duplicate_mask_matches_duplicated(keep):
+    df = _frame()
+    hashes = row_hashes(df)
+    mask = duplicate_mask(hashes, np.ones(len(df), dtype=bool), keep)
+    assert (mask == df.duplicated(keep=keep).to_numpy()).all()
+
+def test_duplicate_mask_on_key_columns_and_candidates():
+    df = _frame()
+    candidates = np.arange(len(df)) % 3 != 0
+    mask = duplicate_mask(row_hashes(df, ["i", "s"]), candidates)
+    expected = np.zeros(len(df), dtype=bool)
+    expected[candidates] = df[candidates].duplicated(["i", "s"]).to_numpy()
+    assert (mask == expected).all()
+
+def test_row_hashes_keep_large_integers_distinct():
+    big = 2 ** 53
+    df = pd.DataFrame({"i": np.array([big, big + 1], dtype="int64")})
+    hashes = row_hashes(df)
+    assert hashes[0] != hashes[1]
+
+def test_row_hashes_fold_negative_zero_and_nan():
+    df = pd.DataFrame({"f": [0.0, -0.0, np.nan, float("nan")]})
+    hashes = row_hashes(df)
+    assert hashes[0] == hashes[1] and hashes[2] == hashes[3]
+
+def test_row_hashes_do_not_depend_on_chunking():
+    df = _frame()
+    chunked = np.concatenate([row_hashes(df.iloc[start:start + 700]) for start in range(0, len(df), 700)])
+    assert (chunked == row_hashes(df)).all()
+
+def test_seen_index_flags_rows_kept_earlier(tmp_path):
+    df = _frame()
+    hashes = row_hashes(df)
+    seen = RowHashIndex(str(tmp_path / "index"))
+    first = duplicate_mask(hashes[:1500], np.ones(1500, dtype=bool), seen=seen)
+    rest = duplicate_mask(hashes[1500:], np.ones(len(df) - 1500, dtype=bool), seen=seen)
+    assert (np.concatenate([first, rest]) == df.duplicated().to_numpy()).all()
+    assert len(seen) == (~df.duplicated()).sum()
+
+def test_row_hashes_do_not_copy_the_frame():
+    df = pd.DataFrame(np.random.default_rng(0).random((200_000, 10)))
+    df.iloc[::7, 3] = -0.0
+    tracemalloc.start()
+    try:
+        row_hashes(df)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 0.5 * df.memory_usage(index=False).sum()
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+from schemas.clean import CleanRequest
+from utils.cleaning import auto_clean
+from utils.plan import plan_clean, PlanError
+
+def _frame():
+    # 200 distinct rows repeated 50 times
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({"a": rng.normal(size=200), "b": rng.integers(0, 5, 200)})
+    return pd.concat([base] * 50, ignore_index=True)
+
+def _profile(missing=0.0, unique_a=200, constant=False):
+    return {"profile": [
+        {"column": "a", "missing_pct": missing, "unique_count": unique_a, "min": 1 if constant else -3, "max": 1 if constant else 3},
+        {"column": "b", "missing_pct": 0.0, "unique_count": 5, "min": 0, "max": 4}
+    ]}
+
+def _names(plan):
+    return [entry["step"] for entry in plan["steps"]]
+
+def test_without_optimize_steps_run_as_requested():
+    df = _frame()
+    req = CleanRequest(session_id="s", optimize=False, steps=["dedupe", "impute", "outliers"])
+    plan = plan_clean(req, df.head(), len(df), _profile(), exact=True)
+    assert _names(plan) == ["dedupe", "impute", "outliers"]
+    assert plan["skipped"] == []
+
+def test_impute_skipped_without_missing_values():
+    df = _frame()
+    plan = plan_clean(CleanRequest(session_id="s"), df.head(), len(df), _profile())
+    assert {"step": "impute", "reason": "no missing values"} in plan["skipped"]
+    assert "impute" in _names(plan_clean(CleanRequest(session_id="s"), df.head(), len(df), _profile(missing=5.0)))
+
+def test_outliers_skipped_without_numeric_columns():
+    head = pd.DataFrame({"s": ["x", "y"]})
+    plan = plan_clean(CleanRequest(session_id="s"), head, 2)
+    assert {"step": "outliers", "reason": "no numeric columns"} in plan["skipped"]
+
+def test_robust_outliers_skipped_on_constant_columns():
+    df = _frame().assign(b=1)
+    profile = _profile(constant=True)
+    profile["profile"][1].update(min=1, max=1)
+    plan = plan_clean(CleanRequest(session_id="s", outlier_method="zscore"), df.head(), len(df), profile)
+    assert "outliers" not in _names(plan)
+    # The forest still scores constant columns
+    plan = plan_clean(CleanRequest(session_id="s"), df.head(), len(df), profile)
+    assert "outliers" in _names(plan)
+
+def test_dedupe_skipped_on_unique_key_only_with_exact_profile():
+    df = _frame()
+    req = CleanRequest(session_id="s", dedupe_columns=["a"])
+    profile = _profile(unique_a=len(df))
+    assert "dedupe" not in _names(plan_clean(req, df.head(), len(df), profile, exact=True))
+    assert "dedupe" in _names(plan_clean(req, df.head(), len(df), profile, exact=False))
+
+def test_dedupe_moved_before_costly_outliers():
+    df = _frame()
+    plan = plan_clean(CleanRequest(session_id="s"), df.head(), len(df), _profile(), exact=True)
+    assert _names(plan) == ["dedupe", "outliers"]
+    assert all(entry.get("reordered") for entry in plan["steps"])
+
+def test_dedupe_not_moved_when_key_misses_numeric_columns():
+    df = _frame()
+    req = CleanRequest(session_id="s", dedupe_columns=["b"])
+    plan = plan_clean(req, df.head(), len(df), _profile(), exact=True)
+    assert _names(plan) == ["outliers", "dedupe"]
+
+def test_robust_outliers_and_dedupe_fused():
+    df = _frame()
+    plan = plan_clean(CleanRequest(session_id="s", outlier_method="iqr"), df.head(), len(df), _profile(missing=5.0))
+    fused = [entry["step"] for entry in plan["steps"] if entry.get("fused")]
+    assert sorted(fused) == ["dedupe", "outliers"]
+    forest = plan_clean(CleanRequest(session_id="s"), df.head(), len(df), _profile(missing=5.0))
+    assert not any(entry.get("fused") for entry in forest["steps"])
+
+@pytest.mark.parametrize("method", ["isolation_forest", "iqr"])
+def test_optimized_plan_keeps_the_same_rows(method):
+    df = _frame()
+    req = CleanRequest(session_id="s", outlier_method=method)
+    plan = plan_clean(req, df.head(), len(df), _profile(), exact=True)
+    optimized, _, _ = auto_clean(df, req, plan=plan)
+    plain, _, _ = auto_clean(df, req.model_copy(update={"optimize": False}))
+    assert optimized.index.equals(plain.index)
+
+def test_streamed_plans_only_skip_steps():
+    df = _frame()
+    plan = plan_clean(CleanRequest(session_id="s"), df.head(), len(df), _profile(), exact=True, streamed=True)
+    assert _names(plan) == ["outliers", "dedupe"]
+    with pytest.raises(PlanError):
+        plan_clean(CleanRequest(session_id="s", steps=["dedupe", "outliers"]), df.head(), len(df), streamed=True)
+
+def test_plan_needs_no_rows_of_the_data():
+    df = _frame()
+    req = CleanRequest(session_id="s", outlier_method="iqr")
+    assert plan_clean(req, df.head(0), len(df), _profile(missing=5.0)) == plan_clean(req, df, len(df), _profile(missing=5.0))
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.cleaning import profile_data
+
+def _baseline_profile(df):
+    """profile_data as it was before the batched rewrite: pandas, column by column."""
+    stats = []
+    for col in df.columns:
+        col_data = df[col]
+        col_stats = {
+            "column": col,
+            "type": str(col_data.dtype),
+            "missing_pct": float(col_data.isnull().mean()) * 100,
+            "unique_count": int(col_data.nunique())
+        }
+        if pd.api.types.is_numeric_dtype(col_data):
+            col_stats.update({
+                "min": float(col_data.min()),
+                "max": float(col_data.max()),
+                "mean": float(col_data.mean()),
+                "std": float(col_data.std())
+            })
+        elif pd.api.types.is_string_dtype(col_data):
+            col_stats.update({
+                "min_length": int(col_data.str.len().min()),
+                "max_length": int(col_data.str.len().max()),
+                "avg_length": float(col_data.str.len().mean())
+            })
+        stats.append(col_stats)
+    return stats
+
+def _frame(rows=5000):
+    rng = np.random.default_rng(0)
+    floats = rng.normal(size=rows)
+    floats[::7] = np.nan
+    floats[1::11] = -0.0
+    floats[2::11] = 0.0
+    return pd.DataFrame({
+        "int8": rng.integers(-100, 100, rows).astype("int8"),
+        "uint16": rng.integers(0, 60000, rows).astype("uint16"),
+        "wide": rng.integers(0, 10 ** 12, rows),
+        "big": (2 ** 53 + rng.integers(0, 3, rows)).astype("int64"),
+        "huge": (np.uint64(2 ** 63) + rng.integers(0, 5, rows).astype("uint64")),
+        "float": floats,
+        "float32": rng.normal(size=rows).astype("float32"),
+        "nullable": pd.array(np.where(np.arange(rows) % 5 == 0, None, rng.integers(0, 9, rows)), dtype="Int64"),
+        "bool": rng.random(rows) < 0.3,
+        "constant": np.full(rows, 7),
+        "empty": np.full(rows, np.nan),
+        "text": rng.choice(["a", "bb", None], rows),
+        "category": pd.Categorical(rng.choice(["x", "y"], rows))
+    })
+
+def test_profile_matches_baseline_implementation():
+    df = _frame()
+    for got, want in zip(profile_data(df)["profile"], _baseline_profile(df), strict=True):
+        for key, value in want.items():
+            if isinstance(value, float):
+                assert np.isclose(got[key], value, equal_nan=True), (want["column"], key)
+            else:
+                assert got[key] == value, (want["column"], key)
+
+@pytest.mark.parametrize("column", ["int8", "uint16", "wide", "huge", "float", "float32", "nullable", "bool", "constant"])
+def test_quantiles_and_histogram_match_numpy(column):
+    df = _frame()
+    values = df[column].dropna().to_numpy(dtype="float64")
+    entry = next(e for e in profile_data(df)["profile"] if e["column"] == column)
+    expected = np.quantile(values, [0.01, 0.25, 0.5, 0.75, 0.99])
+    assert np.allclose(list(entry["quantiles"].values()), expected)
+    counts, edges = np.histogram(values, entry["histogram"]["bin_edges"])
+    assert entry["histogram"]["counts"] == counts.tolist()
+    assert sum(counts) == len(values)
@@ -0,0 +1,49 @@
+import itertools
+import numpy as np
+import pandas as pd
+from utils.ratios import rank_ratio_pairs, RATIO_MIN_CORRELATION, RATIO_MAX_CORRELATION
+
+def _frame(rows=2000):
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=rows)
+    return pd.DataFrame({
+        "a": base + rng.normal(scale=0.5, size=rows) + 10,
+        "b": base + rng.normal(scale=1.0, size=rows) + 10,
+        "c": rng.normal(size=rows) + 10,
+        "d": base * 2 + 20,
+        "z": np.where(np.arange(rows) % 10 == 0, 0.0, base + 10)
+    })
+
+def _exact_pairs(df):
+    """Pairs ranked from the exact correlation matrix, as rank_ratio_pairs should."""
+    corr = df.corr().abs()
+    pairs = []
+    for a, b in itertools.combinations(df.columns, 2):
+        score = corr.loc[a, b]
+        if RATIO_MIN_CORRELATION <= score <= RATIO_MAX_CORRELATION and (df[b] != 0).all():
+            pairs.append(([a, b], score))
+    return sorted(pairs, key=lambda pair: -pair[1])
+
+def test_ranking_matches_exact_correlations():
+    # Fewer rows than RATIO_SAMPLE_ROWS: correlations come from every row
+    df = _frame()
+    result = rank_ratio_pairs(df, list(df.columns), top_k=100)
+    exact = _exact_pairs(df)
+    assert result["total"] == len(exact)
+    assert [pair["columns"] for pair in result["pairs"]] == [columns for columns, _ in exact]
+    for pair, (_, score) in zip(result["pairs"], exact):
+        assert abs(pair["score"] - score) < 1e-3
+
+def test_zero_denominators_are_excluded():
+    df = _frame()
+    result = rank_ratio_pairs(df, list(df.columns), top_k=100)
+    assert all(pair["columns"][1] != "z" for pair in result["pairs"])
+
+def test_pages_follow_the_ranking():
+    df = _frame()
+    everything = rank_ratio_pairs(df, list(df.columns), top_k=100)["pairs"]
+    page = rank_ratio_pairs(df, list(df.columns), top_k=2, offset=1)
+    assert page["pairs"] == everything[1:3]
+
+def test_fewer_than_two_columns_have_no_pairs():
+    assert rank_ratio_pairs(_frame(), ["a"]) == {"pairs": [], "total": 0}
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from utils.rowsets import RowSetBuilder, RowSetError, encode_mask, decode_rows, iter_rows, contains_row
+
+def _masks():
+    rng = np.random.default_rng(0)
+    runs = np.zeros(10000, dtype=bool)
+    runs[100:900] = runs[5000:5003] = runs[9990:] = True
+    return {
+        "empty": np.zeros(1000, dtype=bool),
+        "full": np.ones(1001, dtype=bool),
+        "dense": rng.random(10000) < 0.5,
+        "sparse": rng.random(10000) < 0.001,
+        "runs": runs
+    }
+
+@pytest.mark.parametrize("name", list(_masks()))
+def test_encode_decode_round_trip(name):
+    mask = _masks()[name]
+    encoded = encode_mask(mask)
+    assert encoded["length"] == len(mask) and encoded["count"] == mask.sum()
+    assert (decode_rows(encoded) == np.flatnonzero(mask)).all()
+
+def test_dense_sets_use_bitmaps_and_runs_use_ranges():
+    masks = _masks()
+    assert encode_mask(masks["dense"])["encoding"] == "bitmap"
+    assert encode_mask(masks["runs"])["encoding"] == "ranges"
+
+@pytest.mark.parametrize("name", list(_masks()))
+def test_builder_chunks_encode_like_whole_mask(name):
+    mask = _masks()[name]
+    builder = RowSetBuilder()
+    # Odd chunk sizes split bytes of the bitmap and runs across chunks
+    for start in range(0, len(mask), 333):
+        builder.append(mask[start:start + 333])
+    assert (decode_rows(builder.finish()) == np.flatnonzero(mask)).all()
+
+def test_iter_rows_pages_and_contains_row():
+    mask = _masks()["sparse"]
+    encoded = encode_mask(mask)
+    rows = np.flatnonzero(mask)
+    assert list(iter_rows(encoded, offset=2, limit=3)) == list(rows[2:5])
+    assert contains_row(encoded, int(rows[0]))
+    assert not contains_row(encoded, int(np.flatnonzero(~mask)[0]))
+
+def test_malformed_row_set_raises():
+    with pytest.raises(RowSetError):
+        decode_rows({"encoding": "bitmap", "length": 8, "count": 1, "data": "not base64!"})
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from utils.profiling import profile_sample
+from utils.sketches import Reservoir
+
+def _frame(rows=50000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"n": rng.normal(10, 2, rows), "s": rng.choice(list("abcdefgh"), rows)})
+    df.loc[::10, "n"] = np.nan
+    return df
+
+def test_reservoir_keeps_a_sample_of_the_rows():
+    df = pd.DataFrame({"i": np.arange(10000)})
+    reservoir = Reservoir(500, seed=0)
+    for start in range(0, len(df), 1234):
+        reservoir.update(df.iloc[start:start + 1234])
+    sample = reservoir.sample["i"]
+    assert reservoir.rows == len(df)
+    assert len(sample) == 500 and sample.is_unique
+    assert sample.isin(df["i"]).all()
+    # Uniform over the input: the sample mean is close to the data's
+    assert abs(sample.mean() - df["i"].mean()) < 0.1 * df["i"].mean()
+
+def test_reservoir_merge_keeps_its_size():
+    left, right = Reservoir(100, seed=0), Reservoir(100, seed=1)
+    left.update(pd.DataFrame({"i": np.arange(0, 1000)}))
+    right.update(pd.DataFrame({"i": np.arange(1000, 3000)}))
+    left.merge(right)
+    assert left.rows == 3000
+    assert len(left.sample) == 100 and left.sample["i"].is_unique
+
+def test_reservoir_smaller_input_is_kept_whole():
+    reservoir = Reservoir(100, seed=0)
+    reservoir.update(pd.DataFrame({"i": np.arange(40)}))
+    assert sorted(reservoir.sample["i"]) == list(range(40))
+
+def test_profile_sample_intervals_cover_exact_values():
+    df = _frame()
+    result = profile_sample(df.sample(5000, random_state=1), len(df))
+    assert result["sampled"] and result["total_rows"] == len(df)
+    numeric, text = result["profile"]
+    ci = numeric["confidence_intervals"]
+    assert ci["mean"][0] <= df["n"].mean() <= ci["mean"][1]
+    assert ci["std"][0] <= df["n"].std() <= ci["std"][1]
+    missing = df["n"].isna().mean() * 100
+    assert ci["missing_pct"][0] <= missing <= ci["missing_pct"][1]
+    assert ci["unique_count"][0] <= df["n"].nunique() <= ci["unique_count"][1]
+    assert text["unique_count"] == df["s"].nunique()
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from utils.cleaning import profile_data, PROFILE_QUANTILES
+from utils.profiling import profile_chunks
+from utils.sketches import Moments, KLLSketch, HyperLogLog, hash_values
+
+def _chunks(df, size):
+    return (df.iloc[start:start + size] for start in range(0, len(df), size))
+
+def _rank_error(values, estimate, q):
+    """Distance between q and the rank of estimate among values, as a fraction."""
+    values = np.sort(values)
+    return abs(np.searchsorted(values, estimate, side="left") / len(values) - q)
+
+def test_moments_match_numpy_however_split():
+    values = np.random.default_rng(0).normal(5, 3, 10001)
+    moments = Moments()
+    for part in np.array_split(values, 7):
+        moments.update(part)
+    other = Moments()
+    other.update(values[:10])
+    rest = Moments()
+    rest.update(values[10:])
+    other.merge(rest)
+    for m in (moments, other):
+        assert m.count == len(values)
+        assert np.isclose(m.mean, values.mean())
+        assert np.isclose(m.std, values.std(ddof=1))
+        assert m.min == values.min() and m.max == values.max()
+
+def test_kll_quantiles_within_rank_error():
+    values = np.random.default_rng(1).exponential(size=50000)
+    sketch = KLLSketch(seed=0)
+    for part in np.array_split(values, 25):
+        sketch.update(part)
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    for q, estimate in zip(qs, sketch.quantiles(qs)):
+        assert _rank_error(values, estimate, q) < 0.02
+
+def test_kll_merge_matches_single_sketch():
+    values = np.random.default_rng(2).uniform(size=20000)
+    left, right = KLLSketch(seed=0), KLLSketch(seed=1)
+    left.update(values[:5000])
+    right.update(values[5000:])
+    left.merge(right)
+    assert left.count == len(values)
+    assert _rank_error(values, left.quantiles([0.5])[0], 0.5) < 0.02
+
+def test_kll_histogram_counts_sum_to_total():
+    values = np.random.default_rng(3).normal(size=30000)
+    sketch = KLLSketch(seed=0)
+    sketch.update(values)
+    edges = np.linspace(values.min(), values.max(), 11)
+    exact, _ = np.histogram(values, edges)
+    estimate = sketch.histogram(edges)
+    assert abs(sum(estimate) - len(values)) <= len(edges)
+    assert np.abs(np.array(estimate) - exact).max() < 0.02 * len(values)
+
+def test_hyperloglog_estimate_close_to_exact():
+    values = pd.Series(np.random.default_rng(4).integers(0, 10 ** 9, 50000))
+    hll = HyperLogLog()
+    for part in _chunks(values, 10000):
+        hll.add_hashes(hash_values(part))
+    exact = values.nunique()
+    assert abs(hll.estimate() - exact) / exact < 0.05
+
+def test_hyperloglog_small_counts_nearly_exact():
+    hll = HyperLogLog()
+    hll.add_hashes(hash_values(pd.Series(["a", "b", "c", "a", None])))
+    assert hll.estimate() == 3
+
+def test_hash_values_treats_equal_numbers_alike():
+    ints = hash_values(pd.Series([1, 0, 2]))
+    floats = hash_values(pd.Series([1.0, -0.0, np.nan, 2.0]))
+    assert (ints == floats).all()
+
+def test_profile_chunks_matches_profile_data():
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        "n": rng.normal(size=20000),
+        "k": rng.integers(0, 500, 20000),
+        "s": rng.choice(["a", "bb", "ccc"], 20000)
+    })
+    df.loc[::9, "n"] = np.nan
+    exact = profile_data(df)["profile"]
+    streamed = profile_chunks(_chunks(df, 3000))["profile"]
+    assert [c["column"] for c in streamed] == [c["column"] for c in exact]
+    for want, got in zip(exact, streamed):
+        assert got["type"] == want["type"]
+        assert np.isclose(got["missing_pct"], want["missing_pct"])
+        assert abs(got["unique_count"] - want["unique_count"]) <= 0.05 * want["unique_count"]
+        if "mean" in want:
+            for key in ("min", "max", "mean", "std"):
+                assert np.isclose(got[key], want[key])
+            values = df[want["column"]].dropna().to_numpy()
+            for label, q in zip(want["quantiles"], PROFILE_QUANTILES):
+                assert _rank_error(values, got["quantiles"][label], q) < 0.02
+            assert got["histogram"]["bin_edges"] == want["histogram"]["bin_edges"]
+        else:
+            for key in ("min_length", "max_length", "avg_length"):
+                assert got[key] == want[key]
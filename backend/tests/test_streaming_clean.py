@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from schemas.clean import CleanRequest
+from utils.cleaning import auto_clean, auto_clean_chunks, _stream_statistics
+from utils.sketches import TopCounts
+
+def _frame(rows=6000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "a": rng.normal(size=rows),
+        "b": rng.integers(0, 3, rows),
+        "c": rng.choice(["x", "y", "z"], rows)
+    })
+    df.loc[::13, "a"] = np.nan
+    df.loc[::17, "c"] = None
+    df.loc[50, "a"] = 40.0
+    # Exact copies of the first rows, found by dedupe across chunks
+    return pd.concat([df, df.iloc[:300]], ignore_index=True)
+
+def _chunks(df, size=1000):
+    return lambda: (df.iloc[start:start + size] for start in range(0, len(df), size))
+
+def test_topcounts_mode_matches_pandas():
+    values = pd.Series(np.random.default_rng(1).choice(["p", "q", "r", None], 5000))
+    counts = TopCounts()
+    for start in range(0, len(values), 700):
+        counts.update(values.iloc[start:start + 700])
+    assert counts.most_common() == values.mode()[0]
+
+def test_topcounts_breaks_ties_like_mode():
+    counts = TopCounts()
+    counts.update(pd.Series([3, 1, 3, 1, 2]))
+    assert counts.most_common() == 1
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_auto_clean_chunks_matches_auto_clean(keep):
+    df = _frame()
+    # Fewer rows than OUTLIER_SAMPLE_ROWS: the sample is the whole input
+    req = CleanRequest(session_id="s", impute="mode", outlier_method="iqr", dedupe_keep=keep)
+    cleaned, summary, audit = auto_clean(df, req)
+    parts = []
+    streamed_summary, streamed_audit = auto_clean_chunks(_chunks(df), req, parts.append)
+    streamed = pd.concat(parts).reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, cleaned.reset_index(drop=True))
+    for key in ("imputation", "outliers_removed", "duplicates_removed"):
+        assert streamed_summary[key] == summary[key]
+    assert streamed_audit["steps"] == audit["steps"]
+
+def test_stream_statistics_means_are_exact():
+    df = _frame()
+    stats = _stream_statistics(_chunks(df)(), CleanRequest(session_id="s", impute="mean"))
+    assert stats["rows"] == len(df)
+    assert np.isclose(stats["fills"]["a"][0], df["a"].mean())
+    assert stats["fills"]["c"] == (df["c"].mode()[0], "mode")
+
+def test_stream_statistics_only_tracks_missing_columns():
+    df = _frame()
+    req = CleanRequest(session_id="s", impute="median")
+    everything = _stream_statistics(_chunks(df)(), req)
+    known = _stream_statistics(_chunks(df)(), req, missing_columns=["a", "c"])
+    assert known["fills"] == everything["fills"]
+    assert set(known["fills"]) == {"a", "c"}
+    assert not _stream_statistics(_chunks(df)(), CleanRequest(session_id="s", impute=""))["fills"]
@@ -1,6 +1,6 @@
 from db.supabase_client import supabase, get_supabase_client
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import json
 
 class AuditLogError(Exception):
@@ -73,6 +73,44 @@ def log_action(
         print(f"Audit logging failed: {str(e)}")
         raise AuditLogError("Failed to log action")
 
+def log_actions(entries: List[Dict[str, Any]]) -> None:
+    """
+    Log several actions to the audit_logs table in one insert.
+    
+    Args:
+        entries: Dictionaries with the arguments of log_action
+            (user_id, action, details and optionally session_id)
+    
+    Raises:
+        AuditLogError: If logging fails
+    """
+    if not entries:
+        return
+    try:
+        created_at = datetime.utcnow().isoformat()
+        audit_entries = []
+        for entry in entries:
+            validate_audit_data(entry.get("user_id"), entry.get("action"), entry.get("details"))
+            audit_entry = {
+                "user_id": entry["user_id"],
+                "action": entry["action"],
+                "details": entry["details"],
+                "created_at": created_at
+            }
+            if entry.get("session_id"):
+                audit_entry["session_id"] = entry["session_id"]
+            audit_entries.append(audit_entry)
+        
+        client = get_supabase_client()
+        result = client.table("audit_logs").insert(audit_entries).execute()
+        
+        if not result.data or len(result.data) != len(audit_entries):
+            raise AuditLogError("Failed to insert audit logs")
+            
+    except Exception as e:
+        print(f"Bulk audit logging failed: {str(e)}")
+        raise AuditLogError("Failed to log actions")
+
 def get_user_audit_logs(
     user_id: str,
     limit: int = 100,
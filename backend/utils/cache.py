@@ -0,0 +1,139 @@
+import os
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Budget of each process's caches: the API process and every pool worker
+# keep their own, so together they may hold (1 + pool workers) times this
+FRAME_CACHE_BYTES = int(os.getenv("FRAME_CACHE_BYTES", str(512 * 1024 ** 2)))
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Return the deep memory usage of a DataFrame in bytes."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def file_signature(path: str) -> tuple:
+    """Return (mtime_ns, size) of a file, used to invalidate cache entries."""
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of DataFrames bounded by total memory.
+
+    Entries are evicted least recently used first once the summed size of
+    cached frames exceeds `max_bytes`. Frames larger than the whole budget
+    are never cached.
+    """
+
+    def __init__(self, max_bytes: int = FRAME_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: Optional[int] = None) -> bool:
+        """
+        Cache a value, evicting older entries to stay within budget.
+
+        Args:
+            key: Cache key
+            value: DataFrame (or any object if nbytes is given)
+            nbytes: Size of the value; measured with memory_usage(deep=True) if omitted
+
+        Returns:
+            True if the value was cached
+        """
+        if nbytes is None:
+            nbytes = frame_nbytes(value)
+        if nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return True
+
+    def invalidate(self, match) -> int:
+        """
+        Drop every entry whose key satisfies `match(key)`.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            keys = [k for k in self._entries if match(k)]
+            for k in keys:
+                self._bytes -= self._entries.pop(k)[1]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the byte count."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return entry count, memory use and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+# Shared by all API handlers or pool tasks of this process
+frame_cache = FrameCache()
+
+# Bounded separately so cleaning intermediates never evict loaded frames
+STEP_CACHE_BYTES = int(os.getenv("STEP_CACHE_BYTES", str(256 * 1024 ** 2)))
+# Per-step results of auto_clean, keyed by (artifact name, step, chained key)
+step_cache = FrameCache(STEP_CACHE_BYTES)
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Return the stats of this process's caches."""
+    return {"frame_cache": frame_cache.stats(), "step_cache": step_cache.stats()}
+
+def merge_cache_stats(stats: List[Dict[str, Dict[str, int]]]) -> Dict[str, Dict[str, int]]:
+    """
+    Sum the cache stats of several processes.
+
+    Args:
+        stats: cache_stats() of each process
+
+    Returns:
+        Totals per cache, with the number of processes counted
+    """
+    merged = {}
+    for process in stats:
+        for cache, counters in process.items():
+            total = merged.setdefault(cache, {"processes": 0})
+            total["processes"] += 1
+            for counter, value in counters.items():
+                total[counter] = total.get(counter, 0) + value
+    return merged
@@ -1,9 +1,33 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from typing import Tuple, Dict, Any, List, Optional
+from typing import Tuple, Dict, Any, List, Optional, Iterable, Callable
 from schemas.clean import CleanRequest
 import logging
+import os
+import sys
+import json
+import hashlib
+import shutil
+import tempfile
+import tracemalloc
+import uuid
+import warnings
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Windows: no RSS high-water mark
+    resource = None
+from utils.cache import frame_nbytes, step_cache
+from utils.hashindex import RowHashIndex, row_hashes, duplicate_mask, load_row_hashes, save_row_hashes
+from utils.rowsets import RowSetBuilder, encode_mask
+from utils.outliers import (
+    OUTLIER_SAMPLE_ROWS, RobustDetector, outlier_params, outlier_matrix, column_means, subsample_rows,
+    fit_outlier_model, predict_outliers, predict_frame_outliers
+)
+from utils.sketches import Moments, KLLSketch, Reservoir, TopCounts
+from utils.plan import plan_clean
+from utils.dates import infer_date_formats
+from utils.ratios import rank_ratio_pairs
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +49,167 @@ def validate_dataframe(df: pd.DataFrame) -> None:
     if not isinstance(df, pd.DataFrame):
         raise CleaningError("Input must be a pandas DataFrame")
 
+PROFILE_QUANTILES = [0.01, 0.25, 0.5, 0.75, 0.99]
+# Integer columns spanning at most this many values are profiled from
+# their value counts
+COUNT_RANGE_VALUES = 1 << 16
+HISTOGRAM_BINS = 10
+
+def quantile_labels() -> List[str]:
+    """Return the profile keys of PROFILE_QUANTILES, e.g. "p25"."""
+    return [f"p{round(q * 100)}" for q in PROFILE_QUANTILES]
+
+def histogram_edges(lo: float, hi: float) -> np.ndarray:
+    """Return HISTOGRAM_BINS + 1 equal-width edges spanning [lo, hi]."""
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        return np.array([])
+    if lo == hi:
+        # Same convention as np.histogram for a constant column
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, HISTOGRAM_BINS + 1)
+
+def _is_text_column(col_data: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(col_data) or isinstance(col_data.dtype, pd.CategoricalDtype)
+
+def _present_values(col_data: pd.Series) -> np.ndarray:
+    """
+    Return the non-missing values of a numeric column.
+
+    NumPy integer and float columns keep their dtype, and are not copied
+    when nothing is missing; nullable and boolean columns become float64.
+    """
+    dtype = col_data.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        return col_data.to_numpy()
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        values = col_data.to_numpy()
+    else:
+        values = col_data.to_numpy(dtype="float64", na_value=np.nan)
+    missing = np.isnan(values)
+    return values[~missing] if missing.any() else values
+
+def _counted_stats(values: np.ndarray, lo: int, hi: int) -> Dict[str, Any]:
+    """
+    Stats of an integer column from the count of every value in [lo, hi].
+
+    One bincount pass replaces hashing for the distinct count and sorting
+    for the quantiles and histogram; the mean and std are reduced over the
+    counts.
+    """
+    if values.dtype.kind == "u":
+        # Unsigned values may not fit intp, but their offsets from lo do
+        offsets = (values - values.dtype.type(lo)).astype(np.intp)
+    else:
+        offsets = np.subtract(values, lo, dtype=np.intp)
+    counts = np.bincount(offsets, minlength=hi - lo + 1)
+    present = np.flatnonzero(counts)
+    weights = counts[present]
+    points = present.astype("float64") + lo
+    n = len(values)
+    mean = float(weights @ points / n)
+    std = float(np.sqrt(weights @ (points - mean) ** 2 / (n - 1))) if n > 1 else float("nan")
+    # Linear interpolation between the values at the neighbouring ranks
+    ranks = np.cumsum(weights)
+    pos = np.asarray(PROFILE_QUANTILES) * (n - 1)
+    below = np.floor(pos)
+    lower = points[np.searchsorted(ranks, below, side="right")]
+    upper = points[np.searchsorted(ranks, np.minimum(below + 1, n - 1), side="right")]
+    edges = histogram_edges(float(lo), float(hi))
+    histogram, _ = np.histogram(points, edges, weights=weights)
+    return {
+        "unique_count": len(present),
+        "mean": mean,
+        "std": std,
+        "quantiles": lower + (upper - lower) * (pos - below),
+        "histogram": {"bin_edges": edges.tolist(), "counts": histogram.astype(np.int64).tolist()}
+    }
+
+def _numeric_stats(df: pd.DataFrame, columns: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute unique count, min/max/mean/std, quantiles and a histogram for
+    numeric columns.
+
+    Each column is reduced on its own, in its own dtype, so only one
+    column's temporaries are held on top of the frame. Integer columns
+    spanning at most COUNT_RANGE_VALUES values are summarized from their
+    value counts (see _counted_stats); other columns count distinct
+    values by hashing (nunique), select their quantiles with a partial
+    sort and bin their histogram in one pass, so no column is sorted.
+    """
+    stats = {}
+    labels = quantile_labels()
+    for col in columns:
+        values = _present_values(df[col])
+        if not len(values):
+            nan = float("nan")
+            stats[col] = {
+                "unique_count": 0, "min": nan, "max": nan, "mean": nan, "std": nan,
+                "quantiles": {label: nan for label in labels},
+                "histogram": {"bin_edges": [], "counts": []}
+            }
+            continue
+        lo, hi = values.min(), values.max()
+        if values.dtype.kind in "iu" and int(hi) - int(lo) < COUNT_RANGE_VALUES:
+            col_stats = _counted_stats(values, int(lo), int(hi))
+        else:
+            edges = histogram_edges(float(lo), float(hi))
+            col_stats = {
+                "unique_count": int(df[col].nunique()),
+                "mean": float(values.mean(dtype="float64")),
+                # Single values have no sample deviation, as in pandas
+                "std": float(values.std(dtype="float64", ddof=1)) if len(values) > 1 else float("nan"),
+                # Selection (np.partition) rather than a sort of the column
+                "quantiles": np.quantile(values, PROFILE_QUANTILES),
+                "histogram": {"bin_edges": edges.tolist(), "counts": np.histogram(values, edges)[0].tolist()}
+            }
+        stats[col] = {
+            "unique_count": int(col_stats["unique_count"]),
+            "min": float(lo),
+            "max": float(hi),
+            "mean": col_stats["mean"],
+            "std": col_stats["std"],
+            "quantiles": {label: float(q) for label, q in zip(labels, col_stats["quantiles"])},
+            "histogram": col_stats["histogram"]
+        }
+    return stats
+
+def _text_stats(col_data: pd.Series) -> Dict[str, Any]:
+    """
+    Compute unique count and string length stats for a text column.
+
+    The column is factorized once; lengths are measured on the distinct
+    values only and gathered back through the codes.
+    """
+    if isinstance(col_data.dtype, pd.CategoricalDtype):
+        codes = col_data.cat.codes.to_numpy()
+        uniques = col_data.cat.categories
+    else:
+        codes, uniques = pd.factorize(col_data)
+    codes = codes[codes >= 0]
+    present = np.bincount(codes, minlength=len(uniques)) > 0
+    unique_lengths = pd.Series(uniques).str.len().to_numpy(dtype="float64", na_value=np.nan)
+    lengths = unique_lengths[codes]
+    lengths = lengths[~np.isnan(lengths)]
+    col_stats = {"unique_count": int(present.sum())}
+    if not len(lengths):
+        col_stats.update({"min_length": None, "max_length": None, "avg_length": None})
+    else:
+        col_stats.update({
+            "min_length": int(lengths.min()),
+            "max_length": int(lengths.max()),
+            "avg_length": float(lengths.mean())
+        })
+    return col_stats
+
 def profile_data(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
     """
     Generate a detailed profile of the DataFrame.
+
+    Every column is profiled on its own, so the extra memory is bounded by
+    one column rather than the frame. Numeric stats come from NumPy
+    reductions in the column's dtype and text stats from a single
+    factorization. Numeric columns also get PROFILE_QUANTILES and an
+    equal-width histogram.
     
     Args:
         df: Input DataFrame
@@ -38,30 +220,25 @@ def profile_data(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
     try:
         validate_dataframe(df)
         
+        num_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+        numeric = _numeric_stats(df, num_cols)
+        
         stats = []
         for col in df.columns:
             col_data = df[col]
             col_stats = {
                 "column": col,
                 "type": str(col_data.dtype),
-                "missing_pct": float(col_data.isnull().mean()) * 100,
-                "unique_count": int(col_data.nunique())
+                "missing_pct": float(col_data.isna().sum() / len(df)) * 100
             }
             
             # Add type-specific statistics
-            if pd.api.types.is_numeric_dtype(col_data):
-                col_stats.update({
-                    "min": float(col_data.min()),
-                    "max": float(col_data.max()),
-                    "mean": float(col_data.mean()),
-                    "std": float(col_data.std())
-                })
-            elif pd.api.types.is_string_dtype(col_data):
-                col_stats.update({
-                    "min_length": int(col_data.str.len().min()),
-                    "max_length": int(col_data.str.len().max()),
-                    "avg_length": float(col_data.str.len().mean())
-                })
+            if col in numeric:
+                col_stats.update(numeric[col])
+            elif _is_text_column(col_data):
+                col_stats.update(_text_stats(col_data))
+            else:
+                col_stats["unique_count"] = int(col_data.nunique())
             
             stats.append(col_stats)
             
@@ -70,104 +247,676 @@ def profile_data(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
         logger.error(f"Error profiling data: {str(e)}")
         raise CleaningError(f"Failed to profile data: {str(e)}")
 
+IMPUTE_DTYPES = ["number", "object", "string", "category"]
+# tracemalloc roughly doubles the run time of the IsolationForest fit, so
+# the heap (and the clean's peak/input ratio) is only traced when enabled
+TRACE_CLEAN_MEMORY = bool(int(os.getenv("TRACE_CLEAN_MEMORY", 0)))
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the process's resident set size high-water mark in bytes, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+@contextmanager
+def track_peak_memory(enabled: bool = True):
+    """
+    Measure the peak memory of a block.
+
+    Yields a dict filled in when the block exits: "peak_rss_bytes" is the
+    process's RSS high-water mark, and "peak_bytes" the peak Python/NumPy
+    heap allocation of the block traced with tracemalloc when `enabled`
+    (None otherwise). If tracing is already active (nested use), the outer
+    trace is reused and left running.
+    """
+    usage = {"peak_bytes": None, "peak_rss_bytes": None}
+    if not enabled:
+        try:
+            yield usage
+        finally:
+            usage["peak_rss_bytes"] = peak_rss_bytes()
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    try:
+        yield usage
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        usage.update(peak_bytes=max(peak - base, 0), peak_rss_bytes=peak_rss_bytes())
+        if started:
+            tracemalloc.stop()
+
+def select_columns(df: pd.DataFrame, include: List[str]) -> List[str]:
+    """Return the columns of the given dtypes, without the copy select_dtypes makes of them."""
+    return list(df.head(0).select_dtypes(include=include).columns)
+
+def _imputation_values(
+    df: pd.DataFrame,
+    method: str,
+    rows: Optional[np.ndarray] = None
+) -> Dict[str, Tuple[Any, str]]:
+    """
+    Compute the fill value of every column with missing values.
+
+    Numeric columns use their mean/median when the method asks for it; all
+    other columns use their mode. Columns are reduced one at a time, so at
+    most one column is copied at once.
+
+    Args:
+        df: Input DataFrame
+        method: Imputation method
+        rows: Boolean mask of the rows to take the values from (defaults
+            to every row)
+
+    Returns:
+        Mapping of column to (fill value, strategy name)
+    """
+    values = {}
+    for col in select_columns(df, IMPUTE_DTYPES):
+        column = df[col] if rows is None else df[col][rows]
+        if not column.isna().any():
+            continue
+        if method in ("mean", "median") and pd.api.types.is_numeric_dtype(column.dtype):
+            value, strategy = column.mean() if method == "mean" else column.median(), method
+        else:
+            modes = column.mode(dropna=True)
+            value, strategy = modes.iloc[0] if len(modes) else np.nan, "mode"
+        if not pd.isna(value):
+            values[col] = (value, strategy)
+    return values
+
+def _flag_outliers(
+    df: pd.DataFrame,
+    columns: List[str],
+    req: CleanRequest,
+    model_path: Optional[str],
+    fit_mask: Optional[np.ndarray] = None,
+    score_mask: Optional[np.ndarray] = None,
+    shared: Optional[Dict[str, np.ndarray]] = None
+) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+    """
+    Flag outlier rows with the request's method.
+
+    The detector is fitted on the rows of `fit_mask` and scores those of
+    `score_mask`, a subset of them (both default to every row). An
+    IsolationForest is fitted on a row sample and reports how it was
+    fitted; the iqr/zscore/mad detectors need no model and can share
+    float64 column conversions through `shared`.
+
+    Returns:
+        Tuple of (boolean mask over all rows, True for outliers, model info)
+    """
+    fit_rows = None if fit_mask is None or fit_mask.all() else np.flatnonzero(fit_mask)
+    score_rows = None if score_mask is None or score_mask.all() else np.flatnonzero(score_mask)
+    if req.outlier_method != "isolation_forest":
+        detector = RobustDetector(req.outlier_method, req.outlier_scope, req.outlier_threshold)
+        flagged = detector.fit(df, columns, fit_rows, shared).predict(df, score_rows, shared)
+        info = None
+    else:
+        # Only the fitting sample and one scoring batch at a time are
+        # gathered into float32 arrays
+        fill = column_means(df, columns, fit_rows)
+        sample = subsample_rows(len(df) if fit_rows is None else len(fit_rows))
+        if fit_rows is not None:
+            sample = fit_rows if sample is None else fit_rows[sample]
+        model, cached = fit_outlier_model(outlier_matrix(df, columns, fill, sample), outlier_params(req), model_path)
+        info = {"cached": cached, "fit_rows": len(df) if sample is None else len(sample)}
+        flagged = predict_frame_outliers(model, df, columns, fill, score_rows)
+    if score_rows is None:
+        return flagged, info
+    outliers = np.zeros(len(df), dtype=bool)
+    outliers[score_rows] = flagged
+    return outliers, info
+
+def _step_key(upstream: Optional[tuple], step: str, params: Any) -> Optional[tuple]:
+    """Chain a step's cache key onto the key of the step before it."""
+    if upstream is None:
+        return None
+    payload = json.dumps([upstream[2], step, params], sort_keys=True, default=str)
+    return (upstream[0], step, hashlib.blake2b(payload.encode(), digest_size=16).hexdigest())
+
+def _run_step(key: Optional[tuple], compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return a step's result from step_cache, or compute and cache it.
+
+    Results carry their own size under "nbytes".
+
+    Returns:
+        Tuple of (result, whether it came from the cache)
+    """
+    if key is not None:
+        cached = step_cache.get(key)
+        if cached is not None:
+            return cached, True
+    result = compute()
+    if key is not None:
+        step_cache.put(key, result, nbytes=result["nbytes"])
+    return result, False
+
+def _impute_step(df: pd.DataFrame, req: CleanRequest, rows: np.ndarray) -> Dict[str, Any]:
+    # Fill values come from the rows left by earlier steps
+    values = _imputation_values(df, req.impute, None if rows.all() else rows)
+    filled = pd.DataFrame(
+        {col: df[col].fillna(value) for col, (value, _) in values.items()},
+        index=df.index
+    ) if values else None
+    return {
+        "filled": filled,
+        "steps": [{"action": f"impute_{strategy}", "column": col} for col, (_, strategy) in values.items()],
+        "summary": {"imputation": {col: strategy for col, (_, strategy) in values.items()}},
+        "nbytes": frame_nbytes(filled) if filled is not None else 0
+    }
+
+def _outlier_step(
+    df: pd.DataFrame,
+    req: CleanRequest,
+    model_path: Optional[str],
+    fit_mask: np.ndarray,
+    score_mask: np.ndarray,
+    shared: Optional[Dict[str, np.ndarray]]
+) -> Dict[str, Any]:
+    num_cols = select_columns(df, ["number"])
+    if not num_cols:
+        return {"mask": None, "steps": [], "summary": {}, "nbytes": 0}
+    outliers, model_info = _flag_outliers(df, num_cols, req, model_path, fit_mask, score_mask, shared)
+    summary = {"outliers_removed": int(outliers.sum())}
+    if model_info:
+        summary["outlier_model"] = model_info
+    step = {"action": "remove_outliers", "rows": encode_mask(outliers), "columns": num_cols, "params": outlier_params(req)}
+    return {"mask": outliers, "steps": [step], "summary": summary, "nbytes": outliers.nbytes}
+
+def _dedupe_step(
+    df: pd.DataFrame,
+    candidates: np.ndarray,
+    req: CleanRequest,
+    hash_path: Optional[str],
+    shared: Optional[Dict[str, np.ndarray]]
+) -> Dict[str, Any]:
+    hashes = load_row_hashes(hash_path, len(df))
+    cached = hashes is not None
+    if hashes is None:
+        hashes = row_hashes(df, req.dedupe_columns, shared)
+        if hash_path:
+            save_row_hashes(hash_path, hashes)
+    duplicates = duplicate_mask(hashes, candidates, req.dedupe_keep)
+    step = {
+        "action": "remove_duplicates",
+        "rows": encode_mask(duplicates),
+        "columns": req.dedupe_columns,
+        "keep": req.dedupe_keep
+    }
+    return {
+        "mask": duplicates,
+        "steps": [step],
+        "summary": {"duplicates_removed": int(duplicates.sum()), "row_hashes_cached": cached},
+        "nbytes": duplicates.nbytes
+    }
+
 def auto_clean(
     df: pd.DataFrame,
-    req: CleanRequest
+    req: CleanRequest,
+    model_path: Optional[str] = None,
+    hash_path: Optional[str] = None,
+    cache_key: Optional[Tuple[str, str]] = None,
+    plan: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[..., None]] = None
 ) -> Tuple[pd.DataFrame, Dict[str, Any], Dict[str, Any]]:
     """
     Automatically clean the DataFrame based on the provided request.
-    
+
+    The steps run as laid out by `plan` (see utils.plan.plan_clean), each
+    on the rows the previous ones leave: fill values and outlier detectors
+    are computed from those rows, and dedupe only considers them.
+
+    The input frame is never modified. Imputed columns are filled in one
+    fillna call on just those columns and the result shares the untouched
+    columns with the input; outliers and duplicates are combined into one
+    row mask so the rows are filtered with a single copy. Duplicates are
+    found from 64-bit row hashes (optionally of key columns only) in one
+    hash-table pass. Removed rows are recorded in the audit as encoded row
+    sets (see utils.rowsets) of input positions.
+
+    An IsolationForest is fitted on at most OUTLIER_SAMPLE_ROWS rows and
+    then scores every row in parallel batches; the iqr/zscore/mad methods
+    score columns directly in O(n).
+
+    With a `cache_key`, the result of each step (imputed columns, outlier
+    mask, duplicate mask) is kept in step_cache under a key chained from
+    the input's key, the step's parameters and the previous step's key.
+    Re-cleaning with one option changed then reruns only that step and the
+    ones after it.
+
     Args:
         df: Input DataFrame
         req: Cleaning request parameters
-    
+        model_path: Where to cache the fitted outlier model (see
+            utils.outliers.outlier_model_path)
+        hash_path: Where to cache the row hashes (see
+            utils.hashindex.row_hash_cache_path)
+        cache_key: (artifact name, content hash) identifying the input
+        plan: Plan to run (defaults to planning without a profile)
+        progress: Called as progress(step, "pending", cost=...) for every
+            planned step up front, with its estimated relative cost, then
+            as progress(step, state) when it starts ("running") and ends
+            ("done", "cached" or "failed")
+
     Returns:
         Tuple of (cleaned DataFrame, summary statistics, audit log)
     """
     try:
         validate_dataframe(df)
-        
-        before = df.copy()
+
+        if plan is None:
+            plan = plan_clean(req, df.head(0), len(df))
         audit = {"steps": []}
         summary = {
             "imputation": {},
             "outliers_removed": 0,
             "duplicates_removed": 0,
             "rows_before": len(df),
-            "rows_after": len(df)
+            "rows_after": len(df),
+            "cached_steps": [],
+            "plan": plan
         }
-        
-        # Imputation
-        if req.impute:
-            for col in df.select_dtypes(include=["number", "object"]):
-                if df[col].isnull().any():
-                    try:
-                        if req.impute == "mean" and pd.api.types.is_numeric_dtype(df[col]):
-                            df[col].fillna(df[col].mean(), inplace=True)
-                            audit["steps"].append({"action": "impute_mean", "column": col})
-                            summary["imputation"][col] = "mean"
-                        elif req.impute == "median" and pd.api.types.is_numeric_dtype(df[col]):
-                            df[col].fillna(df[col].median(), inplace=True)
-                            audit["steps"].append({"action": "impute_median", "column": col})
-                            summary["imputation"][col] = "median"
-                        else:
-                            mode_value = df[col].mode().iloc[0]
-                            df[col].fillna(mode_value, inplace=True)
-                            audit["steps"].append({"action": "impute_mode", "column": col})
-                            summary["imputation"][col] = "mode"
-                    except Exception as e:
-                        logger.warning(f"Failed to impute column {col}: {str(e)}")
-                        continue
-        
-        # Outlier removal
-        if req.outlier:
-            try:
-                num_cols = df.select_dtypes(include=["number"]).columns
-                if len(num_cols) > 0:
-                    # Handle missing values before outlier detection
-                    X = df[num_cols].fillna(df[num_cols].mean())
-                    iso = IsolationForest(contamination=0.05, random_state=42)
-                    preds = iso.fit_predict(X)
-                    outlier_rows = df.index[preds == -1].tolist()
-                    df = df[preds != -1]
-                    audit["steps"].append({
-                        "action": "remove_outliers",
-                        "rows": outlier_rows,
-                        "columns": list(num_cols)
-                    })
-                    summary["outliers_removed"] = len(outlier_rows)
-            except Exception as e:
-                logger.warning(f"Failed to remove outliers: {str(e)}")
-        
-        # Duplicates
-        if req.dedupe:
+        input_bytes = frame_nbytes(df)
+        key = (cache_key[0], "input", cache_key[1]) if cache_key else None
+        if progress:
+            for entry in plan["steps"]:
+                progress(entry["step"], "pending", cost=entry.get("cost"))
+
+        def run(step: str, params: Any, compute: Callable[[], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            nonlocal key
+            key = _step_key(key, step, params)
+            if progress:
+                progress(step, "running")
             try:
-                dup_rows = df[df.duplicated()].index.tolist()
-                df = df.drop_duplicates()
-                audit["steps"].append({
-                    "action": "remove_duplicates",
-                    "rows": dup_rows
-                })
-                summary["duplicates_removed"] = len(dup_rows)
+                result, cached = _run_step(key, compute)
             except Exception as e:
-                logger.warning(f"Failed to remove duplicates: {str(e)}")
-        
+                logger.warning(f"Failed to run cleaning step {step}: {str(e)}")
+                if progress:
+                    progress(step, "failed")
+                # Later steps must not reuse results built on a failed step
+                key = None
+                return None
+            if progress:
+                progress(step, "cached" if cached else "done")
+            if cached:
+                summary["cached_steps"].append(step)
+            audit["steps"].extend(result["steps"])
+            summary.update(result["summary"])
+            return result
+
+        with track_peak_memory(TRACE_CLEAN_MEMORY) as memory:
+            keep = np.ones(len(df), dtype=bool)
+            # Rows left before a dedupe moved in front of the outlier step,
+            # which the detector is still fitted on
+            fit_mask = None
+            # Float64 numeric columns shared by fused steps
+            shared = {} if any(entry.get("fused") for entry in plan["steps"]) else None
+
+            for entry in plan["steps"]:
+                step = entry["step"]
+                if step == "impute":
+                    imputed = run("impute", req.impute, lambda: _impute_step(df, req, keep))
+                    if imputed and imputed["filled"] is not None:
+                        filled = imputed["filled"]
+                        df = pd.DataFrame(
+                            {col: filled[col] if col in filled.columns else df[col] for col in df.columns},
+                            index=df.index,
+                            copy=False
+                        )
+                elif step == "outliers":
+                    fit = fit_mask if entry.get("reordered") else keep
+                    score = keep.copy()
+                    outliers = run(
+                        "outliers",
+                        {"params": outlier_params(req), "reordered": bool(entry.get("reordered"))},
+                        lambda: _outlier_step(df, req, model_path, fit, score, shared)
+                    )
+                    if outliers and outliers["mask"] is not None:
+                        keep &= ~outliers["mask"]
+                elif step == "dedupe":
+                    if entry.get("reordered"):
+                        fit_mask = keep.copy()
+                    candidates = keep.copy()
+                    duplicates = run(
+                        "dedupe",
+                        {"columns": req.dedupe_columns, "keep": req.dedupe_keep},
+                        lambda: _dedupe_step(df, candidates, req, hash_path, shared)
+                    )
+                    if duplicates:
+                        keep &= ~duplicates["mask"]
+
+            # Conversions and step results are freed before the rows are copied
+            shared = imputed = outliers = duplicates = None
+            if not keep.all():
+                df = df[keep]
+
         summary["rows_after"] = len(df)
+        summary["memory"] = {
+            "input_bytes": input_bytes,
+            "peak_bytes": memory["peak_bytes"],
+            "peak_ratio": round(memory["peak_bytes"] / input_bytes, 3) if input_bytes and memory["peak_bytes"] is not None else None,
+            # Covers the whole process, not just this clean
+            "peak_rss_bytes": memory["peak_rss_bytes"]
+        }
         return df, summary, audit
-        
+
     except Exception as e:
         logger.error(f"Error cleaning data: {str(e)}")
         raise CleaningError(f"Failed to clean data: {str(e)}")
 
-def suggest_features(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+# Distinct values counted per column for modes when cleaning in chunks
+MODE_TRACK_VALUES = 10000
+# Rows per block of the backward duplicate scan for keep="last"
+HASH_SCAN_ROWS = 65536
+
+def _is_imputable(dtype) -> bool:
+    return (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)) \
+        or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype)
+
+def _fill_chunk(chunk: pd.DataFrame, values: Dict[str, Any]) -> pd.DataFrame:
+    """Apply fill values to a chunk, adding mode values missing from a chunk's categories."""
+    values = {col: value for col, value in values.items() if col in chunk.columns}
+    if not values:
+        return chunk
+    added = {}
+    for col, value in values.items():
+        col_data = chunk[col]
+        if isinstance(col_data.dtype, pd.CategoricalDtype) and value not in col_data.cat.categories:
+            added[col] = col_data.cat.add_categories([value])
+    if added:
+        chunk = chunk.assign(**added)
+    return chunk.fillna(values)
+
+def _stream_statistics(
+    chunks: Iterable[pd.DataFrame],
+    req: CleanRequest,
+    missing_columns: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    First pass of auto_clean_chunks: global fill values and a row sample.
+
+    Numeric columns get exact means (Moments). Columns that may be imputed
+    (all, or only `missing_columns` when given) also get KLL medians when
+    the median is requested, or truncated value counts for the mode.
+    """
+    imputed = set(missing_columns) if missing_columns is not None else None
+    moments, medians, modes = {}, {}, {}
+    missing = None
+    num_cols: List[str] = []
+    reservoir = Reservoir(OUTLIER_SAMPLE_ROWS, seed=42)
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        if missing is None:
+            num_cols = select_columns(chunk, ["number"])
+            missing = pd.Series(False, index=chunk.columns)
+        missing |= chunk.isna().any()
+        for col in chunk.columns:
+            col_data = chunk[col]
+            impute = bool(req.impute) and (imputed is None or col in imputed)
+            if col in num_cols:
+                values = col_data.to_numpy(dtype="float64", na_value=np.nan)
+                values = values[~np.isnan(values)]
+                moments.setdefault(col, Moments()).update(values)
+                if not impute:
+                    continue
+                if req.impute == "median":
+                    medians.setdefault(col, KLLSketch(seed=42)).update(values)
+                elif req.impute != "mean":
+                    modes.setdefault(col, TopCounts(MODE_TRACK_VALUES)).update(col_data)
+            elif impute and _is_imputable(col_data.dtype):
+                modes.setdefault(col, TopCounts(MODE_TRACK_VALUES)).update(col_data)
+        if req.outlier and num_cols:
+            reservoir.update(chunk[num_cols])
+
+    fills = {}
+    if req.impute and missing is not None:
+        for col in missing.index[missing.to_numpy()]:
+            if col in moments and req.impute == "mean":
+                value, strategy = moments[col].mean if moments[col].count else np.nan, "mean"
+            elif col in medians:
+                value, strategy = medians[col].quantiles([0.5])[0], "median"
+            elif col in modes:
+                value, strategy = modes[col].most_common(), "mode"
+            else:
+                continue
+            if not pd.isna(value):
+                fills[col] = (value, strategy)
+    return {
+        "fills": fills,
+        "num_cols": num_cols,
+        "means": np.array([moments[col].mean if moments[col].count else 0.0 for col in num_cols]),
+        "sample": reservoir.sample,
+        "rows": rows
+    }
+
+def auto_clean_chunks(
+    make_chunks: Callable[[], Iterable[pd.DataFrame]],
+    req: CleanRequest,
+    write_chunk: Callable[[pd.DataFrame], None],
+    model_path: Optional[str] = None,
+    hash_path: Optional[str] = None,
+    progress: Optional[Callable[..., None]] = None,
+    total_rows: Optional[int] = None,
+    missing_columns: Optional[List[str]] = None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Clean data that does not fit in memory, one chunk at a time.
+
+    The data is read twice. The first pass computes global fill values and
+    draws a uniform sample of the numeric columns, on which the outlier
+    model (or iqr/zscore/mad detector) is fitted; means are exact, medians
+    come from a KLL sketch. The second pass imputes each chunk, flags
+    outliers with the fitted model, drops rows whose hash is in a temporary
+    index of the rows kept from earlier chunks, and hands the kept rows to `write_chunk`. Row sets in the
+    audit hold positions in the whole input, so results match auto_clean
+    apart from the approximate median and the outlier threshold being taken
+    from the sample.
+
+    Keeping the last duplicate needs a third pass: the second records row
+    hashes and outlier flags in memory-mapped files, a backward scan over
+    them picks the rows to keep, and the third pass writes them.
+
+    Args:
+        make_chunks: Returns a fresh iterator over the input chunks
+        req: Cleaning request parameters
+        write_chunk: Called with the cleaned rows of every chunk
+        model_path: Where to cache the fitted outlier model
+        hash_path: Where to cache the row hashes (see
+            utils.hashindex.row_hash_cache_path)
+        progress: Called as progress(step, state, rows=..., total=...) for
+            each pass ("statistics", "clean" and, with keep="last",
+            "keep_last") with the rows read so far
+        total_rows: Number of input rows, if known, reported as the total
+            of the first pass
+        missing_columns: Columns known to hold missing values, e.g. from
+            the artifact's statistics; only they are tracked for fill
+            values. All columns are if omitted.
+
+    Returns:
+        Tuple of (summary statistics, audit log)
+    """
+    temp_dir = hashes_out = None
+    report = progress or (lambda step, state, rows=None, total=None: None)
+
+    def counted(chunks):
+        seen = 0
+        for chunk in chunks:
+            yield chunk
+            seen += len(chunk)
+            report("statistics", "running", rows=seen, total=total_rows)
+
+    try:
+        report("statistics", "running", rows=0, total=total_rows)
+        stats = _stream_statistics(counted(make_chunks()), req, missing_columns)
+        fills = {col: value for col, (value, _) in stats["fills"].items()}
+        num_cols = stats["num_cols"]
+
+        audit = {"steps": []}
+        summary = {
+            "imputation": {col: strategy for col, (_, strategy) in stats["fills"].items()},
+            "outliers_removed": 0,
+            "duplicates_removed": 0,
+            "rows_before": 0,
+            "rows_after": 0
+        }
+        for col, strategy in summary["imputation"].items():
+            audit["steps"].append({"action": f"impute_{strategy}", "column": col})
+
+        flag_outliers = None
+        if req.outlier and num_cols and stats["sample"] is not None:
+            try:
+                sample = _fill_chunk(stats["sample"], fills)
+                if req.outlier_method == "isolation_forest":
+                    X = outlier_matrix(sample, num_cols, stats["means"])
+                    model, cached = fit_outlier_model(X, outlier_params(req), model_path)
+                    summary["outlier_model"] = {"cached": cached, "fit_rows": len(X)}
+
+                    def flag_outliers(chunk):
+                        return predict_outliers(model, outlier_matrix(chunk, num_cols, stats["means"]))
+                else:
+                    detector = RobustDetector(req.outlier_method, req.outlier_scope, req.outlier_threshold)
+                    flag_outliers = detector.fit(sample, num_cols).predict
+            except Exception as e:
+                logger.warning(f"Failed to fit outlier model: {str(e)}")
+        temp_dir = tempfile.mkdtemp(prefix="clean-")
+        hash_index = RowHashIndex(os.path.join(temp_dir, "index")) if req.dedupe else None
+        keep_last = req.dedupe and req.dedupe_keep == "last"
+
+        rows = stats["rows"]
+        hashes_out = None
+        cached = load_row_hashes(hash_path, rows) if req.dedupe else None
+        if req.dedupe:
+            summary["row_hashes_cached"] = cached is not None
+        if req.dedupe and cached is None and (hash_path or keep_last):
+            hashes_file = f"{hash_path}.{uuid.uuid4().hex}.tmp.npy" if hash_path else os.path.join(temp_dir, "hashes.npy")
+            hashes_out = np.lib.format.open_memmap(hashes_file, mode="w+", dtype=np.uint64, shape=(rows,))
+        # With keep="last" the rows to keep are only known after a backward
+        # scan, so the second pass records them and a third one writes
+        if keep_last:
+            kept_rows, dup_flags = (
+                np.lib.format.open_memmap(os.path.join(temp_dir, f"{flags}.npy"), mode="w+", dtype=bool, shape=(rows,))
+                for flags in ["keep", "dups"]
+            )
+
+        report("statistics", "done", rows=rows, total=rows)
+        report("clean", "running", rows=0, total=rows)
+        outlier_rows, dup_rows = RowSetBuilder(), RowSetBuilder()
+        offset = 0
+        for chunk in make_chunks():
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            rows_slice = slice(offset, offset + len(chunk))
+            offset += len(chunk)
+            chunk = _fill_chunk(chunk, fills)
+            keep = np.ones(len(chunk), dtype=bool)
+            if flag_outliers is not None:
+                outliers = flag_outliers(chunk)
+                keep &= ~outliers
+                outlier_rows.append(outliers)
+            if req.dedupe:
+                hashes = cached[rows_slice] if cached is not None else row_hashes(chunk, req.dedupe_columns)
+                if hashes_out is not None:
+                    hashes_out[rows_slice] = hashes
+                if keep_last:
+                    kept_rows[rows_slice] = keep
+                    report("clean", "running", rows=offset, total=rows)
+                    continue
+                duplicates = duplicate_mask(hashes, keep, "first", hash_index)
+                keep &= ~duplicates
+                dup_rows.append(duplicates)
+            kept = chunk if keep.all() else chunk[keep]
+            summary["rows_after"] += len(kept)
+            write_chunk(kept)
+            report("clean", "running", rows=offset, total=rows)
+        report("clean", "done", rows=offset, total=rows)
+
+        if hashes_out is not None:
+            hashes_out.flush()
+            if hash_path:
+                os.replace(hashes_out.filename, hash_path)
+        if keep_last:
+            report("keep_last", "running", rows=0, total=rows)
+            hashes = cached if cached is not None else hashes_out
+            # Walking backwards, the first occurrence seen is the last one
+            for end in range(rows, 0, -HASH_SCAN_ROWS):
+                block = slice(max(end - HASH_SCAN_ROWS, 0), end)
+                duplicates = duplicate_mask(hashes[block][::-1], kept_rows[block][::-1], "first", hash_index)[::-1]
+                kept_rows[block] &= ~duplicates
+                dup_flags[block] = duplicates
+            offset = 0
+            for chunk in make_chunks():
+                chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+                keep = np.asarray(kept_rows[offset:offset + len(chunk)])
+                dup_rows.append(dup_flags[offset:offset + len(chunk)])
+                offset += len(chunk)
+                kept = _fill_chunk(chunk[keep], fills)
+                summary["rows_after"] += len(kept)
+                write_chunk(kept)
+                report("keep_last", "running", rows=offset, total=rows)
+            report("keep_last", "done", rows=offset, total=rows)
+
+        summary["rows_before"] = offset
+        if flag_outliers is not None:
+            audit["steps"].append({
+                "action": "remove_outliers",
+                "rows": outlier_rows.finish(),
+                "columns": num_cols,
+                "params": outlier_params(req)
+            })
+            summary["outliers_removed"] = outlier_rows.count
+        if req.dedupe:
+            hash_index.flush()
+            audit["steps"].append({
+                "action": "remove_duplicates",
+                "rows": dup_rows.finish(),
+                "columns": req.dedupe_columns,
+                "keep": req.dedupe_keep
+            })
+            summary["duplicates_removed"] = dup_rows.count
+        return summary, audit
+
+    except Exception as e:
+        logger.error(f"Error cleaning data in chunks: {str(e)}")
+        raise CleaningError(f"Failed to clean data: {str(e)}")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if hashes_out is not None and os.path.exists(hashes_out.filename):
+            os.remove(hashes_out.filename)
+
+def suggest_features(
+    df: pd.DataFrame,
+    date_formats: Optional[Dict[str, Optional[str]]] = None,
+    ratio_top_k: int = 50,
+    ratio_offset: int = 0
+) -> Dict[str, Any]:
     """
     Suggest feature engineering operations for the DataFrame.
     
+    Text columns are suggested for date parting when most of their values
+    parse with one explicit format, inferred from a sample (see
+    utils.dates.infer_date_formats). Ratio suggestions are ranked by
+    how useful they are likely to be and returned a page at a time (see
+    utils.ratios.rank_ratio_pairs).
+    
     Args:
         df: Input DataFrame
+        date_formats: Date formats found earlier by column, None for
+            columns that are not dates; these are not inspected again
+        ratio_top_k: Number of ratio suggestions to return
+        ratio_offset: Number of top-ranked ratio suggestions to skip
     
     Returns:
-        Dictionary containing feature suggestions
+        Dictionary containing feature suggestions, the date format of
+        every text column and the paging of the ratio suggestions
     """
     try:
         validate_dataframe(df)
@@ -175,34 +924,33 @@ def suggest_features(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
         suggestions = []
         
         # Date parsing
-        for col in df.select_dtypes(include=["datetime", "object"]):
-            try:
-                parsed = pd.to_datetime(df[col], errors="coerce")
-                if parsed.notnull().any():
-                    suggestions.append({
-                        "column": col,
-                        "type": "date_parting",
-                        "parts": ["year", "month", "day", "weekday"],
-                        "reason": "Column contains date-like values."
-                    })
-            except Exception:
-                continue
+        formats = infer_date_formats(df, date_formats)
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col].dtype) or formats.get(col):
+                suggestion = {
+                    "column": col,
+                    "type": "date_parting",
+                    "parts": ["year", "month", "day", "weekday"],
+                    "reason": "Column contains date-like values."
+                }
+                if formats.get(col):
+                    suggestion["format"] = formats[col]
+                suggestions.append(suggestion)
         
         # Ratios
-        num_cols = df.select_dtypes(include=["number"]).columns
-        if len(num_cols) >= 2:
-            for i, col1 in enumerate(num_cols):
-                for col2 in num_cols[i+1:]:
-                    # Check if ratio would be meaningful
-                    if df[col2].abs().min() > 0:  # Avoid division by zero
-                        suggestions.append({
-                            "type": "ratio",
-                            "columns": [col1, col2],
-                            "reason": f"Ratio of {col1}/{col2} may be meaningful."
-                        })
+        num_cols = select_columns(df, ["number"])
+        ratios = rank_ratio_pairs(df, num_cols, ratio_top_k, ratio_offset)
+        for pair in ratios["pairs"]:
+            col1, col2 = pair["columns"]
+            suggestions.append({
+                "type": "ratio",
+                "columns": [col1, col2],
+                "score": pair["score"],
+                "reason": f"Ratio of {col1}/{col2} may be meaningful."
+            })
         
         # One-hot encoding
-        for col in df.select_dtypes(include=["object", "category"]):
+        for col in select_columns(df, ["object", "string", "category"]):
             if df[col].nunique() < 20:
                 suggestions.append({
                     "column": col,
@@ -210,7 +958,11 @@ def suggest_features(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
                     "reason": "Low cardinality categorical column."
                 })
         
-        return {"suggestions": suggestions}
+        return {
+            "suggestions": suggestions,
+            "date_formats": formats,
+            "ratios": {"total": ratios["total"], "offset": ratio_offset, "top_k": ratio_top_k}
+        }
         
     except Exception as e:
         logger.error(f"Error suggesting features: {str(e)}")
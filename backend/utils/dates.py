@@ -0,0 +1,119 @@
+import os
+import warnings
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from typing import Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Non-null values a column's date format is inferred from
+DATE_SAMPLE_ROWS = 1000
+# Distinct sampled values whose formats are guessed
+DATE_GUESS_VALUES = 5
+# Share of non-null values that must parse for a column to count as dates
+DATE_MIN_PARSE_RATIO = float(os.getenv("DATE_MIN_PARSE_RATIO", "0.9"))
+
+def guess_formats(values: Iterable, known: Optional[str] = None) -> List[str]:
+    """
+    Guess candidate strftime formats of date strings.
+
+    Ambiguous dates like 01/02/2020 get both day orders as candidates.
+
+    Args:
+        values: Date strings to guess from
+        known: Format to try first, e.g. one stored for the column earlier
+
+    Returns:
+        Distinct candidate formats, most likely first
+    """
+    guesses = [known] if known else []
+    with warnings.catch_warnings():
+        # pandas warns when a guess contradicts the dayfirst setting
+        warnings.simplefilter("ignore", UserWarning)
+        for value in values:
+            if not isinstance(value, str):
+                continue
+            guesses += [guess_datetime_format(value), guess_datetime_format(value, dayfirst=True)]
+    return list(dict.fromkeys(fmt for fmt in guesses if fmt))
+
+def parse_ratio(values: pd.Series, fmt: str) -> float:
+    """Return the share of non-null values that parse with an explicit format."""
+    values = values.dropna()
+    if values.empty:
+        return 0.0
+    return float(pd.to_datetime(values, format=fmt, errors="coerce").notna().mean())
+
+def _is_text(dtype) -> bool:
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+def detect_date_format(
+    s: pd.Series,
+    known: Optional[str] = None,
+    min_ratio: float = DATE_MIN_PARSE_RATIO
+) -> Optional[str]:
+    """
+    Infer the date format of a text column from a sample of its values.
+
+    Formats are guessed from a few distinct sampled values and checked
+    against DATE_SAMPLE_ROWS sampled non-null values with vectorized
+    parses, so dateutil never parses the column row by row.
+
+    Args:
+        s: Column to inspect
+        known: Format to try first
+        min_ratio: Share of sampled values that must parse
+
+    Returns:
+        The format most sampled values parse with, or None if the column
+        is not text or not dates
+    """
+    if not _is_text(s.dtype):
+        return None
+    values = s.dropna()
+    if values.empty:
+        return None
+    if len(values) > DATE_SAMPLE_ROWS:
+        values = values.sample(DATE_SAMPLE_ROWS, random_state=42)
+    candidates = guess_formats(values.drop_duplicates().iloc[:DATE_GUESS_VALUES], known)
+    best, best_ratio = None, 0.0
+    for fmt in candidates:
+        ratio = parse_ratio(values, fmt)
+        if ratio > best_ratio:
+            best, best_ratio = fmt, ratio
+    return best if best_ratio >= min_ratio else None
+
+def infer_date_formats(
+    df: pd.DataFrame,
+    known: Optional[Dict[str, Optional[str]]] = None,
+    min_ratio: float = DATE_MIN_PARSE_RATIO
+) -> Dict[str, Optional[str]]:
+    """
+    Find the date format of every text column.
+
+    Each column is first checked on a sample (see detect_date_format);
+    only columns that pass are parsed in full, with the inferred format,
+    to confirm it. Columns listed in `known` are not inspected again.
+
+    Args:
+        df: Input DataFrame
+        known: Formats found earlier by column, None for columns that are
+            not dates
+        min_ratio: Share of non-null values that must parse
+
+    Returns:
+        Format of every text column, None for those that are not dates
+    """
+    known = known or {}
+    formats = {}
+    for col in df.columns:
+        if not _is_text(df[col].dtype):
+            continue
+        if col in known:
+            formats[col] = known[col]
+            continue
+        fmt = detect_date_format(df[col], min_ratio=min_ratio)
+        if fmt is not None and parse_ratio(df[col], fmt) < min_ratio:
+            fmt = None
+        formats[col] = fmt
+    return formats
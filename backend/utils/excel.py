@@ -0,0 +1,94 @@
+import csv
+import os
+import uuid
+from typing import List, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ExcelError(Exception):
+    """Custom exception for Excel conversion errors"""
+    pass
+
+def list_sheets(file_path: str) -> List[str]:
+    """
+    List worksheet names without loading cell data.
+
+    Args:
+        file_path: Path to an `.xlsx` workbook
+
+    Returns:
+        Sheet names in workbook order
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def _header(row: tuple) -> List[str]:
+    # Match pandas naming for blank header cells
+    return [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(row)]
+
+def excel_to_csv(
+    file_path: str,
+    csv_path: str,
+    sheet: Optional[Union[str, int]] = None
+) -> int:
+    """
+    Stream one sheet of an `.xlsx` workbook into a CSV file.
+
+    The workbook is opened in openpyxl read-only mode and rows are written
+    as they are read, so memory stays flat regardless of sheet size.
+    Completely empty rows are skipped.
+
+    Args:
+        file_path: Path to the workbook
+        csv_path: Destination CSV path
+        sheet: Sheet name or index (defaults to the first sheet)
+
+    Returns:
+        Number of data rows written
+
+    Raises:
+        ExcelError: If the sheet does not exist or the workbook cannot be read
+    """
+    from openpyxl import load_workbook
+    tmp = f"{csv_path}.{uuid.uuid4().hex}.tmp"
+    rows = 0
+    try:
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            if sheet is None:
+                ws = wb.worksheets[0]
+            elif isinstance(sheet, int):
+                ws = wb.worksheets[sheet]
+            else:
+                ws = wb[sheet]
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                it = ws.iter_rows(values_only=True)
+                header = next(it, None)
+                if header is None:
+                    raise ExcelError("Sheet is empty")
+                writer.writerow(_header(header))
+                for row in it:
+                    if all(v is None for v in row):
+                        continue
+                    writer.writerow(["" if v is None else v for v in row])
+                    rows += 1
+        finally:
+            wb.close()
+        os.replace(tmp, csv_path)
+        return rows
+    except (KeyError, IndexError):
+        raise ExcelError(f"Sheet not found: {sheet}")
+    except ExcelError:
+        raise
+    except Exception as e:
+        logger.error(f"Error converting {file_path}: {str(e)}")
+        raise ExcelError(f"Failed to read workbook: {str(e)}")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
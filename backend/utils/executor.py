@@ -0,0 +1,300 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, List, Optional
+from fastapi import HTTPException
+from utils.cache import cache_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Threads for blocking I/O: Supabase calls, file reads and writes
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+# Processes for CPU-bound DataFrame work
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+# How pool workers are started: forking the threaded API process can copy
+# locks held by other threads, so workers come from a clean server process
+POOL_START_METHOD = os.getenv("POOL_START_METHOD", "forkserver")
+# Requests each endpoint handles at once (override per endpoint with e.g.
+# PROFILE_CONCURRENCY), and how many more may wait for a slot before
+# new ones are refused
+ENDPOINT_CONCURRENCY = int(os.getenv("ENDPOINT_CONCURRENCY", "8"))
+ENDPOINT_QUEUE = int(os.getenv("ENDPOINT_QUEUE", "32"))
+# Queue waits kept per pool or endpoint for the percentiles in the metrics
+WAIT_SAMPLES = 1024
+
+class Overloaded(Exception):
+    """Custom exception for requests refused because an endpoint's queue is full"""
+    pass
+
+class WaitStats:
+    """Counts of queued work and how long it waited to start."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rejected = 0
+        self._recent: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counts and wait times in seconds (percentiles over recent waits)."""
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, longest, rejected = self.count, self.total, self.max, self.rejected
+        def percentile(q):
+            return round(recent[min(int(q * len(recent)), len(recent) - 1)], 6) if recent else None
+        return {
+            "count": count,
+            "rejected": rejected,
+            "wait_mean": round(total / count, 6) if count else None,
+            "wait_p50": percentile(0.5),
+            "wait_p95": percentile(0.95),
+            "wait_max": round(longest, 6)
+        }
+
+_lock = threading.Lock()
+# Set in pool worker processes
+_pool_worker = False
+_io_pool: Optional[ThreadPoolExecutor] = None
+_process_pools: Dict[str, ProcessPoolExecutor] = {}
+_pool_sizes: Dict[str, int] = {"cpu": CPU_WORKERS}
+_pending: Dict[str, int] = {}
+_waits: Dict[str, WaitStats] = {}
+_endpoints: Dict[str, Dict[str, Any]] = {}
+# Latest cache stats reported by each pool's workers, by process ID
+_worker_caches: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+def _stats(name: str) -> WaitStats:
+    with _lock:
+        if name not in _waits:
+            _waits[name] = WaitStats()
+        return _waits[name]
+
+def _add_pending(name: str, delta: int) -> None:
+    with _lock:
+        _pending[name] = _pending.get(name, 0) + delta
+
+def io_pool() -> ThreadPoolExecutor:
+    """Return the shared thread pool for blocking I/O."""
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+        return _io_pool
+
+def register_pool(name: str, workers: int) -> None:
+    """Set the size of a named process pool before its first use."""
+    with _lock:
+        _pool_sizes[name] = workers
+
+def _init_worker() -> None:
+    global _pool_worker
+    _pool_worker = True
+
+def in_pool_worker() -> bool:
+    """Return whether this process is a pool worker, which already has a core to itself."""
+    return _pool_worker
+
+def process_pool(name: str = "cpu") -> ProcessPoolExecutor:
+    """Return a named process pool ("cpu" unless registered otherwise)."""
+    with _lock:
+        if name not in _process_pools:
+            _process_pools[name] = ProcessPoolExecutor(
+                max_workers=_pool_sizes.get(name, CPU_WORKERS),
+                mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                initializer=_init_worker
+            )
+        return _process_pools[name]
+
+def reset_pool(name: str, broken: Optional[ProcessPoolExecutor] = None) -> None:
+    """
+    Drop a broken process pool so the next submission starts a new one.
+
+    Args:
+        name: Pool name
+        broken: Only drop the pool if it is still this one
+    """
+    with _lock:
+        if broken is not None and _process_pools.get(name) is not broken:
+            return
+        pool = _process_pools.pop(name, None)
+        _worker_caches.pop(name, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+class _WorkerHTTPError(Exception):
+    """HTTPException raised in a worker; HTTPException itself does not unpickle"""
+
+    def __init__(self, status_code: int, detail: Any, headers: Optional[Dict[str, str]] = None):
+        super().__init__(status_code, detail, headers)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+def _timed_call(fn: Callable[..., Any], args: tuple, kwargs: dict) -> tuple:
+    """Worker: run fn and report when it started and the worker's cache stats."""
+    started = time.time()
+    try:
+        return started, fn(*args, **kwargs), os.getpid(), cache_stats()
+    except HTTPException as e:
+        raise _WorkerHTTPError(e.status_code, e.detail, e.headers) from None
+
+def submit_process(pool: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """
+    Run fn(*args, **kwargs) in a named process pool, recording how long it
+    queued. fn must be a module-level function and its arguments picklable.
+    HTTPExceptions raised by fn are re-raised as such, and a pool whose
+    worker died is replaced for later submissions. Work cancelled by a
+    pool reset cancels the returned future.
+
+    Returns:
+        Future resolving to fn's result
+    """
+    submitted = time.time()
+    result = Future()
+    _add_pending(pool, 1)
+
+    def done(source: Future) -> None:
+        _add_pending(pool, -1)
+        if source.cancelled():
+            result.cancel()
+            return
+        error = source.exception()
+        if isinstance(error, _WorkerHTTPError):
+            error = HTTPException(status_code=error.status_code, detail=error.detail, headers=error.headers)
+        elif isinstance(error, BrokenProcessPool):
+            reset_pool(pool, executor)
+        if error is not None:
+            result.set_exception(error)
+            return
+        started, value, pid, caches = source.result()
+        _stats(pool).record(started - submitted)
+        with _lock:
+            _worker_caches.setdefault(pool, {})[pid] = caches
+        result.set_result(value)
+
+    executor = process_pool(pool)
+    try:
+        source = executor.submit(_timed_call, fn, args, kwargs)
+    except Exception as e:
+        _add_pending(pool, -1)
+        if isinstance(e, BrokenProcessPool):
+            reset_pool(pool, executor)
+        raise
+    source.add_done_callback(done)
+    return result
+
+def submit_thread(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Run fn(*args, **kwargs) in the I/O thread pool, recording how long it queued."""
+    submitted = time.monotonic()
+    _add_pending("io", 1)
+
+    def call():
+        _stats("io").record(time.monotonic() - submitted)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _add_pending("io", -1)
+
+    try:
+        return io_pool().submit(call)
+    except Exception:
+        _add_pending("io", -1)
+        raise
+
+async def run_in_thread(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Await a blocking call (Supabase, file I/O) run in the I/O thread pool."""
+    return await asyncio.wrap_future(submit_thread(fn, *args, **kwargs))
+
+async def run_in_process(fn: Callable[..., Any], *args: Any, pool: str = "cpu", **kwargs: Any) -> Any:
+    """Await CPU-bound work run in a process pool (see submit_process)."""
+    return await asyncio.wrap_future(submit_process(pool, fn, *args, **kwargs))
+
+def _endpoint(name: str) -> Dict[str, Any]:
+    with _lock:
+        if name not in _endpoints:
+            limit = int(os.getenv(f"{name.upper()}_CONCURRENCY", str(ENDPOINT_CONCURRENCY)))
+            _endpoints[name] = {"limit": limit, "active": 0, "waiting": 0, "slots": None}
+        return _endpoints[name]
+
+@asynccontextmanager
+async def endpoint_limit(name: str):
+    """
+    Hold one of an endpoint's concurrency slots for the duration of a block.
+
+    Requests beyond the limit wait for a slot; once ENDPOINT_QUEUE of them
+    are waiting, further ones are refused.
+
+    Raises:
+        Overloaded: If the endpoint's queue is full
+    """
+    endpoint = _endpoint(name)
+    stats = _stats(f"endpoint:{name}")
+    if endpoint["slots"] is None:
+        endpoint["slots"] = asyncio.Semaphore(endpoint["limit"])
+    if endpoint["slots"].locked() and endpoint["waiting"] >= ENDPOINT_QUEUE:
+        stats.reject()
+        raise Overloaded(f"Too many {name} requests in progress; try again later")
+    queued = time.monotonic()
+    endpoint["waiting"] += 1
+    try:
+        await endpoint["slots"].acquire()
+    finally:
+        endpoint["waiting"] -= 1
+    stats.record(time.monotonic() - queued)
+    endpoint["active"] += 1
+    try:
+        yield
+    finally:
+        endpoint["active"] -= 1
+        endpoint["slots"].release()
+
+def worker_cache_stats() -> List[Dict[str, Any]]:
+    """Return the cache stats last reported by each live pool worker."""
+    with _lock:
+        return [caches for workers in _worker_caches.values() for caches in workers.values()]
+
+def executor_stats() -> Dict[str, Any]:
+    """
+    Return the pools' pending work (submitted, not finished) and queue
+    waits, and each endpoint's slots in use, waiting requests and waits.
+    """
+    with _lock:
+        pools = {"io": IO_WORKERS, **_pool_sizes}
+        pending = dict(_pending)
+        endpoints = {name: dict(endpoint) for name, endpoint in _endpoints.items()}
+    return {
+        "pools": {
+            name: {"workers": workers, "pending": pending.get(name, 0), **_stats(name).stats()}
+            for name, workers in pools.items()
+        },
+        "endpoints": {
+            name: {
+                "limit": endpoint["limit"],
+                "active": endpoint["active"],
+                "waiting": endpoint["waiting"],
+                **_stats(f"endpoint:{name}").stats()
+            }
+            for name, endpoint in endpoints.items()
+        }
+    }
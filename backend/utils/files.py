@@ -0,0 +1,212 @@
+import os
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upload limits, overridable through the environment
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 ** 3)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 ** 2)))
+PREVIEW_ROWS = 5
+# Multipart framing (boundaries, part headers, form fields) allowed on top
+# of the file in an upload request body
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+    pass
+
+class UploadSizeLimit:
+    """
+    ASGI middleware refusing upload bodies larger than MAX_UPLOAD_BYTES
+    before they are parsed.
+
+    Starlette spools a multipart body to a temporary file before the
+    handler runs, so the cap in stream_to_disk alone only applies once
+    the whole upload has arrived. Requests declaring a larger
+    Content-Length get a 413 straight away; bodies without one are
+    counted as they arrive and cut off with a 413 once over the cap.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: Optional[int] = None):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes or MAX_UPLOAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        limit = self.max_bytes + UPLOAD_OVERHEAD_BYTES
+        detail = f"File exceeds the maximum upload size of {self.max_bytes} bytes"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def stream_to_disk(
+    file: UploadFile,
+    file_path: str,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> int:
+    """
+    Copy an uploaded file to disk chunk by chunk.
+
+    Only one chunk is held in memory at a time. The partial file is removed
+    if the size cap is exceeded. Uploads far over the cap are refused
+    earlier, while the body arrives (see UploadSizeLimit).
+
+    Args:
+        file: Incoming upload
+        file_path: Destination path
+        max_bytes: Size cap in bytes (defaults to MAX_UPLOAD_BYTES)
+        chunk_size: Read size in bytes (defaults to UPLOAD_CHUNK_BYTES)
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        FileTooLargeError: If the upload is larger than max_bytes
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or UPLOAD_CHUNK_BYTES
+    written = 0
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise FileTooLargeError(
+                        f"File exceeds the maximum upload size of {max_bytes} bytes"
+                    )
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return written
+
+def read_preview(file_path: str, rows: int = PREVIEW_ROWS, sheet: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse only the first rows of a CSV or Excel file.
+
+    Args:
+        file_path: Path to the data file
+        rows: Number of data rows to parse
+        sheet: Worksheet for Excel files (defaults to the first)
+
+    Returns:
+        DataFrame holding at most `rows` rows
+    """
+    if file_path.endswith(".csv"):
+        return pd.read_csv(file_path, nrows=rows)
+    return pd.read_excel(file_path, nrows=rows, sheet_name=sheet or 0)
+
+def preview_records(df: pd.DataFrame, rows: int = PREVIEW_ROWS) -> List[Dict[str, Any]]:
+    """
+    Convert the first rows of a DataFrame into JSON-safe records.
+
+    Missing values of any dtype (NaN, NaT, pd.NA) become None.
+
+    Args:
+        df: Input DataFrame
+        rows: Number of rows to convert
+
+    Returns:
+        List of row dictionaries
+    """
+    head = df.head(rows)
+    return head.astype(object).where(head.notna(), None).to_dict(orient="records")
+
+def count_csv_rows(file_path: str, chunk_size: Optional[int] = None) -> int:
+    """
+    Count data rows in a CSV by scanning for newlines.
+
+    The header line is excluded and a missing trailing newline is handled.
+    Quoted fields containing line breaks are counted as extra rows, so the
+    result is an upper bound for such files.
+
+    Args:
+        file_path: Path to the CSV file
+        chunk_size: Read size in bytes (defaults to UPLOAD_CHUNK_BYTES)
+
+    Returns:
+        Number of data rows
+    """
+    chunk_size = chunk_size or UPLOAD_CHUNK_BYTES
+    lines = 0
+    last = b""
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last and last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+def count_excel_rows(file_path: str, sheet: Optional[str] = None) -> int:
+    """
+    Count data rows in one sheet of an Excel workbook.
+
+    `.xlsx` files are streamed read-only, counting up to the last row with
+    a value as pandas does; the sheet's stored dimensions are not used, as
+    formatted empty rows count towards them. Legacy `.xls` files are parsed
+    with pandas.
+
+    Args:
+        file_path: Path to the workbook
+        sheet: Worksheet name (defaults to the first)
+
+    Returns:
+        Number of data rows
+    """
+    if file_path.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            last = 0
+            for i, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                if any(value is not None and value != "" for value in row):
+                    last = i
+            return max(last - 1, 0)
+        finally:
+            wb.close()
+    return len(pd.read_excel(file_path, usecols=[0], sheet_name=sheet or 0))
+
+def count_rows(file_path: str, sheet: Optional[str] = None) -> int:
+    """
+    Count data rows without building a DataFrame of the whole file.
+
+    Args:
+        file_path: Path to a CSV or Excel file
+        sheet: Worksheet for Excel files (defaults to the first)
+
+    Returns:
+        Number of data rows
+    """
+    if file_path.endswith(".csv"):
+        return count_csv_rows(file_path)
+    return count_excel_rows(file_path, sheet)
@@ -0,0 +1,266 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from schemas.clean import CleanRequest
+from utils.storage import row_hash_path, read_session_schema, artifact_name
+from utils.outliers import outlier_params
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hashes buffered in memory before they are written out as a sorted run
+FLUSH_HASHES = int(os.getenv("HASH_INDEX_FLUSH", str(4 * 1024 ** 2)))
+# Runs on disk before they are merged into one
+MAX_RUNS = 8
+# Bump whenever row hashing changes so cached hashes are not reused
+ROW_HASH_VERSION = "2"
+
+# Hashes float columns give 0.0 and NaN, patched over -0.0 and other NaNs
+_ZERO_HASH = pd.util.hash_array(np.array([0.0]))[0]
+_NAN_HASH = pd.util.hash_array(np.array([np.nan]))[0]
+
+def _column_hashes(series: pd.Series, values: Optional[Dict[str, np.ndarray]]) -> np.ndarray:
+    """Hash one column the way hash_pandas_object does, folding float -0.0 and NaNs."""
+    if not pd.api.types.is_float_dtype(series.dtype):
+        return pd.util.hash_pandas_object(series, index=False).to_numpy()
+    if values is not None and series.name in values:
+        column = values[series.name]
+    else:
+        column = series.to_numpy(dtype="float64", na_value=np.nan)
+        if values is not None:
+            values[series.name] = column
+    hashes = pd.util.hash_array(column)
+    hashes[column == 0] = _ZERO_HASH
+    hashes[np.isnan(column)] = _NAN_HASH
+    return hashes
+
+def row_hashes(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    values: Optional[Dict[str, np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Hash DataFrame rows to uint64, ignoring the index.
+
+    Columns are hashed in their own dtype, so integers beyond 2**53 stay
+    distinct. Float columns have -0.0 folded into 0.0 and every NaN made
+    the same, as duplicated() treats them. Each column is hashed on its own
+    and folded into the row hashes in place, as hash_pandas_object combines
+    them, so no copy of the frame is made.
+
+    Args:
+        df: Input DataFrame
+        columns: Only hash these columns (defaults to all)
+        values: float64 conversions of numeric columns shared with other
+            passes over the same frame; those of float columns are used,
+            and float conversions made here are added
+
+    Returns:
+        Array with one hash per row
+    """
+    names = list(columns) if columns is not None else list(df.columns)
+    out = np.full(len(df), 0x345678, dtype=np.uint64)
+    mult = np.uint64(1000003)
+    for i, col in enumerate(names):
+        out ^= _column_hashes(df[col], values)
+        out *= mult
+        mult += np.uint64(82520 + 2 * (len(names) - i))
+    out += np.uint64(97531)
+    return out
+
+def row_hash_cache_path(session_id: str, req: CleanRequest, streamed: bool = False) -> Optional[str]:
+    """
+    Return where the row hashes of a session's imputed data are cached.
+
+    Rows are hashed with the values the steps before dedupe leave, so the
+    key covers the imputation method when it runs first (and the outlier
+    settings when those decide which rows the fill values come from),
+    along with the path, the dedupe columns and the artifact's content
+    hash.
+
+    Args:
+        session_id: Cleaning session ID
+        req: Cleaning request parameters
+        streamed: Whether the hashes come from the chunked cleaner
+
+    Returns:
+        Hash file path, or None if the session has no stored content hash
+    """
+    meta = read_session_schema(session_id)
+    if not meta or not meta.get("content_hash"):
+        return None
+    upstream = req.steps[:req.steps.index("dedupe")] if "dedupe" in req.steps else []
+    impute = req.impute if "impute" in upstream else None
+    fill_rows = upstream[:upstream.index("impute")] if impute else []
+    outliers = outlier_params(req) if "outliers" in fill_rows else None
+    payload = json.dumps(
+        [ROW_HASH_VERSION, meta["content_hash"], impute, outliers, streamed, req.dedupe_columns],
+        default=str
+    )
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    return row_hash_path(artifact_name(session_id), key)
+
+def load_row_hashes(path: Optional[str], rows: int) -> Optional[np.ndarray]:
+    """Memory-map cached row hashes, or return None if they are missing or stale."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        hashes = np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable row hashes {path}: {str(e)}")
+        return None
+    return hashes if len(hashes) == rows else None
+
+def save_row_hashes(path: str, hashes: np.ndarray) -> None:
+    """Store row hashes atomically."""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp.npy"
+    try:
+        np.save(tmp, hashes)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not cache row hashes {path}: {str(e)}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _duplicated(hashes: np.ndarray, keep: str = "first") -> np.ndarray:
+    """
+    Flag repeated hashes as Series.duplicated does, from one sort of their
+    positions rather than a hash table, which takes about twice the memory.
+    """
+    order = np.argsort(hashes)
+    ranked = hashes[order]
+    repeat = ranked[1:] == ranked[:-1]
+    del ranked
+    in_run = np.zeros(len(hashes), dtype=bool)
+    in_run[1:] = repeat
+    in_run[:-1] |= repeat
+    # The sort is not stable, so the row kept from each run of equal
+    # hashes is the one with the lowest (or highest) position
+    members = np.flatnonzero(in_run)
+    duplicated = np.zeros(len(hashes), dtype=bool)
+    if not len(members):
+        return duplicated
+    # in_run is reused to mark where runs start
+    in_run[0] = True
+    np.logical_not(repeat, out=in_run[1:])
+    rows = order[members]
+    starts = np.flatnonzero(in_run[members])
+    duplicated[rows] = True
+    duplicated[(np.minimum if keep == "first" else np.maximum).reduceat(rows, starts)] = False
+    return duplicated
+
+def duplicate_mask(
+    hashes: np.ndarray,
+    candidates: np.ndarray,
+    keep: str = "first",
+    seen: Optional["RowHashIndex"] = None
+) -> np.ndarray:
+    """
+    Flag duplicate rows from their hashes with one sort.
+
+    Only rows where `candidates` is True take part. Rows whose hash is in
+    `seen` (rows kept earlier) are duplicates too, and the hashes of the
+    rows that survive are added to it.
+
+    Args:
+        hashes: Row hashes (see row_hashes)
+        candidates: Boolean mask of the rows to consider
+        keep: "first" or "last" occurrence to keep
+        seen: Index of hashes already kept
+
+    Returns:
+        Boolean mask, True for duplicates
+    """
+    positions = None if candidates.all() else np.flatnonzero(candidates)
+    subset = np.asarray(hashes if positions is None else hashes[positions])
+    local = _duplicated(subset, keep)
+    if seen is not None:
+        local |= seen.contains(subset)
+        seen.add(subset[~local])
+    if positions is None:
+        return local
+    duplicates = np.zeros(len(hashes), dtype=bool)
+    duplicates[positions[local]] = True
+    return duplicates
+
+class RowHashIndex:
+    """
+    Disk-backed set of 64-bit row hashes.
+
+    New hashes are buffered as sorted arrays and written out as sorted
+    `.npy` runs once FLUSH_HASHES have accumulated; when more than MAX_RUNS
+    runs exist they are merged into one. Lookups binary-search memory-mapped
+    runs, so only the buffer and the pages touched are held in memory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        self._runs = [np.load(path, mmap_mode="r") for path in self._run_paths()]
+
+    def _run_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), "run-*.npy")))
+
+    def __len__(self) -> int:
+        return self._buffered + sum(len(run) for run in self._runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Return a boolean mask of the hashes already in the index."""
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs + self._buffer:
+            if not len(run):
+                continue
+            pos = np.searchsorted(run, hashes)
+            hit = pos < len(run)
+            found[hit] |= run[pos[hit]] == hashes[hit]
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Insert hashes; callers are expected to skip ones already present."""
+        if not len(hashes):
+            return
+        self._buffer.append(np.sort(hashes.astype(np.uint64)))
+        self._buffered += len(hashes)
+        if self._buffered >= FLUSH_HASHES:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered hashes to disk as a new sorted run."""
+        if not self._buffered:
+            return
+        merged = np.sort(np.concatenate(self._buffer))
+        self._buffer, self._buffered = [], 0
+        self._write_run(merged)
+        if len(self._runs) > MAX_RUNS:
+            self._compact()
+
+    def _write_run(self, hashes: np.ndarray) -> None:
+        existing = self._run_paths()
+        number = int(os.path.basename(existing[-1])[4:-4]) + 1 if existing else 0
+        path = os.path.join(self.directory, f"run-{number:06d}.npy")
+        tmp = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp.npy")
+        np.save(tmp, hashes)
+        os.replace(tmp, path)
+        self._runs.append(np.load(path, mmap_mode="r"))
+
+    def _compact(self) -> None:
+        paths = self._run_paths()
+        merged = np.sort(np.concatenate([np.asarray(run) for run in self._runs]))
+        self._runs = []
+        self._write_run(merged)
+        for path in paths:
+            os.remove(path)
+
+    def clear(self) -> None:
+        """Drop every hash, in memory and on disk."""
+        self._buffer, self._buffered, self._runs = [], 0, []
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
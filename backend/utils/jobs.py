@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from utils.storage import job_path, latest_job_path, JOB_DIR
+from utils.executor import register_pool, submit_process
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Worker processes running background jobs, each in its own pool so a
+# session's jobs always reach the same worker and its step cache
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(max((os.cpu_count() or 1) // 2, 1))))
+# Jobs queued or running at once; further submissions are refused
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "16"))
+# Status files of finished jobs are removed after this many seconds
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# Minimum seconds between status writes that only update row counts
+PROGRESS_INTERVAL = 0.5
+
+for _worker in range(JOB_WORKERS):
+    register_pool(f"jobs-{_worker}", 1)
+
+_lock = threading.Lock()
+# Session of every job queued or running in this process
+_active: Dict[str, str] = {}
+# Sessions held by work running outside the job queue, e.g. batch cleans
+_held: Dict[str, str] = {}
+
+class JobQueueFull(Exception):
+    """Custom exception for jobs submitted while JOB_QUEUE_DEPTH jobs are in flight"""
+    pass
+
+class JobConflict(Exception):
+    """Custom exception for jobs submitted for a session that already has one in flight"""
+    pass
+
+def session_pool(session_id: str) -> str:
+    """
+    Return the single-worker pool a session's work runs in. Its jobs and
+    its profile, features and plan requests all go there, so they share
+    one worker's frame cache.
+    """
+    return f"jobs-{zlib.crc32(session_id.encode()) % JOB_WORKERS}"
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_job(job: Dict[str, Any]) -> None:
+    """Store a job's status atomically."""
+    _write_atomic(job_path(job["job_id"]), json.dumps(job, default=str))
+
+def read_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return a job's stored status, or None if it is unknown."""
+    path = job_path(job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def latest_job(session_id: str) -> Optional[Dict[str, Any]]:
+    """Return the stored status of a session's most recent job, if any."""
+    path = latest_job_path(session_id)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return read_job(f.read().strip())
+
+class JobProgress:
+    """
+    Progress callback of a running job, recording each step's state in the
+    job's status file.
+
+    Called as progress(step, state, rows=None, total=None, cost=None), with
+    the rows processed so far and their expected total, or the step's
+    estimated relative cost (see utils.plan). Steps are listed in the order
+    they are first reported and timed from "running" to any other state;
+    state changes are written at once and row counts at most every
+    PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job = job
+        self._written = 0.0
+
+    def __call__(
+        self,
+        step: str,
+        state: str,
+        rows: Optional[int] = None,
+        total: Optional[int] = None,
+        cost: Optional[float] = None
+    ) -> None:
+        entry = next((e for e in self.job["steps"] if e["step"] == step), None)
+        if entry is None:
+            entry = {"step": step, "state": None}
+            self.job["steps"].append(entry)
+        changed = entry["state"] != state
+        if changed and state == "running":
+            entry["started_at"] = time.time()
+        elif changed and entry["state"] == "running":
+            entry["finished_at"] = time.time()
+        entry["state"] = state
+        for field, value in [("rows", rows), ("total", total), ("cost", cost)]:
+            if value is not None:
+                entry[field] = value
+        now = time.monotonic()
+        if changed or now - self._written >= PROGRESS_INTERVAL:
+            write_job(self.job)
+            self._written = now
+
+def _run_job(job: Dict[str, Any], fn: Callable[..., Any], args: tuple) -> None:
+    """Worker: run a job, recording its progress and outcome."""
+    job.update(status="running", started_at=time.time())
+    write_job(job)
+    try:
+        job["result"] = fn(*args, progress=JobProgress(job))
+        job["status"] = "done"
+    except Exception as e:
+        # HTTPExceptions from shared handler code keep their status and detail
+        job.update(status="failed", error=str(getattr(e, "detail", e)), status_code=getattr(e, "status_code", 500))
+        for entry in job["steps"]:
+            if entry["state"] == "running":
+                entry.update(state="failed", finished_at=time.time())
+        if job["status_code"] >= 500:
+            logger.error(f"Job {job['job_id']} failed: {str(e)}")
+    job["finished_at"] = time.time()
+    write_job(job)
+
+def _finish(job: Dict[str, Any], future: Future) -> None:
+    with _lock:
+        _active.pop(job["session_id"], None)
+    error = "cancelled" if future.cancelled() else future.exception()
+    if error is not None:
+        # The worker died, or a pool reset dropped the job, before it could
+        # record the outcome
+        logger.error(f"Job {job['job_id']} crashed: {str(error)}")
+        job.update(status="failed", error=str(error), status_code=500, finished_at=time.time())
+        write_job(job)
+
+def _eta(job: Dict[str, Any], now: float) -> Optional[float]:
+    """
+    Estimate the seconds left of a running job.
+
+    The running step is extrapolated from its rows processed so far. Steps
+    with an estimated cost are timed at the rate the finished costed steps
+    ran at; without finished ones, or with remaining steps of unknown cost
+    and no row counts, there is no estimate.
+    """
+    timed = [
+        e for e in job["steps"]
+        if e["state"] == "done" and e.get("cost") and "started_at" in e and "finished_at" in e
+    ]
+    rate = sum(e["finished_at"] - e["started_at"] for e in timed) / sum(e["cost"] for e in timed) if timed else None
+    left = 0.0
+    for entry in job["steps"]:
+        if entry["state"] == "running":
+            elapsed = now - entry["started_at"]
+            if entry.get("rows") and entry.get("total"):
+                left += elapsed * max(entry["total"] - entry["rows"], 0) / entry["rows"]
+            elif rate is not None and entry.get("cost"):
+                left += max(rate * entry["cost"] - elapsed, 0.0)
+            else:
+                return None
+        elif entry["state"] == "pending":
+            if rate is None or entry.get("cost") is None:
+                return None
+            left += rate * entry["cost"]
+    return round(left, 1)
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize a stored job for clients: its status, steps, the step now
+    running with its rows processed and expected total, and an estimate
+    of the seconds left (None when unknown). Finished jobs include their
+    result or error.
+    """
+    current = next((e for e in reversed(job["steps"]) if e["state"] == "running"), None)
+    status = {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "session_id": job["session_id"],
+        "status": job["status"],
+        "step": current["step"] if current else None,
+        "rows": current.get("rows") if current else None,
+        "total": current.get("total") if current else None,
+        "eta_seconds": _eta(job, time.time()) if job["status"] == "running" else None,
+        "steps": job["steps"],
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+    if job["status"] == "done":
+        status.update(job["result"])
+    elif job["status"] == "failed":
+        status.update({"error": job["error"], "status_code": job["status_code"]})
+    return status
+
+def prune_jobs() -> int:
+    """
+    Remove status files of jobs that finished over JOB_RETENTION_SECONDS ago,
+    and session pointers to jobs that no longer exist.
+
+    Returns:
+        Number of files removed
+    """
+    removed = 0
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for entry in os.scandir(JOB_DIR):
+        if entry.name.endswith(".latest") and entry.stat().st_mtime < cutoff:
+            try:
+                if latest_job(entry.name[:-7]) is None:
+                    os.remove(entry.path)
+                    removed += 1
+            except (OSError, ValueError):
+                pass
+            continue
+        if not entry.name.endswith(".json") or entry.stat().st_mtime >= cutoff:
+            continue
+        try:
+            job = read_job(entry.name[:-5])
+        except (OSError, ValueError):
+            continue
+        if job and job.get("status") in ("done", "failed"):
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+def submit_job(kind: str, session_id: str, user_id: str, fn: Callable[..., Any], *args: Any) -> Dict[str, Any]:
+    """
+    Queue `fn(*args, progress=...)` to run in the session's job pool (see
+    session_pool), so repeated jobs on a session reuse one worker's caches.
+
+    `fn` must be a module-level function and its arguments picklable; its
+    return value becomes the job's "result". Exceptions fail the job, with
+    the status_code and detail of HTTPExceptions kept.
+
+    Args:
+        kind: Job type, e.g. "clean"
+        session_id: Session the job works on; one job per session at a time
+        user_id: Owner of the job
+        fn: Function to run
+        *args: Its positional arguments
+
+    Returns:
+        The queued job's status
+
+    Raises:
+        JobQueueFull: If JOB_QUEUE_DEPTH jobs are already queued or running
+        JobConflict: If the session already has a job in flight
+    """
+    with _lock:
+        if len(_active) >= JOB_QUEUE_DEPTH:
+            raise JobQueueFull(f"{len(_active)} jobs are already queued or running")
+        if session_id in _active or session_id in _held:
+            owner = _active.get(session_id) or _held[session_id]
+            raise JobConflict(f"Session {session_id} already has job {owner} in flight")
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "session_id": session_id,
+            "user_id": user_id,
+            "status": "queued",
+            "steps": [],
+            "created_at": time.time()
+        }
+        write_job(job)
+        _write_atomic(latest_job_path(session_id), job["job_id"])
+        _active[session_id] = job["job_id"]
+    try:
+        future = submit_process(session_pool(session_id), _run_job, job, fn, args)
+    except Exception:
+        with _lock:
+            _active.pop(session_id, None)
+        raise
+    future.add_done_callback(lambda f: _finish(job, f))
+    return job
+
+@contextmanager
+def hold_sessions(session_ids: List[str], owner: str):
+    """
+    Keep jobs off sessions while work outside the job queue uses them.
+
+    Args:
+        session_ids: Sessions to hold
+        owner: ID reported to conflicting submissions
+
+    Yields:
+        The sessions held; the others already have a job or hold in flight
+    """
+    with _lock:
+        held = [sid for sid in dict.fromkeys(session_ids) if sid not in _active and sid not in _held]
+        for sid in held:
+            _held[sid] = owner
+    try:
+        yield held
+    finally:
+        with _lock:
+            for sid in held:
+                _held.pop(sid, None)
+
+def queue_depth() -> int:
+    """Return the number of jobs queued or running in this process."""
+    with _lock:
+        return len(_active)
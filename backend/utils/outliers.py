@@ -0,0 +1,321 @@
+import os
+import json
+import hashlib
+import uuid
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import IsolationForest
+from typing import Any, Dict, List, Optional, Tuple
+from schemas.clean import CleanRequest
+from utils.storage import model_path, read_session_schema, artifact_name
+from utils.executor import in_pool_worker
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows the outlier model is fitted on; larger inputs are subsampled
+OUTLIER_SAMPLE_ROWS = int(os.getenv("OUTLIER_SAMPLE_ROWS", "100000"))
+# Threads scoring row batches in the API process; tree traversal releases
+# the GIL. Pool workers score on one thread, as their pools already run
+# about one worker per core
+OUTLIER_WORKERS = int(os.getenv("OUTLIER_WORKERS", str(os.cpu_count() or 1)))
+SCORE_BATCH_ROWS = 65536
+# Default cut-offs: Tukey fences in IQRs, and standard scores for z/MAD
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5}
+# Scales a MAD to the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+def outlier_params(req: CleanRequest) -> Dict[str, Any]:
+    """Return the outlier method of a cleaning request and its settings."""
+    if req.outlier_method == "isolation_forest":
+        return {
+            "method": req.outlier_method,
+            "contamination": req.contamination,
+            "max_samples": req.max_samples,
+            "n_estimators": req.n_estimators
+        }
+    return {
+        "method": req.outlier_method,
+        "scope": req.outlier_scope,
+        "threshold": req.outlier_threshold or DEFAULT_THRESHOLDS[req.outlier_method]
+    }
+
+def outlier_model_path(session_id: str, req: CleanRequest, streamed: bool = False) -> Optional[str]:
+    """
+    Return where the fitted outlier model of a session is cached.
+
+    The key covers the model settings, the steps that run before the
+    outlier step (the model is fitted on the rows and values they leave),
+    how the fitting sample was drawn, and the content hash of the
+    session's artifact, so any change refits.
+
+    Args:
+        session_id: Cleaning session ID
+        req: Cleaning request parameters
+        streamed: Whether the model is fitted by the chunked cleaner
+
+    Returns:
+        Model path, or None if the session has no stored content hash
+    """
+    meta = read_session_schema(session_id)
+    if not meta or not meta.get("content_hash"):
+        return None
+    upstream = req.steps[:req.steps.index("outliers")] if "outliers" in req.steps else []
+    dedupe = [req.dedupe_columns, req.dedupe_keep] if "dedupe" in upstream else None
+    payload = json.dumps(
+        [meta["content_hash"], outlier_params(req), req.impute, upstream, dedupe, streamed, OUTLIER_SAMPLE_ROWS],
+        sort_keys=True,
+        default=str
+    )
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    return model_path(artifact_name(session_id), key)
+
+def _nan_mean(values: np.ndarray) -> np.float32:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(values)
+
+def _float32_column(df: pd.DataFrame, col: str, rows: Optional[np.ndarray]) -> np.ndarray:
+    column = df[col] if rows is None else df[col].iloc[rows]
+    return column.to_numpy(dtype=np.float32, na_value=np.nan)
+
+def outlier_matrix(
+    df: pd.DataFrame,
+    columns: List[str],
+    fill: Optional[np.ndarray] = None,
+    rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Gather numeric columns into one float32 array, the precision an
+    IsolationForest works in anyway.
+
+    The array is filled one column at a time, so the frame is not copied
+    on the way. Remaining NaNs are replaced in place by `fill` (per
+    column), which defaults to the column means of the array itself.
+    `rows` selects the row positions to gather (defaults to all).
+    """
+    X = np.empty((len(df) if rows is None else len(rows), len(columns)), dtype=np.float32)
+    for j, col in enumerate(columns):
+        X[:, j] = _float32_column(df, col, rows)
+        values = X[:, j]
+        nan = np.isnan(values)
+        if nan.any():
+            value = _nan_mean(values) if fill is None else fill[j]
+            values[nan] = np.nan_to_num(np.float32(value))
+    return X
+
+def column_means(df: pd.DataFrame, columns: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Return the float32 mean of each column over `rows`, skipping NaNs (NaN if all are)."""
+    return np.array([_nan_mean(_float32_column(df, col, rows)) for col in columns], dtype=np.float32)
+
+def subsample_rows(rows: int, size: int = OUTLIER_SAMPLE_ROWS, seed: int = 42) -> Optional[np.ndarray]:
+    """Return sorted row positions of a uniform sample, or None if all rows fit."""
+    if rows <= size:
+        return None
+    return np.sort(np.random.default_rng(seed).choice(rows, size, replace=False))
+
+def fit_outlier_model(
+    X: np.ndarray,
+    params: Dict[str, Any],
+    path: Optional[str] = None
+) -> Tuple[IsolationForest, bool]:
+    """
+    Fit an IsolationForest, or load it from `path` if it was fitted before.
+
+    The contamination threshold is taken from the scores of the fitting
+    rows, so callers pass a bounded sample rather than all the data.
+
+    Args:
+        X: Fitting rows (see outlier_matrix)
+        params: Output of outlier_params
+        path: Where to cache the fitted model (see outlier_model_path)
+
+    Returns:
+        Tuple of (model, whether it came from the cache)
+    """
+    if path and os.path.exists(path):
+        try:
+            return joblib.load(path), True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable outlier model {path}: {str(e)}")
+    settings = {key: value for key, value in params.items() if key != "method"}
+    model = IsolationForest(random_state=42, **settings).fit(X)
+    if path:
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            joblib.dump(model, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not cache outlier model {path}: {str(e)}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return model, False
+
+def predict_outliers(model: IsolationForest, X: np.ndarray, workers: Optional[int] = None) -> np.ndarray:
+    """
+    Flag outlier rows, scoring batches of SCORE_BATCH_ROWS on a thread pool
+    (of OUTLIER_WORKERS threads), or one batch after another in pool
+    workers, so the scorer's scratch arrays stay batch-sized.
+
+    Returns:
+        Boolean mask, True for outliers
+    """
+    return _predict_batches(model, len(X), lambda start, stop: X[start:stop], workers)
+
+def predict_frame_outliers(
+    model: IsolationForest,
+    df: pd.DataFrame,
+    columns: List[str],
+    fill: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+    workers: Optional[int] = None
+) -> np.ndarray:
+    """
+    Flag outlier rows of a frame like predict_outliers, gathering each
+    batch into a float32 array (see outlier_matrix) just before it is
+    scored, so the rows are never held as one array.
+
+    Args:
+        model: Fitted IsolationForest
+        df: Input DataFrame
+        columns: Numeric columns the model was fitted on
+        fill: Per-column values replacing NaNs
+        rows: Row positions to score (defaults to all)
+        workers: Scoring threads
+
+    Returns:
+        Boolean mask over `rows` (or every row), True for outliers
+    """
+    def batch(start: int, stop: int) -> np.ndarray:
+        if rows is None:
+            return outlier_matrix(df.iloc[start:stop], columns, fill)
+        return outlier_matrix(df, columns, fill, rows[start:stop])
+
+    return _predict_batches(model, len(df) if rows is None else len(rows), batch, workers)
+
+def _predict_batches(model: IsolationForest, size: int, batch, workers: Optional[int]) -> np.ndarray:
+    """Score batch(start, stop) for every SCORE_BATCH_ROWS rows, on a thread pool if more than one."""
+    workers = workers or (1 if in_pool_worker() else OUTLIER_WORKERS)
+    starts = range(0, size, SCORE_BATCH_ROWS)
+
+    def score(start: int) -> np.ndarray:
+        return model.predict(batch(start, min(start + SCORE_BATCH_ROWS, size)))
+
+    if workers < 2 or len(starts) < 2:
+        batches = [score(start) for start in starts]
+    else:
+        batches = Parallel(n_jobs=workers, prefer="threads")(delayed(score)(start) for start in starts)
+    return np.concatenate(batches) == -1 if batches else np.zeros(0, dtype=bool)
+
+class RobustDetector:
+    """
+    Model-free outlier detector scoring each numeric column on its own.
+
+    `fit` takes one O(n) pass per column (np.percentile/np.median select
+    rather than sort) and keeps a centre and scale per column:
+
+    - iqr: distance outside [Q1, Q3] in IQRs, flagged above the threshold
+      (Tukey's fences for 1.5)
+    - zscore: |x - mean| / std
+    - mad: |x - median| / (1.4826 * MAD), the robust z-score
+
+    With scope "column" a row is an outlier if any column scores above the
+    threshold; with scope "row" the root mean square of its column scores
+    (over the non-constant columns) is compared instead, so one extreme
+    value or several moderate ones can flag a row. Missing values and
+    constant columns score 0.
+
+    Both methods take optional row positions, to fit on and score subsets
+    of the frame, and a dict of float64 column conversions shared with
+    other passes over the same frame; conversions made here are added to it.
+    """
+
+    def __init__(self, method: str, scope: str = "column", threshold: Optional[float] = None):
+        self.method = method
+        self.scope = scope
+        self.threshold = threshold or DEFAULT_THRESHOLDS[method]
+        self.columns: List[str] = []
+        self.low = self.high = self.scale = np.empty(0)
+
+    def _bounds(self, values: np.ndarray) -> Tuple[float, float, float]:
+        if not len(values):
+            return 0.0, 0.0, 0.0
+        if self.method == "iqr":
+            q1, q3 = np.percentile(values, [25, 75])
+            return q1, q3, q3 - q1
+        if self.method == "zscore":
+            mean = values.mean()
+            return mean, mean, values.std(ddof=1) if len(values) > 1 else 0.0
+        median = np.median(values)
+        return median, median, MAD_SCALE * np.median(np.abs(values - median))
+
+    @staticmethod
+    def _column(
+        df: pd.DataFrame,
+        col: str,
+        rows: Optional[np.ndarray],
+        shared: Optional[Dict[str, np.ndarray]]
+    ) -> np.ndarray:
+        if shared is not None and col in shared:
+            values = shared[col]
+        else:
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            if shared is not None:
+                shared[col] = values
+        return values if rows is None else values[rows]
+
+    def fit(
+        self,
+        df: pd.DataFrame,
+        columns: List[str],
+        rows: Optional[np.ndarray] = None,
+        shared: Optional[Dict[str, np.ndarray]] = None
+    ) -> "RobustDetector":
+        """Compute per-column centres and scales."""
+        bounds = []
+        for col in columns:
+            values = self._column(df, col, rows, shared)
+            nan = np.isnan(values)
+            bounds.append(self._bounds(values[~nan] if nan.any() else values))
+        self.columns = list(columns)
+        self.low, self.high, self.scale = np.array(bounds, dtype="float64").reshape(-1, 3).T
+        return self
+
+    def predict(
+        self,
+        df: pd.DataFrame,
+        rows: Optional[np.ndarray] = None,
+        shared: Optional[Dict[str, np.ndarray]] = None
+    ) -> np.ndarray:
+        """
+        Flag outlier rows.
+
+        Returns:
+            Boolean mask over `rows` (or every row), True for outliers
+        """
+        size = len(df) if rows is None else len(rows)
+        flagged = np.zeros(size, dtype=bool)
+        squares = np.zeros(size) if self.scope == "row" else None
+        # Scores are computed in two buffers reused for every column
+        score, above = np.empty(size), np.empty(size)
+        for i, col in enumerate(self.columns):
+            if self.scale[i] <= 0:
+                continue
+            values = self._column(df, col, rows, shared)
+            np.subtract(self.low[i], values, out=score)
+            np.subtract(values, self.high[i], out=above)
+            np.maximum(score, above, out=score)
+            np.maximum(score, 0, out=score)
+            score /= self.scale[i]
+            np.nan_to_num(score, copy=False, nan=0.0)
+            if squares is None:
+                flagged |= score > self.threshold
+            else:
+                squares += np.multiply(score, score, out=above)
+        scored = int((self.scale > 0).sum())
+        if squares is not None and scored:
+            flagged = np.sqrt(squares / scored) > self.threshold
+        return flagged
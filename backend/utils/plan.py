@@ -0,0 +1,211 @@
+import math
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from schemas.clean import CleanRequest
+from utils.outliers import DEFAULT_THRESHOLDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Order the chunked cleaner runs its steps in; it cannot reorder them
+STREAM_ORDER = ["impute", "outliers", "dedupe"]
+
+# Relative costs of the work each step does, per row or per row and column,
+# roughly calibrated with benchmarks/bench_outliers.py
+IMPUTE_CELL_COST = 1.0
+CONVERT_CELL_COST = 1.0
+HASH_CELL_COST = 1.0
+DEDUPE_ROW_COST = 4.0
+ROBUST_FIT_CELL_COST = 1.5
+ROBUST_SCORE_CELL_COST = 1.5
+FOREST_NODE_COST = 0.3
+# Share of rows the iqr/zscore/mad detectors are assumed to flag
+ROBUST_OUTLIER_RATE = 0.01
+
+class PlanError(Exception):
+    """Custom exception for cleaning plans the chosen path cannot run"""
+    pass
+
+def _noop_reason(
+    step: str,
+    req: CleanRequest,
+    columns: List[str],
+    numeric: List[str],
+    rows: int,
+    stats: Dict[str, Dict[str, Any]],
+    exact: bool
+) -> Optional[str]:
+    """Return why a step cannot change the data, or None if it might."""
+    if step == "impute":
+        if columns and all(col in stats and stats[col].get("missing_pct") == 0 for col in columns):
+            return "no missing values"
+    elif step == "outliers":
+        if not numeric:
+            return "no numeric columns"
+        # Zero-scale columns score 0, and imputing a constant column keeps it constant
+        if req.outlier_method != "isolation_forest" and all(
+            col in stats and stats[col].get("min") is not None and stats[col].get("min") == stats[col].get("max")
+            for col in numeric
+        ):
+            return "numeric columns are constant"
+    elif step == "dedupe" and exact:
+        # Unique counts of chunked profiles are estimates, so only exact ones are trusted
+        for col in req.dedupe_columns or columns:
+            entry = stats.get(col, {})
+            if entry.get("missing_pct") == 0 and entry.get("unique_count") == rows:
+                return f"column {col} has no repeated values"
+    return None
+
+def _distinct_rows(req: CleanRequest, columns: List[str], rows: int, stats: Dict[str, Dict[str, Any]]) -> int:
+    """Upper bound on distinct rows: the product of the key columns' value counts."""
+    distinct = 1
+    for col in req.dedupe_columns or columns:
+        entry = stats.get(col)
+        if not entry or entry.get("unique_count") is None:
+            return rows
+        distinct *= int(entry["unique_count"]) + (1 if entry.get("missing_pct") else 0)
+        if distinct >= rows:
+            return rows
+    return distinct
+
+def _forest_row_cost(req: CleanRequest, rows: int) -> float:
+    if req.max_samples == "auto":
+        samples = min(256, rows)
+    elif isinstance(req.max_samples, float):
+        samples = req.max_samples * rows
+    else:
+        samples = min(req.max_samples, rows)
+    return req.n_estimators * max(math.log2(max(samples, 2)), 1.0) * FOREST_NODE_COST
+
+def _estimate(
+    order: List[Dict[str, Any]],
+    req: CleanRequest,
+    columns: List[str],
+    numeric: List[str],
+    rows: int,
+    duplicates: int
+) -> float:
+    """Fill in the estimated input rows and cost of each planned step; return the total."""
+    total = 0.0
+    remaining = float(rows)
+    fit_rows = None
+    # Fused steps convert the numeric columns once between them
+    converted = False
+    keys = req.dedupe_columns or columns
+    for entry in order:
+        step = entry["step"]
+        if step == "impute":
+            cost = remaining * len(columns) * IMPUTE_CELL_COST
+            after = remaining
+        elif step == "outliers":
+            fitted = fit_rows if fit_rows is not None else remaining
+            convert = 0.0 if converted else len(numeric) * fitted * CONVERT_CELL_COST
+            if req.outlier_method == "isolation_forest":
+                cost = convert + remaining * _forest_row_cost(req, rows)
+                after = remaining * (1 - req.contamination)
+            else:
+                cost = convert + len(numeric) * (fitted * ROBUST_FIT_CELL_COST + remaining * ROBUST_SCORE_CELL_COST)
+                after = remaining * (1 - ROBUST_OUTLIER_RATE)
+            converted = bool(entry.get("fused"))
+        else:
+            convert = 0.0 if converted else len([col for col in keys if col in numeric]) * rows * CONVERT_CELL_COST
+            # Row hashes are computed for every row and the candidates looked up
+            cost = convert + rows * len(keys) * HASH_CELL_COST + remaining * DEDUPE_ROW_COST
+            after = max(remaining - duplicates * remaining / rows, 0.0) if rows else remaining
+            if entry.get("reordered"):
+                fit_rows = remaining
+            converted = bool(entry.get("fused"))
+        entry["rows"] = int(remaining)
+        entry["cost"] = round(cost, 1)
+        total += cost
+        remaining = after
+    return round(total, 1)
+
+def plan_clean(
+    req: CleanRequest,
+    head: pd.DataFrame,
+    rows: int,
+    profile: Optional[Dict[str, Any]] = None,
+    exact: bool = False,
+    streamed: bool = False
+) -> Dict[str, Any]:
+    """
+    Choose how to run the steps of a cleaning request.
+
+    The request's steps are the logical plan: each applies to the rows the
+    previous ones leave. Unless `req.optimize` is off, the planner
+
+    - skips steps that cannot change the data according to the session
+      profile: imputing without missing values, scoring constant columns
+      with iqr/zscore/mad, deduping on a key column with no repeats
+      (exact profiles only);
+    - moves dedupe in front of an outlier step directly before it when the
+      dedupe key covers every numeric column and that is estimated to be
+      cheaper. Duplicates then share their outlier scores, so the same rows
+      survive; the detector is still fitted on the rows before dedupe and
+      only scores the remaining ones. Duplicate outliers are counted as
+      duplicates rather than outliers;
+    - fuses adjacent outlier and dedupe steps using iqr/zscore/mad into
+      one pass over the numeric columns, which are converted to float64
+      once for the detector and the row hasher.
+
+    The chunked cleaner (`streamed`) only skips steps.
+
+    Args:
+        req: Cleaning request parameters
+        head: Leading rows of the data (none are needed), for the column
+            names and dtypes
+        rows: Number of rows in the data
+        profile: Whole-table profile of the session (see api.profile)
+        exact: Whether the profile's unique counts are exact
+        streamed: Plan for the chunked cleaner
+
+    Returns:
+        Plan with the steps to run (with estimated input rows and relative
+        cost), the skipped steps and why, and the estimated total cost
+
+    Raises:
+        PlanError: If the chunked cleaner cannot run the requested order
+    """
+    columns = list(head.columns)
+    # Selecting from no rows keeps a frame passed as `head` from being copied
+    numeric = list(head.head(0).select_dtypes(include=["number"]).columns)
+    stats = {entry["column"]: entry for entry in (profile or {}).get("profile", [])}
+
+    if streamed and req.steps != [step for step in STREAM_ORDER if step in req.steps]:
+        raise PlanError(f"Steps can only run in the order {', '.join(STREAM_ORDER)} when cleaning in chunks")
+
+    order, skipped = [], []
+    for step in req.steps:
+        reason = _noop_reason(step, req, columns, numeric, rows, stats, exact) if req.optimize else None
+        if reason:
+            skipped.append({"step": step, "reason": reason})
+        else:
+            order.append({"step": step})
+
+    duplicates = rows - _distinct_rows(req, columns, rows, stats)
+    total = _estimate(order, req, columns, numeric, rows, duplicates)
+    names = [entry["step"] for entry in order]
+    if req.optimize and not streamed:
+        if "outliers" in names and names[names.index("outliers") + 1:][:1] == ["dedupe"] \
+                and (req.dedupe_columns is None or set(numeric) <= set(req.dedupe_columns)):
+            i = names.index("outliers")
+            candidate = [dict(entry) for entry in order]
+            candidate[i], candidate[i + 1] = {"step": "dedupe", "reordered": True}, {"step": "outliers", "reordered": True}
+            cost = _estimate(candidate, req, columns, numeric, rows, duplicates)
+            if cost < total:
+                order, total = candidate, cost
+        names = [entry["step"] for entry in order]
+        if req.outlier_method in DEFAULT_THRESHOLDS and "outliers" in names and "dedupe" in names \
+                and abs(names.index("outliers") - names.index("dedupe")) == 1:
+            for entry in order:
+                if entry["step"] in ("outliers", "dedupe"):
+                    entry["fused"] = True
+            total = _estimate(order, req, columns, numeric, rows, duplicates)
+
+    return {
+        "steps": order,
+        "skipped": skipped,
+        "estimated_cost": total,
+        "profile": ("full" if exact else "stream") if profile else None
+    }
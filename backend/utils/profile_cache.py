@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from utils.storage import profile_path, read_session_schema, artifact_name
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the profile output changes so stale results are not served
+PROFILER_VERSION = "2"
+
+def profile_cache_key(content_hash: str, params: Dict[str, Any]) -> str:
+    """
+    Build the cache key of a profile result.
+
+    Args:
+        content_hash: Content hash of the profiled artifact
+        params: Options that change the result (mode, columns, ...)
+
+    Returns:
+        Hex digest identifying the result
+    """
+    payload = json.dumps([PROFILER_VERSION, content_hash, params], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def _path(session_id: str, params: Dict[str, Any], cleaned: bool) -> Optional[str]:
+    meta = read_session_schema(session_id, cleaned)
+    if not meta or not meta.get("content_hash"):
+        return None
+    return profile_path(artifact_name(session_id, cleaned), profile_cache_key(meta["content_hash"], params))
+
+def get_cached_profile(
+    session_id: str,
+    params: Dict[str, Any],
+    cleaned: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Return a stored profile result for the session's current data, if any.
+
+    Args:
+        session_id: Cleaning session ID
+        params: Options the profile was computed with
+        cleaned: Look up profiles of the cleaned data
+
+    Returns:
+        The stored result, or None on a miss
+    """
+    path = _path(session_id, params, cleaned)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cached profile {path}: {str(e)}")
+        return None
+
+def put_cached_profile(
+    session_id: str,
+    params: Dict[str, Any],
+    result: Dict[str, Any],
+    cleaned: bool = False
+) -> None:
+    """
+    Store a profile result next to the session artifact.
+
+    Entries are removed whenever the artifact is rewritten, and are keyed by
+    its content hash and PROFILER_VERSION so they can never go stale.
+
+    Args:
+        session_id: Cleaning session ID
+        params: Options the profile was computed with
+        result: Profile result to store
+        cleaned: The profile is of the cleaned data
+    """
+    path = _path(session_id, params, cleaned)
+    if not path:
+        return
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(result, f, default=str)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Failed to cache profile {path}: {str(e)}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def get_session_profile(session_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Return a stored whole-table profile of the session's current data.
+
+    Full profiles are preferred over chunked ones, whose unique counts are
+    estimates; sampled profiles are never used.
+
+    Returns:
+        Tuple of (profile or None, whether its unique counts are exact)
+    """
+    for mode in ["full", "stream"]:
+        cached = get_cached_profile(session_id, {"mode": mode, "columns": None})
+        if cached is not None:
+            return cached, mode == "full"
+    return None, False
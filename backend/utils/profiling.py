@@ -0,0 +1,318 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from multiprocessing import shared_memory
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from utils.cleaning import (
+    CleaningError, profile_data, validate_dataframe, _is_text_column, PROFILE_QUANTILES, quantile_labels, histogram_edges
+)
+from utils.sketches import Moments, KLLSketch, LengthStats, HyperLogLog, hash_values
+from utils.executor import submit_process
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for parallel profiling (defaults to the CPU count)
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", str(os.cpu_count() or 1)))
+# Wide tables with at least this many columns are profiled in parallel
+PARALLEL_PROFILE_COLUMNS = int(os.getenv("PARALLEL_PROFILE_COLUMNS", "200"))
+MIN_BATCH_COLUMNS = 16
+
+class ColumnProfiler:
+    """
+    Mergeable profile of a single column, built from chunks.
+
+    The column kind (numeric, text or other) is fixed by the first chunk.
+    Memory use is constant: a few scalars plus HyperLogLog and KLL sketches.
+    """
+
+    def __init__(self, name: str, first: pd.Series):
+        self.name = name
+        self.dtype = first.dtype
+        if pd.api.types.is_numeric_dtype(first):
+            self.kind = "numeric"
+        elif _is_text_column(first):
+            self.kind = "text"
+        else:
+            self.kind = "other"
+        self.rows = 0
+        self.nulls = 0
+        self.moments = Moments()
+        self.quantiles = KLLSketch()
+        self.lengths = LengthStats()
+        self.distinct = HyperLogLog()
+
+    def update(self, col_data: pd.Series) -> None:
+        """Fold in one chunk of the column."""
+        self.rows += len(col_data)
+        self.nulls += int(col_data.isna().sum())
+        self.distinct.add_hashes(hash_values(col_data))
+        if self.kind == "numeric":
+            values = pd.to_numeric(col_data, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            values = values[~np.isnan(values)]
+            self.moments.update(values)
+            self.quantiles.update(values)
+        elif self.kind == "text":
+            lengths = col_data.astype("string").str.len().to_numpy(dtype="float64", na_value=np.nan)
+            self.lengths.update(lengths[~np.isnan(lengths)])
+
+    def merge(self, other: "ColumnProfiler") -> None:
+        """Combine the profile of another part of the same column."""
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        self.lengths.merge(other.lengths)
+        self.distinct.merge(other.distinct)
+
+    def result(self) -> Dict[str, Any]:
+        """Return the column stats in profile_data's format."""
+        col_stats = {
+            "column": self.name,
+            "type": str(self.dtype),
+            "missing_pct": float(self.nulls / self.rows) * 100 if self.rows else 0.0,
+            "unique_count": self.distinct.estimate()
+        }
+        if self.kind == "numeric":
+            col_stats.update(self.moments.stats())
+            edges = histogram_edges(col_stats["min"], col_stats["max"])
+            col_stats["quantiles"] = dict(zip(quantile_labels(), self.quantiles.quantiles(PROFILE_QUANTILES)))
+            col_stats["histogram"] = {
+                "bin_edges": edges.tolist(),
+                "counts": self.quantiles.histogram(edges) if len(edges) else []
+            }
+        elif self.kind == "text":
+            col_stats.update(self.lengths.stats())
+        return col_stats
+
+def profile_chunks(
+    chunks: Iterable[pd.DataFrame],
+    progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Profile data delivered in chunks with constant memory.
+
+    Produces the same format as profile_data. Min/max/mean/std and missing
+    percentages are exact; unique counts are HyperLogLog estimates, and
+    quantiles and histogram counts come from KLL sketches (about 1% rank
+    error).
+
+    Args:
+        chunks: DataFrames sharing the same columns
+        progress: Called with the number of rows profiled after each chunk
+
+    Returns:
+        Dictionary containing column statistics
+    """
+    try:
+        profilers: Dict[str, ColumnProfiler] = {}
+        rows = 0
+        for chunk in chunks:
+            for col in chunk.columns:
+                if col not in profilers:
+                    profilers[col] = ColumnProfiler(col, chunk[col])
+                profilers[col].update(chunk[col])
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+        if not profilers or not next(iter(profilers.values())).rows:
+            raise CleaningError("DataFrame is empty")
+        return {"profile": [p.result() for p in profilers.values()]}
+    except CleaningError:
+        raise
+    except Exception as e:
+        logger.error(f"Error profiling data: {str(e)}")
+        raise CleaningError(f"Failed to profile data: {str(e)}")
+
+def _mean_interval(mean: float, std: float, count: int, z: float, fpc: float) -> Optional[List[float]]:
+    if count < 2 or not np.isfinite(std):
+        return None
+    half = z * std / math.sqrt(count) * fpc
+    return [mean - half, mean + half]
+
+def profile_sample(
+    sample: pd.DataFrame,
+    total_rows: int,
+    confidence: float = 0.95
+) -> Dict[str, Any]:
+    """
+    Estimate a full profile from a uniform row sample.
+
+    Point estimates use profile_data's format. Each column also gets
+    `confidence_intervals` for missing_pct, mean, std, avg_length (normal
+    approximations with finite population correction) and unique_count.
+    Unique counts use Haas' Duj1 estimator, bounded below by the distinct
+    values seen and above by scaling the values seen once by N/n. Min, max
+    and quantiles are sample values and have no interval; histogram counts
+    are scaled by N/n.
+
+    Args:
+        sample: Uniform random sample of rows
+        total_rows: Number of rows in the full data
+        confidence: Confidence level of the intervals
+
+    Returns:
+        Dictionary with the profile plus sampled, sample_size, total_rows
+        and confidence
+    """
+    result = profile_data(sample)["profile"]
+    n, total = len(sample), max(total_rows, len(sample))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    fpc = math.sqrt((total - n) / (total - 1)) if total > 1 else 0.0
+    scale = total / n
+    try:
+        for col_stats in result:
+            col = sample[col_stats["column"]]
+            intervals: Dict[str, Optional[List[float]]] = {}
+            
+            p = col_stats["missing_pct"] / 100
+            half = z * math.sqrt(p * (1 - p) / n) * fpc
+            intervals["missing_pct"] = [max(p - half, 0.0) * 100, min(p + half, 1.0) * 100]
+            
+            counts = col.value_counts(dropna=True)
+            counts = counts[counts > 0]
+            seen, once = len(counts), int((counts == 1).sum())
+            cap = int(round((1 - p) * total))
+            sampled_rows = counts.sum()
+            if sampled_rows:
+                estimate = sampled_rows * seen / (sampled_rows - once + once * sampled_rows / max(cap, 1))
+            else:
+                estimate = 0
+            upper = max(scale * once + (seen - once), estimate)
+            col_stats["unique_count"] = int(round(min(max(estimate, seen), cap)))
+            intervals["unique_count"] = [seen, int(round(min(max(upper, seen), cap)))]
+            
+            non_null = int(n - col.isna().sum())
+            if "histogram" in col_stats:
+                hist = col_stats["histogram"]
+                hist["counts"] = [int(round(c * scale)) for c in hist["counts"]]
+            if "mean" in col_stats:
+                std = col_stats["std"]
+                intervals["mean"] = _mean_interval(col_stats["mean"], std, non_null, z, fpc)
+                if non_null > 1 and np.isfinite(std):
+                    half = z / math.sqrt(2 * (non_null - 1))
+                    intervals["std"] = [std * max(1 - half, 0.0), std * (1 + half)]
+            elif col_stats.get("avg_length") is not None:
+                lengths = col.astype("string").str.len().dropna().to_numpy(dtype="float64")
+                std = float(lengths.std(ddof=1)) if len(lengths) > 1 else float("nan")
+                intervals["avg_length"] = _mean_interval(col_stats["avg_length"], std, len(lengths), z, fpc)
+            
+            col_stats["confidence_intervals"] = intervals
+        return {
+            "profile": result,
+            "sampled": True,
+            "sample_size": n,
+            "total_rows": total_rows,
+            "confidence": confidence
+        }
+    except Exception as e:
+        logger.error(f"Error profiling sample: {str(e)}")
+        raise CleaningError(f"Failed to profile sample: {str(e)}")
+
+def _column_batches(columns: List[str], workers: int) -> List[List[str]]:
+    # About four batches per worker keeps the pool busy when columns differ in cost
+    size = max(MIN_BATCH_COLUMNS, math.ceil(len(columns) / (workers * 4)))
+    return [columns[i:i + size] for i in range(0, len(columns), size)]
+
+def _arrow_to_frame(table: pa.Table) -> pd.DataFrame:
+    def strings(arrow_type):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return pd.StringDtype("pyarrow")
+        return None
+    return table.to_pandas(types_mapper=strings, date_as_object=False)
+
+def _profile_shared_batch(shm_name: str, size: int) -> List[Dict[str, Any]]:
+    """Worker: profile a column batch published as Arrow IPC in shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(shm.buf[:size])).read_all()
+        # The pandas metadata in the schema restores the original dtypes
+        result = profile_data(table.to_pandas())["profile"]
+        del table
+        return result
+    finally:
+        shm.close()
+
+def _profile_file_batch(path: str, columns: List[str]) -> List[Dict[str, Any]]:
+    """Worker: profile a column batch read straight from a Parquet artifact."""
+    return profile_data(_arrow_to_frame(pq.read_table(path, columns=columns)))["profile"]
+
+def _publish(df: pd.DataFrame) -> Optional[tuple]:
+    """Write a column batch to shared memory as Arrow IPC, or None if Arrow cannot hold it."""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    size = sink.size()
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table.schema) as writer:
+        writer.write_table(table)
+    return shm, size
+
+def profile_data_parallel(
+    df: Optional[pd.DataFrame] = None,
+    path: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    workers: Optional[int] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Profile column batches in a process pool.
+
+    Columns are split into batches that workers profile with profile_data.
+    For a Parquet artifact (`path`) each worker reads only its own columns
+    from disk; for an in-memory DataFrame each batch is published once as
+    Arrow IPC in shared memory and mapped by the worker, so whole frames
+    are never pickled. Batches Arrow cannot represent (mixed-type object
+    columns) are profiled in this process. Results keep column order.
+
+    Args:
+        df: DataFrame to profile
+        path: Parquet artifact to profile instead of df
+        columns: Only profile these columns
+        workers: Batches are sized for this many workers (defaults to PROFILE_WORKERS)
+
+    Returns:
+        Dictionary containing column statistics, as profile_data
+    """
+    workers = workers or PROFILE_WORKERS
+    if columns is None:
+        columns = list(df.columns) if df is not None else pq.read_schema(path).names
+    if df is not None:
+        validate_dataframe(df)
+    batches = _column_batches(columns, workers)
+    segments = []
+    try:
+        futures = []
+        for batch in batches:
+            if path is not None:
+                futures.append(submit_process("cpu", _profile_file_batch, path, batch))
+                continue
+            published = _publish(df[batch])
+            if published is None:
+                futures.append(batch)
+                continue
+            segments.append(published[0])
+            futures.append(submit_process("cpu", _profile_shared_batch, published[0].name, published[1]))
+        stats = []
+        for future in futures:
+            if isinstance(future, list):
+                stats.extend(profile_data(df[future])["profile"])
+            else:
+                stats.extend(future.result())
+        return {"profile": stats}
+    except CleaningError:
+        raise
+    except Exception as e:
+        logger.error(f"Error profiling data in parallel: {str(e)}")
+        raise CleaningError(f"Failed to profile data: {str(e)}")
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
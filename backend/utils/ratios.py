@@ -0,0 +1,102 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows the column correlations are estimated from
+RATIO_SAMPLE_ROWS = int(os.getenv("RATIO_SAMPLE_ROWS", "5000"))
+# Columns per block of the correlation matrix, bounding its memory
+RATIO_BLOCK_COLUMNS = 512
+# Pairs correlated more weakly than this are unrelated, and more strongly
+# than this have a near-constant ratio; neither is suggested
+RATIO_MIN_CORRELATION = float(os.getenv("RATIO_MIN_CORRELATION", "0.3"))
+RATIO_MAX_CORRELATION = float(os.getenv("RATIO_MAX_CORRELATION", "0.98"))
+
+def _nonzero_columns(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Whether each column has non-null values, none of them zero, in column blocks."""
+    valid = np.zeros(len(columns), dtype=bool)
+    for start in range(0, len(columns), RATIO_BLOCK_COLUMNS):
+        block = df[columns[start:start + RATIO_BLOCK_COLUMNS]]
+        valid[start:start + len(block.columns)] = (block.abs().min() > 0).to_numpy()
+    return valid
+
+def _standardized_sample(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Sampled columns centred and scaled to unit norm, so their dot products
+    are correlations. Missing values count as the mean; constant columns
+    become zero and correlate with nothing.
+    """
+    sample = df[columns]
+    if len(sample) > RATIO_SAMPLE_ROWS:
+        sample = sample.sample(RATIO_SAMPLE_ROWS, random_state=42)
+    X = sample.to_numpy(dtype="float64", na_value=np.nan)
+    with warnings.catch_warnings():
+        # All-missing columns have no mean; they end up constant
+        warnings.simplefilter("ignore", RuntimeWarning)
+        X -= np.nanmean(X, axis=0)
+    X[np.isnan(X)] = 0.0
+    norms = np.linalg.norm(X, axis=0)
+    nonconstant = norms > 0
+    X[:, nonconstant] /= norms[nonconstant]
+    X[:, ~nonconstant] = 0.0
+    return X.astype("float32")
+
+def rank_ratio_pairs(
+    df: pd.DataFrame,
+    columns: List[str],
+    top_k: int = 50,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Rank pairs of numeric columns whose ratio may make a useful feature.
+
+    A pair (a, b), a before b, is a candidate when b has no zeros. Each
+    column's statistics are computed once, and the correlation matrix of
+    a row sample is built in blocks of RATIO_BLOCK_COLUMNS columns. Pairs
+    are kept when the absolute correlation lies between
+    RATIO_MIN_CORRELATION and RATIO_MAX_CORRELATION: related enough for
+    the ratio to mean something, but not so much that it is nearly
+    constant. Kept pairs are ranked by absolute correlation.
+
+    Args:
+        df: Input DataFrame
+        columns: Numeric columns to pair
+        top_k: Number of pairs to return
+        offset: Number of top-ranked pairs to skip
+
+    Returns:
+        Dictionary with the page of ranked pairs (columns and score) and
+        the total number of candidates
+    """
+    if len(columns) < 2:
+        return {"pairs": [], "total": 0}
+    denominator = _nonzero_columns(df, columns)
+    X = _standardized_sample(df, columns)
+    rows, cols, scores = [], [], []
+    for start in range(0, len(columns), RATIO_BLOCK_COLUMNS):
+        stop = min(start + RATIO_BLOCK_COLUMNS, len(columns))
+        # Upper triangle only: pairs (i, j) with i < j
+        corr = np.abs(X[:, start:stop].T @ X[:, start:])
+        i, j = np.nonzero(
+            (corr >= RATIO_MIN_CORRELATION) & (corr <= RATIO_MAX_CORRELATION)
+        )
+        j = j + start
+        i = i + start
+        keep = (i < j) & denominator[j]
+        rows.append(i[keep])
+        cols.append(j[keep])
+        scores.append(corr[i[keep] - start, j[keep] - start])
+    rows, cols, scores = np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+    # Stable ordering keeps ties in column order
+    order = np.lexsort((cols, rows, -scores))[offset:offset + top_k]
+    return {
+        "pairs": [
+            {"columns": [columns[rows[k]], columns[cols[k]]], "score": round(float(scores[k]), 4)}
+            for k in order
+        ],
+        "total": int(len(scores))
+    }
@@ -0,0 +1,196 @@
+import base64
+import zlib
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Decompressed bytes handled at a time when scanning an encoded row set
+SCAN_BYTES = 1024 ** 2
+
+class RowSetError(Exception):
+    """Custom exception for malformed encoded row sets"""
+    pass
+
+class RowSetBuilder:
+    """
+    Incrementally encode a set of row positions for audit steps.
+
+    Chunks of a boolean row mask are appended in order and compressed on
+    the fly two ways: as a bitmap (one bit per row) and as run-length
+    ranges (gap, length) of int64 pairs. `finish` keeps whichever is
+    smaller, so dense sets cost about a bit per row and sparse or clustered
+    ones a few bytes per run; no list of row numbers is ever built.
+    """
+
+    def __init__(self):
+        self.length = 0
+        self.count = 0
+        self._bitmap = zlib.compressobj(6)
+        self._bitmap_parts: List[bytes] = []
+        self._carry = np.empty(0, dtype=bool)
+        self._ranges = zlib.compressobj(6)
+        self._range_parts: List[bytes] = []
+        self._end = 0
+        # Last run seen; it may continue into the next chunk
+        self._run: Optional[List[int]] = None
+
+    def append(self, mask: np.ndarray) -> None:
+        """Add the flags of the next rows."""
+        mask = np.asarray(mask, dtype=bool)
+        offset = self.length
+        self.length += len(mask)
+        self.count += int(mask.sum())
+
+        bits = np.concatenate([self._carry, mask])
+        whole = len(bits) - len(bits) % 8
+        self._carry = bits[whole:]
+        if whole:
+            self._bitmap_parts.append(self._bitmap.compress(np.packbits(bits[:whole]).tobytes()))
+
+        edges = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+        starts, ends = edges[0::2] + offset, edges[1::2] + offset
+        if not len(starts):
+            return
+        if self._run is not None:
+            if starts[0] == self._run[0] + self._run[1]:
+                starts[0] = self._run[0]
+            else:
+                self._write_runs(np.array([self._run[0]]), np.array([self._run[1]]))
+        lengths = ends - starts
+        self._write_runs(starts[:-1], lengths[:-1])
+        self._run = [int(starts[-1]), int(lengths[-1])]
+
+    def _write_runs(self, starts: np.ndarray, lengths: np.ndarray) -> None:
+        if not len(starts):
+            return
+        pairs = np.empty((len(starts), 2), dtype="<i8")
+        pairs[:, 0] = starts - np.concatenate([[self._end], (starts + lengths)[:-1]])
+        pairs[:, 1] = lengths
+        self._end = int(starts[-1] + lengths[-1])
+        self._range_parts.append(self._ranges.compress(pairs.tobytes()))
+
+    def finish(self) -> Dict[str, Any]:
+        """Return the encoded row set (see decode_rows)."""
+        if self._run is not None:
+            self._write_runs(np.array([self._run[0]]), np.array([self._run[1]]))
+            self._run = None
+        bitmap = b"".join(self._bitmap_parts)
+        if len(self._carry):
+            bitmap += self._bitmap.compress(np.packbits(self._carry).tobytes())
+        bitmap += self._bitmap.flush()
+        ranges = b"".join(self._range_parts) + self._ranges.flush()
+        encoding, data = ("ranges", ranges) if len(ranges) <= len(bitmap) else ("bitmap", bitmap)
+        return {
+            "encoding": encoding,
+            "length": self.length,
+            "count": self.count,
+            "data": base64.b64encode(data).decode("ascii")
+        }
+
+def encode_mask(mask: np.ndarray) -> Dict[str, Any]:
+    """Encode the True positions of a boolean row mask."""
+    builder = RowSetBuilder()
+    builder.append(mask)
+    return builder.finish()
+
+def _payload(encoded: Dict[str, Any]) -> bytes:
+    try:
+        return base64.b64decode(encoded["data"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise RowSetError(f"Malformed row set: {str(e)}")
+
+def _stream(data: bytes) -> Iterator[bytes]:
+    inflater = zlib.decompressobj()
+    pending = data
+    while pending:
+        block = inflater.decompress(pending, SCAN_BYTES)
+        pending = inflater.unconsumed_tail
+        if block:
+            yield block
+    tail = inflater.flush()
+    if tail:
+        yield tail
+
+def _iter_runs(data: bytes) -> Iterator[tuple]:
+    end = 0
+    buffer = b""
+    for block in _stream(data):
+        buffer += block
+        usable = len(buffer) - len(buffer) % 16
+        pairs = np.frombuffer(buffer[:usable], dtype="<i8").reshape(-1, 2)
+        buffer = buffer[usable:]
+        for gap, length in pairs.tolist():
+            start = end + gap
+            end = start + length
+            yield start, end
+
+def contains_row(encoded: Dict[str, Any], row: int) -> bool:
+    """
+    Check whether a row position is in an encoded row set.
+
+    Bitmaps are only inflated up to the byte holding the row, and ranges
+    are scanned until they pass it.
+    """
+    if row < 0 or row >= encoded.get("length", 0):
+        return False
+    data = _payload(encoded)
+    try:
+        if encoded["encoding"] == "bitmap":
+            byte = zlib.decompressobj().decompress(data, row // 8 + 1)
+            if len(byte) <= row // 8:
+                return False
+            return bool(byte[row // 8] >> (7 - row % 8) & 1)
+        for start, end in _iter_runs(data):
+            if row < start:
+                return False
+            if row < end:
+                return True
+        return False
+    except zlib.error as e:
+        raise RowSetError(f"Malformed row set: {str(e)}")
+
+def _bitmap_rows(data: bytes, length: int) -> Iterator[np.ndarray]:
+    base = 0
+    for block in _stream(data):
+        positions = np.flatnonzero(np.unpackbits(np.frombuffer(block, dtype=np.uint8))) + base
+        base += 8 * len(block)
+        yield positions[positions < length]
+
+def iter_rows(encoded: Dict[str, Any], offset: int = 0, limit: Optional[int] = None) -> Iterator[int]:
+    """
+    Yield the row positions of an encoded row set in order.
+
+    Whole bitmap blocks and ranges before `offset` are skipped by count.
+
+    Args:
+        encoded: Output of RowSetBuilder.finish / encode_mask
+        offset: Number of positions to skip
+        limit: Maximum number of positions to yield
+    """
+    data = _payload(encoded)
+    remaining = limit
+    try:
+        if encoded["encoding"] == "bitmap":
+            chunks = _bitmap_rows(data, encoded["length"])
+        else:
+            chunks = (range(start, end) for start, end in _iter_runs(data))
+        for chunk in chunks:
+            if offset >= len(chunk):
+                offset -= len(chunk)
+                continue
+            chunk = chunk[offset:]
+            offset = 0
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield from (int(row) for row in chunk)
+            if remaining == 0:
+                return
+    except zlib.error as e:
+        raise RowSetError(f"Malformed row set: {str(e)}")
+
+def decode_rows(encoded: Dict[str, Any]) -> np.ndarray:
+    """Return every row position of an encoded row set as an array."""
+    return np.fromiter(iter_rows(encoded), dtype=np.int64, count=encoded.get("count", -1))
@@ -0,0 +1,197 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Iterable, List, Optional
+from utils.dates import guess_formats, DATE_SAMPLE_ROWS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Text columns with at most this many distinct values (and a low enough
+# distinct/non-null ratio) are stored as `category`
+CATEGORY_MAX_UNIQUE = int(os.getenv("CATEGORY_MAX_UNIQUE", "1000"))
+CATEGORY_MAX_RATIO = 0.5
+
+STRING_DTYPE = "string[pyarrow]"
+_INT_DTYPES = ["int8", "int16", "int32", "int64"]
+
+class _ColumnState:
+    """Running facts about one column while batches are scanned."""
+
+    def __init__(self, dtype, date_format: Optional[str] = None):
+        self.dtype = dtype
+        self.known_format = date_format
+        self.min = None
+        self.max = None
+        self.float32_ok = True
+        self.non_null = 0
+        self.uniques: Optional[set] = set()
+        self.date_formats: Optional[List[str]] = None
+        self.date_ok: Optional[bool] = None
+
+    def update(self, s: pd.Series) -> None:
+        if pd.api.types.is_bool_dtype(s.dtype):
+            return
+        if pd.api.types.is_integer_dtype(s.dtype):
+            if len(s):
+                lo, hi = int(s.min()), int(s.max())
+                self.min = lo if self.min is None else min(self.min, lo)
+                self.max = hi if self.max is None else max(self.max, hi)
+        elif pd.api.types.is_float_dtype(s.dtype):
+            if self.float32_ok:
+                values = s.to_numpy(dtype="float64", na_value=np.nan)
+                self.float32_ok = bool(np.array_equal(
+                    values.astype("float32").astype("float64"), values, equal_nan=True
+                ))
+        elif _is_text(s.dtype):
+            values = s.dropna()
+            self.non_null += len(values)
+            if self.uniques is not None:
+                self.uniques.update(values.unique())
+                if len(self.uniques) > CATEGORY_MAX_UNIQUE:
+                    self.uniques = None
+            self._check_dates(values)
+
+    def _check_dates(self, values: pd.Series) -> None:
+        if self.date_ok is False or values.empty:
+            return
+        if self.date_formats is None:
+            first = values.iloc[0]
+            if not isinstance(first, str):
+                self.date_ok = False
+                return
+            self.date_formats = guess_formats([first], self.known_format)
+            values = values.iloc[:DATE_SAMPLE_ROWS]
+        self.date_formats = [
+            fmt for fmt in self.date_formats
+            if pd.to_datetime(values, format=fmt, errors="coerce").notna().all()
+        ]
+        self.date_ok = bool(self.date_formats)
+
+    def spec(self) -> Dict[str, Any]:
+        dtype = self.dtype
+        if pd.api.types.is_integer_dtype(dtype) and self.min is not None:
+            for name in _INT_DTYPES:
+                info = np.iinfo(name)
+                if info.min <= self.min and self.max <= info.max:
+                    return {"dtype": name}
+        if pd.api.types.is_float_dtype(dtype) and self.float32_ok:
+            return {"dtype": "float32"}
+        if _is_text(dtype):
+            if self.date_ok:
+                return {"dtype": "datetime64[ns]", "format": self.date_formats[0]}
+            if (self.uniques is not None and self.non_null
+                    and len(self.uniques) / self.non_null <= CATEGORY_MAX_RATIO):
+                # Fixed categories keep batches and later reads consistent
+                try:
+                    categories = sorted(self.uniques)
+                except TypeError:
+                    categories = list(self.uniques)
+                return {"dtype": "category", "categories": [_plain(v) for v in categories]}
+            return {"dtype": STRING_DTYPE}
+        return {"dtype": str(dtype)}
+
+def _plain(value):
+    # numpy scalars are not JSON serializable
+    return value.item() if isinstance(value, np.generic) else value
+
+def _dtype(spec: Dict[str, Any]):
+    if spec["dtype"] == "category" and "categories" in spec:
+        return pd.CategoricalDtype(spec["categories"])
+    return spec["dtype"]
+
+def _is_text(dtype) -> bool:
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+def infer_schema(
+    batches: Iterable[pd.DataFrame],
+    date_formats: Optional[Dict[str, Optional[str]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Infer compact dtypes for every column from a stream of batches.
+
+    Integers are downcast to the smallest type holding their observed range,
+    floats become float32 when that round-trips exactly, text columns
+    become datetimes (with an explicit format) when every value parses,
+    `category` when they have few distinct values, and Arrow-backed strings
+    otherwise. Only one batch is held at a time.
+
+    Args:
+        batches: DataFrames sharing the same columns
+        date_formats: Date formats known for some columns (see
+            utils.dates), tried before guessed ones
+
+    Returns:
+        Mapping of column name to {"dtype": ..., "format": ...}
+    """
+    date_formats = date_formats or {}
+    states: Dict[str, _ColumnState] = {}
+    for batch in batches:
+        for col in batch.columns:
+            if col not in states:
+                states[col] = _ColumnState(batch[col].dtype, date_formats.get(col))
+            states[col].update(batch[col])
+    return {col: state.spec() for col, state in states.items()}
+
+def infer_frame_schema(
+    df: pd.DataFrame,
+    date_formats: Optional[Dict[str, Optional[str]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Infer compact dtypes for an in-memory DataFrame (see infer_schema)."""
+    return infer_schema([df], date_formats)
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Cast DataFrame columns to the dtypes recorded in a schema.
+
+    Columns missing from the schema, or already of the right type, are
+    left untouched.
+
+    Args:
+        df: Input DataFrame
+        schema: Output of infer_schema
+
+    Returns:
+        DataFrame with converted columns
+    """
+    converted = {}
+    for col, spec in schema.items():
+        if col not in df.columns:
+            continue
+        if str(df[col].dtype) == spec["dtype"] and "categories" not in spec:
+            continue
+        try:
+            if spec["dtype"].startswith("datetime"):
+                converted[col] = pd.to_datetime(df[col], format=spec.get("format"))
+            else:
+                converted[col] = df[col].astype(_dtype(spec))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Could not apply dtype {spec['dtype']} to {col}: {str(e)}")
+    return df.assign(**converted) if converted else df
+
+def read_csv_kwargs(schema: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Build `pd.read_csv` keyword arguments that parse straight into a schema.
+
+    Args:
+        schema: Output of infer_schema, or None
+
+    Returns:
+        Keyword arguments with dtype, parse_dates and date_format set
+    """
+    if not schema:
+        return {}
+    dtype, parse_dates, date_format = {}, [], {}
+    for col, spec in schema.items():
+        if spec["dtype"].startswith("datetime"):
+            parse_dates.append(col)
+            if spec.get("format"):
+                date_format[col] = spec["format"]
+        elif spec["dtype"] != "bool":
+            dtype[col] = _dtype(spec)
+    kwargs: Dict[str, Any] = {"dtype": dtype}
+    if parse_dates:
+        kwargs["parse_dates"] = parse_dates
+        if date_format:
+            kwargs["date_format"] = date_format
+    return kwargs
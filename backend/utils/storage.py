@@ -0,0 +1,634 @@
+import os
+import glob
+import json
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from typing import Dict, Any, List, Optional
+from utils.cache import frame_cache, step_cache, file_signature
+from utils.excel import excel_to_csv, ExcelError
+from utils.schema import infer_schema, infer_frame_schema, apply_schema, read_csv_kwargs
+try:
+    import fcntl
+except ImportError:  # Windows: conversions are only coordinated within a process
+    fcntl = None
+from utils.sketches import Reservoir
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+UPLOAD_DIR = os.path.join(DATA_DIR, 'uploads')
+CLEANED_DIR = os.path.join(DATA_DIR, 'cleaned')
+SESSION_DIR = os.path.join(DATA_DIR, 'sessions')
+JOB_DIR = os.path.join(DATA_DIR, 'jobs')
+os.makedirs(SESSION_DIR, exist_ok=True)
+os.makedirs(JOB_DIR, exist_ok=True)
+
+SOURCE_EXTENSIONS = [".csv", ".xlsx", ".xls"]
+BATCH_ROWS = 65536
+# Rows kept in each artifact's uniform sample for approximate profiling
+SAMPLE_ROWS = int(os.getenv("SAMPLE_ROWS", "100000"))
+
+class StorageError(Exception):
+    """Custom exception for session storage errors"""
+    pass
+
+def artifact_name(session_id: str, cleaned: bool = False) -> str:
+    """Return the artifact name for the original or cleaned session data."""
+    return f"{session_id}_cleaned" if cleaned else session_id
+
+def artifact_path(name: str) -> str:
+    """Return the Parquet path of a session artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.parquet")
+
+def lock_path(name: str) -> str:
+    """Return the path of the lock file coordinating conversions of an artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.lock")
+
+def upload_meta_path(session_id: str) -> str:
+    """Return the path of the options a session's file was uploaded with."""
+    return os.path.join(SESSION_DIR, f"{session_id}.upload.json")
+
+def schema_path(name: str) -> str:
+    """Return the schema JSON path of a session artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.schema.json")
+
+def profile_path(name: str, key: str) -> str:
+    """Return the path of a cached profile result of a session artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.profile-{key}.json")
+
+def model_path(name: str, key: str) -> str:
+    """Return the path of a cached outlier model fitted on a session artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.outlier-{key}.joblib")
+
+def sample_path(name: str) -> str:
+    """Return the Parquet path of a session artifact's row sample."""
+    return os.path.join(SESSION_DIR, f"{name}.sample.parquet")
+
+def row_hash_path(name: str, key: str) -> str:
+    """Return the path of the cached row hashes of a session artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.rowhash-{key}.npy")
+
+def audit_path(name: str) -> str:
+    """Return the path of the cleaning audit stored with a cleaned artifact."""
+    return os.path.join(SESSION_DIR, f"{name}.audit.json")
+
+def job_path(job_id: str) -> str:
+    """Return the path of a background job's status file."""
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+def latest_job_path(session_id: str) -> str:
+    """Return the path of the file naming a session's most recent job."""
+    return os.path.join(JOB_DIR, f"{session_id}.latest")
+
+def find_source_file(session_id: str, cleaned: bool = False) -> Optional[str]:
+    """
+    Locate the original (or cleaned CSV) file of a session.
+
+    Args:
+        session_id: Cleaning session ID
+        cleaned: Look for the cleaned CSV instead of the upload
+
+    Returns:
+        Path to the file, or None if it does not exist
+    """
+    if cleaned:
+        candidate = os.path.join(CLEANED_DIR, f"{session_id}_cleaned.csv")
+        return candidate if os.path.exists(candidate) else None
+    for directory in [UPLOAD_DIR, CLEANED_DIR]:
+        for ext in SOURCE_EXTENSIONS:
+            candidate = os.path.join(directory, f"{session_id}{ext}")
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+def _tmp_path(path: str) -> str:
+    # Unique per writer so a lazy conversion never clobbers a background one
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 ** 2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_schema(
+    name: str,
+    schema: pa.Schema,
+    rows: int,
+    source: Optional[str],
+    dtypes: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    # Called after every artifact write, so stale cached frames, profiles,
+    # outlier models and row hashes are dropped here too
+    frame_cache.invalidate(lambda key: key[0] == name)
+    step_cache.invalidate(lambda key: key[0] == name)
+    escaped = glob.escape(name)
+    for pattern in [profile_path(escaped, "*"), model_path(escaped, "*"), row_hash_path(escaped, "*")]:
+        for cached in glob.glob(pattern):
+            os.remove(cached)
+    meta = {
+        "columns": [{"name": field.name, "dtype": str(field.type)} for field in schema],
+        "rows": rows,
+        "source": os.path.basename(source) if source else None,
+        "dtypes": dtypes,
+        "content_hash": _file_digest(artifact_path(name))
+    }
+    tmp = _tmp_path(schema_path(name))
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, schema_path(name))
+    return meta
+
+def write_session_frame(
+    name: str,
+    df: pd.DataFrame,
+    source: Optional[str] = None,
+    date_formats: Optional[Dict[str, Optional[str]]] = None
+) -> Dict[str, Any]:
+    """
+    Store a DataFrame as the columnar artifact of a session.
+
+    Columns are cast to the compact dtypes inferred by utils.schema first.
+    The Parquet file is written to a temporary path and moved into place so
+    readers never see a partial artifact.
+
+    Args:
+        name: Artifact name (see artifact_name)
+        df: Data to store
+        source: Path of the file the data came from
+        date_formats: Date formats known for some columns
+
+    Returns:
+        Stored schema metadata
+    """
+    df = df.rename(columns=str)
+    dtypes = infer_frame_schema(df, date_formats)
+    df = apply_schema(df, dtypes)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = _tmp_path(artifact_path(name))
+    try:
+        pq.write_table(table, tmp)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, artifact_path(name))
+    reservoir = Reservoir(SAMPLE_ROWS)
+    reservoir.update(df)
+    _write_sample(name, reservoir)
+    return _write_schema(name, table.schema, table.num_rows, source, dtypes)
+
+def _write_sample(name: str, reservoir: Reservoir) -> None:
+    if reservoir.sample is None:
+        return
+    tmp = _tmp_path(sample_path(name))
+    reservoir.sample.to_parquet(tmp, index=False)
+    os.replace(tmp, sample_path(name))
+
+def _iter_frames(path: str):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS):
+        yield batch.to_pandas(date_as_object=False)
+
+def _optimize_artifact(
+    name: str,
+    source: Optional[str],
+    date_formats: Optional[Dict[str, Optional[str]]] = None
+) -> Dict[str, Any]:
+    """
+    Rewrite an artifact with compact dtypes in two streaming passes.
+
+    The first pass infers the schema, the second casts and rewrites batch
+    by batch and draws the artifact's row sample, so memory use is bounded
+    by BATCH_ROWS plus SAMPLE_ROWS.
+    """
+    path = artifact_path(name)
+    dtypes = infer_schema(_iter_frames(path), date_formats)
+    tmp = _tmp_path(path)
+    writer = None
+    rows = 0
+    reservoir = Reservoir(SAMPLE_ROWS)
+    try:
+        for frame in _iter_frames(path):
+            frame = apply_schema(frame, dtypes)
+            reservoir.update(frame)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    except Exception:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if writer is None:
+        # No rows: keep the artifact as is
+        return _write_schema(name, pq.read_schema(path), 0, source, dtypes)
+    writer.close()
+    os.replace(tmp, path)
+    _write_sample(name, reservoir)
+    return _write_schema(name, writer.schema, rows, source, dtypes)
+
+def _convert_csv(name: str, source: str) -> Dict[str, Any]:
+    """Stream a CSV into Parquet batch by batch without loading it whole."""
+    tmp = _tmp_path(artifact_path(name))
+    rows = 0
+    # Treat empty strings as nulls, like pd.read_csv does
+    reader = pacsv.open_csv(source, convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    writer = pq.ParquetWriter(tmp, reader.schema)
+    try:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    except Exception:
+        writer.close()
+        os.remove(tmp)
+        raise
+    writer.close()
+    os.replace(tmp, artifact_path(name))
+    return _write_schema(name, reader.schema, rows, source)
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+@contextmanager
+def _artifact_lock(name: str, exclusive: bool = True):
+    """
+    Hold an artifact's conversion lock, shared by all processes.
+
+    Conversions hold it exclusively; readers hold it shared to wait for a
+    conversion in flight. Without fcntl every hold is exclusive and only
+    threads of one process are coordinated.
+    """
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(name, threading.Lock())
+        with lock:
+            yield
+        return
+    with open(lock_path(name), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def save_upload_options(session_id: str, sheet: Optional[str] = None) -> None:
+    """Record the options a session's file was uploaded with, for later conversions."""
+    path = upload_meta_path(session_id)
+    tmp = _tmp_path(path)
+    with open(tmp, "w") as f:
+        json.dump({"sheet": sheet}, f)
+    os.replace(tmp, path)
+
+def _upload_sheet(session_id: str) -> Optional[str]:
+    path = upload_meta_path(session_id)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get("sheet")
+
+def ensure_artifact(session_id: str, cleaned: bool = False) -> bool:
+    """
+    Make sure a session's artifact exists, converting the source if needed.
+
+    A conversion already in flight, e.g. the one started after upload, is
+    waited for rather than repeated.
+
+    Args:
+        session_id: Cleaning session ID
+        cleaned: Check the cleaned data instead of the upload
+
+    Returns:
+        False if the session has neither an artifact nor a source file
+
+    Raises:
+        StorageError: If the source cannot be converted
+    """
+    name = artifact_name(session_id, cleaned)
+    with _artifact_lock(name, exclusive=False):
+        if os.path.exists(artifact_path(name)):
+            return True
+    if not find_source_file(session_id, cleaned):
+        return False
+    convert_to_artifact(session_id, cleaned=cleaned, if_missing=True)
+    return True
+
+def convert_to_artifact(
+    session_id: str,
+    source: Optional[str] = None,
+    cleaned: bool = False,
+    sheet: Optional[str] = None,
+    if_missing: bool = False
+) -> Dict[str, Any]:
+    """
+    Convert a session's source file into its Parquet artifact.
+
+    CSV files are streamed through pyarrow and then rewritten with the
+    compact dtypes inferred by utils.schema, which are stored alongside. `.xlsx` workbooks are first
+    streamed into a CSV next to the upload with openpyxl in read-only mode,
+    which later lookups pick up in place of the workbook. If column types
+    change part way through a CSV, or the file is a legacy `.xls`, it is
+    parsed with pandas instead, applying the session's stored dtypes when
+    there are any.
+
+    Conversions of the same artifact are serialized across processes.
+
+    Args:
+        session_id: Cleaning session ID
+        source: Source file path (located automatically if omitted)
+        cleaned: Convert the cleaned CSV instead of the upload
+        sheet: Worksheet to convert for Excel files (defaults to the one
+            chosen at upload, then the first)
+        if_missing: Skip the conversion if the artifact exists once the
+            lock is held
+
+    Returns:
+        Stored schema metadata
+
+    Raises:
+        StorageError: If the source is missing or cannot be parsed
+    """
+    name = artifact_name(session_id, cleaned)
+    with _artifact_lock(name):
+        if if_missing and os.path.exists(artifact_path(name)):
+            return read_session_schema(session_id, cleaned) or {}
+        if sheet is None and not cleaned:
+            sheet = _upload_sheet(session_id)
+        return _convert(session_id, name, source or find_source_file(session_id, cleaned), cleaned, sheet)
+
+def _convert(session_id: str, name: str, source: Optional[str], cleaned: bool, sheet: Optional[str]) -> Dict[str, Any]:
+    if not source:
+        raise StorageError(f"No source file for session {session_id}")
+    known = read_session_schema(session_id) or {}
+    try:
+        if source.endswith(".xlsx"):
+            csv_path = os.path.join(os.path.dirname(source), f"{session_id}.csv")
+            excel_to_csv(source, csv_path, sheet)
+            source = csv_path
+        if source.endswith(".csv"):
+            try:
+                _convert_csv(name, source)
+                return _optimize_artifact(name, source, known.get("date_formats"))
+            except pa.ArrowInvalid as e:
+                logger.warning(f"Streaming conversion of {source} failed, using pandas: {str(e)}")
+                df = pd.read_csv(source, **read_csv_kwargs(known.get("dtypes")))
+        else:
+            df = pd.read_excel(source, sheet_name=sheet or 0)
+        return write_session_frame(name, df, source, known.get("date_formats"))
+    except StorageError:
+        raise
+    except Exception as e:
+        logger.error(f"Error converting {source}: {str(e)}")
+        raise StorageError(f"Failed to convert {os.path.basename(source)}: {str(e)}")
+
+def read_session_schema(session_id: str, cleaned: bool = False) -> Optional[Dict[str, Any]]:
+    """Return the stored schema of a session artifact, if any."""
+    path = schema_path(artifact_name(session_id, cleaned))
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_session_date_formats(session_id: str, formats: Dict[str, Optional[str]]) -> None:
+    """
+    Record date formats found in a session's data (see utils.dates) in its
+    stored schema, where conversions, cleans and feature suggestions reuse
+    them. They are dropped with the schema when the upload is converted
+    again.
+
+    Args:
+        session_id: Cleaning session ID
+        formats: Format by column, None for columns that are not dates
+    """
+    meta = read_session_schema(session_id)
+    if meta is None:
+        return
+    meta["date_formats"] = {**(meta.get("date_formats") or {}), **formats}
+    path = schema_path(artifact_name(session_id))
+    tmp = _tmp_path(path)
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+def write_session_audit(session_id: str, audit: Dict[str, Any]) -> None:
+    """Store the audit log of a session's latest clean next to its cleaned artifact."""
+    path = audit_path(artifact_name(session_id, cleaned=True))
+    tmp = _tmp_path(path)
+    with open(tmp, "w") as f:
+        json.dump(audit, f)
+    os.replace(tmp, path)
+
+def read_session_audit(session_id: str) -> Optional[Dict[str, Any]]:
+    """Return the audit log of a session's latest clean, if any."""
+    path = audit_path(artifact_name(session_id, cleaned=True))
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def validate_columns(session_id: str, columns: Optional[List[str]], cleaned: bool = False) -> None:
+    """
+    Check requested columns against the session's stored schema.
+
+    Raises:
+        StorageError: If a requested column does not exist
+    """
+    schema = read_session_schema(session_id, cleaned)
+    if columns and schema:
+        known = {c["name"] for c in schema["columns"]}
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise StorageError(f"Unknown columns: {', '.join(unknown)}")
+
+def _arrow_strings(arrow_type: pa.DataType):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def _read_artifact(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    # Keep text columns Arrow-backed instead of materialising Python strings
+    return pq.read_table(path, columns=columns).to_pandas(
+        types_mapper=_arrow_strings, date_as_object=False
+    )
+
+def load_session_frame(
+    session_id: str,
+    columns: Optional[List[str]] = None,
+    cleaned: bool = False,
+    copy: bool = False
+) -> Optional[pd.DataFrame]:
+    """
+    Load session data from its columnar artifact.
+
+    The artifact is created from the source file on first use if the upload
+    did not already produce it. Full reads go through the shared frame
+    cache, keyed by artifact name, mtime and size; projected reads are
+    served from a cached full frame when there is one.
+
+    Args:
+        session_id: Cleaning session ID
+        columns: Only read these columns
+        cleaned: Load the cleaned data instead of the upload
+        copy: Return a deep copy, for callers that modify the frame in place
+
+    Returns:
+        DataFrame, or None if the session has no data
+
+    Raises:
+        StorageError: If a requested column does not exist
+    """
+    name = artifact_name(session_id, cleaned)
+    path = artifact_path(name)
+    if not ensure_artifact(session_id, cleaned):
+        return None
+    validate_columns(session_id, columns, cleaned)
+    key = (name, *file_signature(path))
+    df = frame_cache.get(key)
+    if df is None:
+        if columns:
+            return _read_artifact(path, columns)
+        df = _read_artifact(path)
+        frame_cache.put(key, df)
+    if columns:
+        df = df[columns]
+    return df.copy() if copy else df
+
+def _has_nulls(pf: pq.ParquetFile, column: int) -> bool:
+    """Whether a Parquet column may hold nulls, going by its row group statistics."""
+    for group in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(group).column(column).statistics
+        if stats is None or not stats.has_null_count:
+            # Without statistics, assume there may be nulls
+            return True
+        if stats.null_count:
+            return True
+    return False
+
+def _nullable_integers(pf: pq.ParquetFile) -> List[str]:
+    """Return the integer columns of a Parquet file that hold nulls."""
+    return [
+        field.name for i, field in enumerate(pf.schema_arrow)
+        if pa.types.is_integer(field.type) and _has_nulls(pf, i)
+    ]
+
+def session_null_columns(session_id: str, cleaned: bool = False) -> Optional[List[str]]:
+    """
+    Return the columns of a session artifact that hold missing values,
+    read from its Parquet statistics without scanning the data.
+
+    Returns:
+        Column names (columns without statistics included), or None if the
+        session has no artifact
+    """
+    path = artifact_path(artifact_name(session_id, cleaned))
+    if not os.path.exists(path):
+        return None
+    pf = pq.ParquetFile(path)
+    return [field.name for i, field in enumerate(pf.schema_arrow) if _has_nulls(pf, i)]
+
+def iter_session_chunks(
+    session_id: str,
+    chunksize: int = BATCH_ROWS,
+    columns: Optional[List[str]] = None,
+    cleaned: bool = False
+):
+    """
+    Yield session data in chunks without loading it whole.
+
+    Reads record batches from the Parquet artifact when it exists, and
+    otherwise falls back to `pd.read_csv(chunksize=...)` on the source with
+    the session's stored dtypes.
+
+    Args:
+        session_id: Cleaning session ID
+        chunksize: Rows per chunk
+        columns: Only read these columns
+        cleaned: Read the cleaned data instead of the upload
+
+    Yields:
+        DataFrames of at most `chunksize` rows
+
+    Raises:
+        StorageError: If the session has no data or is not a CSV
+    """
+    name = artifact_name(session_id, cleaned)
+    path = artifact_path(name)
+    # Wait for a conversion in flight rather than read a half-written artifact
+    with _artifact_lock(name, exclusive=False):
+        converted = os.path.exists(path)
+    if converted:
+        pf = pq.ParquetFile(path)
+        # Integer columns with nulls anywhere load as float64, as they do
+        # when the artifact is read whole, so every chunk has the same dtypes
+        floats = _nullable_integers(pf)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            chunk = batch.to_pandas(types_mapper=_arrow_strings, date_as_object=False)
+            drifted = [col for col in floats if col in chunk.columns and chunk[col].dtype != "float64"]
+            yield chunk.astype({col: "float64" for col in drifted}) if drifted else chunk
+        return
+    source = find_source_file(session_id, cleaned)
+    if not source or not source.endswith(".csv"):
+        raise StorageError(f"No chunked source for session {session_id}")
+    known = read_session_schema(session_id) or {}
+    yield from pd.read_csv(source, chunksize=chunksize, usecols=columns, **read_csv_kwargs(known.get("dtypes")))
+
+def load_session_sample(
+    session_id: str,
+    size: Optional[int] = None,
+    fraction: Optional[float] = None,
+    columns: Optional[List[str]] = None,
+    cleaned: bool = False
+) -> Optional[tuple]:
+    """
+    Load a uniform random sample of session rows.
+
+    Samples up to SAMPLE_ROWS rows come from the reservoir drawn when the
+    artifact was written. Larger samples, or sessions without a stored
+    sample, are drawn with one streaming pass over the data.
+
+    Args:
+        session_id: Cleaning session ID
+        size: Number of rows wanted
+        fraction: Fraction of rows wanted (used when size is omitted)
+        columns: Only read these columns
+        cleaned: Sample the cleaned data instead of the upload
+
+    Returns:
+        Tuple of (sample DataFrame, total row count), or None if the
+        session has no data
+    """
+    name = artifact_name(session_id, cleaned)
+    if not ensure_artifact(session_id, cleaned):
+        return None
+    meta = read_session_schema(session_id, cleaned) or {}
+    total = meta.get("rows")
+    if total is None:
+        total = pq.ParquetFile(artifact_path(name)).metadata.num_rows
+    if size is None:
+        size = int(round(total * fraction)) if fraction is not None else SAMPLE_ROWS
+    size = max(1, min(size, total))
+    if size <= SAMPLE_ROWS and os.path.exists(sample_path(name)):
+        sample = pq.read_table(sample_path(name), columns=columns).to_pandas(
+            types_mapper=_arrow_strings, date_as_object=False
+        )
+        if len(sample) >= size:
+            # A random subset of a uniform sample is still uniform
+            if len(sample) > size:
+                sample = sample.sample(n=size, random_state=0).reset_index(drop=True)
+            return sample, total
+    reservoir = Reservoir(size)
+    for chunk in iter_session_chunks(session_id, columns=columns, cleaned=cleaned):
+        reservoir.update(chunk)
+    return reservoir.sample, total
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useRouter } from 'next/router';
 import { cleanData, getAudit, downloadFile } from '../utils/api';
-import type { CleanResult, AuditLog } from '../types/api';
+import type { CleanResult, CleanJob, AuditLog } from '../types/api';
 import DataPreview from '../components/DataPreview';
 
 export default function Result() {
@@ -12,6 +12,7 @@ export default function Result() {
   const [cleanResult, setCleanResult] = useState<CleanResult | null>(null);
   const [auditLogs, setAuditLogs] = useState<AuditLog[]>([]);
   const [downloadLoading, setDownloadLoading] = useState(false);
+  const [job, setJob] = useState<CleanJob | null>(null);
 
   useEffect(() => {
     if (!session_id) return;
@@ -23,7 +24,7 @@ export default function Result() {
           impute_missing: true,
           remove_outliers: true,
           deduplicate: true,
-        });
+        }, setJob);
         setCleanResult(result);
 
         // Get audit logs
@@ -63,7 +64,15 @@ export default function Result() {
   if (loading) {
     return (
       <div className="min-h-screen bg-gray-100 flex items-center justify-center">
-        <div className="inline-block animate-spin rounded-full h-8 w-8 border-4 border-blue-500 border-t-transparent"></div>
+        <div className="text-center">
+          <div className="inline-block animate-spin rounded-full h-8 w-8 border-4 border-blue-500 border-t-transparent"></div>
+          {job && (
+            <p className="mt-4 text-sm text-gray-600">
+              {job.step ? `Running ${job.step}` : 'Queued'}
+              {job.rows != null && job.total ? ` (${Math.round((job.rows * 100) / job.total)}%)` : ''}
+            </p>
+          )}
+        </div>
       </div>
     );
   }
@@ -99,7 +108,7 @@ export default function Result() {
         </div>
 
         <div className="bg-white rounded-lg shadow-sm border border-gray-200 mb-8">
-          <DataPreview data={cleanResult.data} title="Cleaned Data Preview" />
+          <DataPreview data={cleanResult.after} title="Cleaned Data Preview" />
         </div>
 
         <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-6">
@@ -28,16 +28,24 @@ export interface ProfileResult {
 
 export interface CleanResult {
   success: boolean;
-  data: any[][];
-  summary: {
-    rows_processed: number;
-    rows_cleaned: number;
-    transformations: Array<{
-      column: string;
-      action: string;
-      details: string;
-    }>;
-  };
+  summary: Record<string, any>;
+  before: any[];
+  after: any[];
+}
+
+export interface CleanJob {
+  success: boolean;
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  step?: string | null;
+  rows?: number | null;
+  total?: number | null;
+  eta_seconds?: number | null;
+  summary?: Record<string, any>;
+  before?: any[];
+  after?: any[];
+  error?: string;
+  status_code?: number;
 }
 
 export interface AuditLog {
@@ -1,9 +1,12 @@
 import axios from 'axios';
 import type { AxiosRequestConfig, AxiosResponse } from 'axios';
 import { getJWT } from './supabaseClient';
-import type { ProfileResult, CleanResult, AuditLog, ApiFeatures, ApiError, UploadResult } from '../types/api';
+import type { ProfileResult, CleanResult, CleanJob, AuditLog, ApiFeatures, ApiError, UploadResult } from '../types/api';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+// Milliseconds between status checks of a clean job, when its progress
+// stream is unavailable
+const CLEAN_POLL_MS = 1000;
 
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -98,12 +101,76 @@ export const getProfile = async (sessionId: string): Promise<ProfileResult> => {
   return fetchWithAuth<ProfileResult>({ url: `/profile/${sessionId}` });
 };
 
-export const cleanData = async (sessionId: string, options: any): Promise<CleanResult> => {
-  return fetchWithAuth<CleanResult>({
+export const getCleanJob = async (jobId: string): Promise<CleanJob> => {
+  return fetchWithAuth<CleanJob>({ url: `/clean/jobs/${jobId}` });
+};
+
+// Follow a job over the server-sent progress stream until it finishes.
+// EventSource cannot send headers, so the token goes in the query string.
+const followCleanJob = (
+  sessionId: string,
+  jobId: string,
+  onProgress?: (job: CleanJob) => void
+): Promise<CleanJob> => new Promise((resolve, reject) => {
+  const token = localStorage.getItem('token');
+  if (!token || typeof EventSource === 'undefined') {
+    reject(new Error('Progress stream unavailable'));
+    return;
+  }
+  const params = new URLSearchParams({ job_id: jobId, access_token: token });
+  const source = new EventSource(`${API_BASE_URL}/progress/${sessionId}?${params}`);
+  const parse = (event: Event): CleanJob => ({ success: true, ...JSON.parse((event as MessageEvent).data) });
+  const finish = (event: Event) => {
+    source.close();
+    resolve(parse(event));
+  };
+  source.addEventListener('progress', (event) => onProgress?.(parse(event)));
+  source.addEventListener('done', finish);
+  source.addEventListener('failed', finish);
+  source.onerror = () => {
+    source.close();
+    reject(new Error('Progress stream closed'));
+  };
+});
+
+const pollCleanJob = async (job: CleanJob, onProgress?: (job: CleanJob) => void): Promise<CleanJob> => {
+  while (job.status !== 'done' && job.status !== 'failed') {
+    onProgress?.(job);
+    await new Promise((resolve) => setTimeout(resolve, CLEAN_POLL_MS));
+    job = await getCleanJob(job.job_id);
+  }
+  return job;
+};
+
+export const cleanData = async (
+  sessionId: string,
+  options: any,
+  onProgress?: (job: CleanJob) => void
+): Promise<CleanResult> => {
+  // The clean runs as a background job (202 + job_id); follow its progress
+  // stream, or poll it if the stream cannot be opened or drops
+  let job = await fetchWithAuth<CleanJob>({
     url: '/clean',
     method: 'POST',
     data: { session_id: sessionId, ...options },
   });
+  if (job.status !== 'done' && job.status !== 'failed') {
+    onProgress?.(job);
+    try {
+      job = await followCleanJob(sessionId, job.job_id, onProgress);
+    } catch {
+      job = await pollCleanJob(await getCleanJob(job.job_id), onProgress);
+    }
+  }
+  if (job.status === 'failed') {
+    throw new Error(job.error || 'Cleaning failed');
+  }
+  return {
+    success: true,
+    summary: job.summary ?? {},
+    before: job.before ?? [],
+    after: job.after ?? [],
+  };
 };
 
 export const getAudit = async (sessionId: string): Promise<{ logs: AuditLog[] }> => {